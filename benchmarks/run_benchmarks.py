@@ -0,0 +1,357 @@
+"""
+Offline benchmark suite for the refresh pipeline, indicators and HTTP endpoints.
+
+Usage:
+    python -m benchmarks.run_benchmarks                      # 100, 1k and 10k symbols
+    python -m benchmarks.run_benchmarks --sizes 100 1000 --repeat 5
+    python -m benchmarks.run_benchmarks --compare old.json new.json
+
+Every run writes a JSON report to benchmarks/results/ (or --out) so two runs
+can be diffed with --compare.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import HTTPServer
+
+from benchmarks.synthetic import SyntheticMarket, make_symbols, make_watchlist
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def _timed(fn, repeat):
+    """Run fn `repeat` times and summarize wall-clock seconds."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, {
+        "seconds_min": min(samples),
+        "seconds_median": statistics.median(samples),
+        "seconds_mean": statistics.fmean(samples),
+        "repeat": repeat,
+    }
+
+
+def _scale(stats, sampled, total):
+    """Extrapolate a per-symbol stage measured on a sample to the full universe."""
+    factor = total / sampled
+    out = dict(stats)
+    out["sampled_symbols"] = sampled
+    out["per_symbol_ms"] = stats["seconds_median"] / sampled * 1000
+    if factor != 1:
+        out["extrapolated"] = True
+        for k in ("seconds_min", "seconds_median", "seconds_mean"):
+            out[k] = stats[k] * factor
+    return out
+
+
+def _percentile(sorted_vals, pct):
+    if not sorted_vals:
+        return None
+    idx = min(len(sorted_vals) - 1, int(round(pct / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def bench_indicators(market, symbols, repeat):
+    """Time the indicator stage (every registered indicator, one pass per interval)."""
+    from services.indicator_pipeline import compute_fields
+
+    frames = {"1d": market.daily[symbols], "1h": market.hourly[symbols]}
+
+    def run():
+        compute_fields(frames, symbols)
+
+    _, stats = _timed(run, repeat)
+    return stats
+
+
+def bench_detailed_info(symbols, repeat):
+    """Time fetch_detailed_info end to end (download slicing + indicators)."""
+    from services.stock_service import fetch_detailed_info
+
+    result, stats = _timed(lambda: fetch_detailed_info(symbols), repeat)
+    stats["symbols_returned"] = len(result)
+    return stats
+
+
+def bench_category_assembly(symbols, repeat):
+    """Time fetch_category_data across every synthetic category."""
+    from services import stock_service
+
+    with open("list_watchlist.json", "w") as f:
+        json.dump(make_watchlist(symbols), f)
+
+    categories = list(stock_service.load_watchlist_data().keys())
+
+    def run():
+        stock_service.cache.data = {}
+        out = {}
+        for category in categories:
+            out[category] = stock_service.fetch_category_data(category)
+        return out
+
+    assembled, stats = _timed(run, repeat)
+    return assembled, stats
+
+
+def _clone_records(assembled, total):
+    """Grow a sampled category assembly to `total` records by renaming symbols."""
+    records = [r for items in assembled.values() for r in items]
+    data = {}
+    for i in range(total):
+        template = records[i % len(records)]
+        rec = dict(template, Symbol=f"S{i:05d}")
+        category = rec.get("category") or "Owned"
+        if rec.get("flag"):
+            category = "Owned"
+        if category in ("ETF", "ETFs"):
+            key = "etfs:saved_stock_info:v2"
+        else:
+            key = f"stocks:saved_stock_info:{category}"
+        data.setdefault(key, []).append(rec)
+    return data
+
+
+def bench_cache_io(data, repeat):
+    """Time StockCache.save and StockCache._load on a full-size cache."""
+    from services.stock_service import cache
+
+    cache.data = data
+    _, save_stats = _timed(cache.save, repeat)
+    _, load_stats = _timed(cache._load, repeat)
+    save_stats["bytes"] = os.path.getsize(cache.cache_file)
+    return save_stats, load_stats
+
+
+class _QuietHandler:
+    """Factory for a ChartRequestHandler that does not log every request."""
+
+    @staticmethod
+    def build():
+        from handlers.request_handler import ChartRequestHandler
+
+        class QuietChartRequestHandler(ChartRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        return QuietChartRequestHandler
+
+
+def _request(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        start = time.perf_counter()
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        body = resp.read()
+        elapsed = time.perf_counter() - start
+        return resp.status, len(body), elapsed
+    finally:
+        conn.close()
+
+
+def bench_http(paths, requests, concurrency):
+    """Measure throughput and latency of the read endpoints on a live server."""
+    httpd = HTTPServer(("127.0.0.1", 0), _QuietHandler.build())
+    port = httpd.server_address[1]
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        results = {}
+        for name, path in paths.items():
+            _request(port, path)  # warm-up
+
+            latencies, sizes, statuses = [], [], []
+            lock = threading.Lock()
+            per_client = max(1, requests // concurrency)
+
+            def client():
+                for _ in range(per_client):
+                    status, size, elapsed = _request(port, path)
+                    with lock:
+                        latencies.append(elapsed)
+                        sizes.append(size)
+                        statuses.append(status)
+
+            start = time.perf_counter()
+            workers = [threading.Thread(target=client) for _ in range(concurrency)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            wall = time.perf_counter() - start
+
+            latencies.sort()
+            results[name] = {
+                "path": path,
+                "requests": len(latencies),
+                "concurrency": concurrency,
+                "throughput_rps": len(latencies) / wall if wall else None,
+                "latency_ms_p50": _percentile(latencies, 50) * 1000,
+                "latency_ms_p95": _percentile(latencies, 95) * 1000,
+                "latency_ms_p99": _percentile(latencies, 99) * 1000,
+                "latency_ms_max": latencies[-1] * 1000,
+                "response_bytes": sizes[-1],
+                "non_200": sum(1 for s in statuses if s != 200),
+            }
+        return results
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def run_size(n, args):
+    """Run every stage for an n-symbol universe."""
+    from services import stock_service
+
+    symbols = make_symbols(n)
+    sample = symbols[: min(n, args.sample_limit)]
+    print(f"[{n} symbols] generating synthetic panels...")
+    market = SyntheticMarket(symbols)
+    stock_service.set_market_data_provider(market)
+
+    out = {}
+    print(f"[{n} symbols] indicators ({len(sample)} sampled)...")
+    out["indicators"] = _scale(bench_indicators(market, sample, args.repeat), len(sample), n)
+
+    print(f"[{n} symbols] fetch_detailed_info...")
+    out["detailed_info"] = _scale(bench_detailed_info(sample, args.repeat), len(sample), n)
+
+    print(f"[{n} symbols] category assembly...")
+    assembled, stats = bench_category_assembly(sample, args.repeat)
+    out["category_assembly"] = _scale(stats, len(sample), n)
+
+    print(f"[{n} symbols] cache save/load...")
+    data = _clone_records(assembled, n)
+    out["cache_save"], out["cache_load"] = bench_cache_io(data, args.repeat)
+
+    print(f"[{n} symbols] HTTP endpoints...")
+    category = next(iter(k.split(":", 2)[2] for k in data if k.startswith("stocks:")), "Owned")
+    now = datetime.now()
+    paths = {
+        "/saved_stock_info": f"/saved_stock_info?category={category.replace(' ', '%20')}",
+        "/api/all_stock_data": "/api/all_stock_data",
+        "/api/earnings": f"/api/earnings?month={now.month}&year={now.year}",
+    }
+    out["http"] = bench_http(paths, args.requests, args.concurrency)
+    return out
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _meta(args):
+    import numpy
+    import pandas
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "sizes": args.sizes,
+        "repeat": args.repeat,
+        "sample_limit": args.sample_limit,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+
+
+def _iter_metrics(results):
+    """Yield (size, stage, metric, value) for every comparable number in a report."""
+    for size, stages in results.items():
+        for stage, stats in stages.items():
+            if stage == "http":
+                for endpoint, ep_stats in stats.items():
+                    for metric in ("latency_ms_p50", "latency_ms_p95", "throughput_rps"):
+                        yield size, f"http {endpoint}", metric, ep_stats.get(metric)
+            else:
+                yield size, stage, "seconds_median", stats.get("seconds_median")
+
+
+def compare(old_fp, new_fp):
+    """Print a side-by-side comparison of two benchmark reports."""
+    with open(old_fp) as f:
+        old = json.load(f)["results"]
+    with open(new_fp) as f:
+        new = json.load(f)["results"]
+
+    old_vals = {(s, st, m): v for s, st, m, v in _iter_metrics(old)}
+    print(f"{'size':>6}  {'stage':<34} {'metric':<16} {'old':>12} {'new':>12} {'ratio':>8}")
+    for size, stage, metric, value in _iter_metrics(new):
+        before = old_vals.get((size, stage, metric))
+        ratio = (value / before) if before and value is not None else None
+        fmt = lambda v: f"{v:12.4f}" if isinstance(v, (int, float)) else f"{'-':>12}"
+        print(f"{size:>6}  {stage:<34} {metric:<16} {fmt(before)} {fmt(value)} "
+              f"{(f'{ratio:8.2f}' if ratio else '       -')}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the stock refresh pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Universe sizes (number of symbols) to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per timed stage")
+    parser.add_argument("--sample-limit", type=int, default=1000,
+                        help="Per-symbol stages run on at most this many symbols and are extrapolated")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per HTTP endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent HTTP clients")
+    parser.add_argument("--out", default=None, help="Output JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    logging.basicConfig(level=logging.WARNING)
+    out_fp = args.out or os.path.join(
+        DEFAULT_OUT_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    out_fp = os.path.abspath(out_fp)
+
+    # The services resolve cache/ and list_watchlist.json relative to the working
+    # directory, so run everything inside a scratch dir to keep the real cache intact.
+    workdir = tempfile.mkdtemp(prefix="cachebandit-bench-")
+    os.chdir(workdir)
+    with open("list_watchlist.json", "w") as f:
+        json.dump(make_watchlist([]), f)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    report = {"meta": _meta(args), "results": {}}
+    for n in args.sizes:
+        report["results"][str(n)] = run_size(n, args)
+
+    os.makedirs(os.path.dirname(out_fp), exist_ok=True)
+    with open(out_fp, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark results written to {out_fp}")
+
+
+if __name__ == "__main__":
+    main()
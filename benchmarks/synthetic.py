@@ -0,0 +1,173 @@
+"""
+Synthetic, offline stand-ins for yfinance used by the benchmark suite.
+
+SyntheticMarket exposes the small slice of the yfinance API the services use
+(download, Ticker, Tickers) and serves deterministic random-walk OHLCV panels,
+so the refresh pipeline can be timed without touching the network.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+DAILY_BARS = 252        # ~1y of trading days
+HOURLY_BARS = 63 * 7    # ~3mo of trading days, 7 regular-session bars each
+
+CATEGORIES = [
+    "Information Technology",
+    "Financial Services",
+    "Industrials",
+    "Healthcare",
+    "ETFs",
+]
+
+
+def make_symbols(n):
+    """Return n unique ticker-like symbols."""
+    return [f"S{i:05d}" for i in range(n)]
+
+
+def _random_walk_panel(symbols, index, rng, nan_rate=0.002):
+    """Build a yfinance-shaped (group_by='ticker') OHLCV panel."""
+    rows, n = len(index), len(symbols)
+    start = rng.uniform(10, 500, size=n)
+    returns = rng.normal(0, 0.015, size=(rows, n))
+    close = start * np.exp(np.cumsum(returns, axis=0))
+    open_ = close * (1 + rng.normal(0, 0.004, size=(rows, n)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, size=(rows, n))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, size=(rows, n))))
+    volume = rng.integers(1e5, 5e7, size=(rows, n)).astype(float)
+
+    # Sprinkle a few missing rows so the "yfinance Missing Data" path is exercised
+    if nan_rate:
+        mask = rng.random((rows, n)) < nan_rate
+        mask[-1, :] = False
+        for arr in (open_, high, low, close, volume):
+            arr[mask] = np.nan
+
+    # Interleave fields per symbol: (S0, Open), (S0, High), ... (S1, Open), ...
+    stacked = np.stack([open_, high, low, close, volume], axis=2).reshape(rows, n * len(PRICE_FIELDS))
+    columns = pd.MultiIndex.from_product([symbols, PRICE_FIELDS], names=["Ticker", "Price"])
+    return pd.DataFrame(stacked, index=index, columns=columns)
+
+
+def make_panels(symbols, seed=7):
+    """Return (daily, hourly) panels covering ~1y of daily and ~3mo of hourly bars."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(datetime.now().date())
+    daily_index = pd.bdate_range(end=end, periods=DAILY_BARS)
+    hourly_days = pd.bdate_range(end=end, periods=HOURLY_BARS // 7)
+    hourly_index = pd.DatetimeIndex([
+        day + pd.Timedelta(hours=9, minutes=30) + pd.Timedelta(hours=h)
+        for day in hourly_days for h in range(7)
+    ])
+    return (
+        _random_walk_panel(symbols, daily_index, rng),
+        _random_walk_panel(symbols, hourly_index, rng),
+    )
+
+
+def make_info(symbol, rng):
+    """Return a plausible Ticker.info dict."""
+    earnings = datetime.now(ZoneInfo("UTC")).replace(day=1, hour=13) + timedelta(days=int(rng.integers(0, 27)))
+    return {
+        "longName": f"{symbol} Holdings Inc.",
+        "marketCap": float(rng.uniform(1e9, 3e12)),
+        "totalAssets": float(rng.uniform(1e8, 5e11)),
+        "trailingPE": float(rng.uniform(5, 80)),
+        "forwardPE": float(rng.uniform(5, 60)),
+        "dividendYield": float(rng.uniform(0, 4)),
+        "totalRevenue": float(rng.uniform(1e8, 4e11)),
+        "netIncomeToCommon": float(rng.uniform(-1e9, 1e11)),
+        "profitMargins": float(rng.uniform(-0.2, 0.5)),
+        "enterpriseToEbitda": float(rng.uniform(4, 50)),
+        "longBusinessSummary": f"{symbol} designs, manufactures and sells things. " * 12,
+        "fiftyTwoWeekHigh": float(rng.uniform(100, 600)),
+        "fiftyTwoWeekLow": float(rng.uniform(10, 100)),
+        "earningsTimestamp": int(earnings.timestamp()),
+        "beta": float(rng.uniform(0.3, 2.5)),
+        "exchange": "NMS",
+        "netExpenseRatio": 0.03,
+        "navPrice": float(rng.uniform(10, 500)),
+    }
+
+
+class _FundsData:
+    def __init__(self, holdings):
+        self.top_holdings = holdings
+
+
+class SyntheticTicker:
+    def __init__(self, market, symbol):
+        self.ticker = symbol
+        self._market = market
+
+    @property
+    def info(self):
+        return self._market.info_for(self.ticker)
+
+    @property
+    def fast_info(self):
+        return {"last_price": self._market.info_for(self.ticker)["navPrice"]}
+
+    @property
+    def funds_data(self):
+        return _FundsData(self._market.holdings_for(self.ticker))
+
+
+class SyntheticTickers:
+    def __init__(self, market, symbols):
+        self.tickers = {s: SyntheticTicker(market, s) for s in symbols}
+
+
+class SyntheticMarket:
+    """Drop-in for the yfinance module, backed by pre-generated panels."""
+
+    def __init__(self, symbols, seed=7):
+        self.symbols = list(symbols)
+        self.daily, self.hourly = make_panels(self.symbols, seed=seed)
+        self._rng = np.random.default_rng(seed + 1)
+        self._info = {}
+
+    def info_for(self, symbol):
+        if symbol not in self._info:
+            self._info[symbol] = make_info(symbol, self._rng)
+        return self._info[symbol]
+
+    def holdings_for(self, symbol):
+        held = self._rng.choice(self.symbols, size=min(10, len(self.symbols)), replace=False)
+        weights = np.sort(self._rng.uniform(0.01, 0.08, size=len(held)))[::-1]
+        return pd.DataFrame(
+            {"Name": [f"{s} Holdings Inc." for s in held], "Holding Percent": weights},
+            index=pd.Index(held, name="Symbol"),
+        )
+
+    def download(self, symbols, period=None, interval="1d", **kwargs):
+        if isinstance(symbols, str):
+            symbols = symbols.split()
+        panel = self.hourly if interval == "1h" else self.daily
+        return panel.loc[:, list(symbols)]
+
+    def Ticker(self, symbol):
+        return SyntheticTicker(self, symbol)
+
+    def Tickers(self, symbols):
+        if isinstance(symbols, str):
+            symbols = symbols.split()
+        return SyntheticTickers(self, symbols)
+
+
+def make_watchlist(symbols):
+    """Spread symbols over a handful of categories, one industry each."""
+    categories = {}
+    for i, sym in enumerate(symbols):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        categories.setdefault(category, {}).setdefault("Synthetic", []).append({
+            "symbol": sym,
+            "flag": i % 25 == 0,
+            "Name": f"{sym} Holdings Inc.",
+            "stockUrl": "",
+        })
+    return {"Categories": categories}
@@ -1,15 +1,43 @@
 # build_static.py
 from __future__ import annotations
 from pathlib import Path
+import gzip
+import hashlib
 import json
-from subprocess import run
+import logging
+import os
+import re
 from datetime import datetime
-import shutil
+
+from config import CHANGE_LOG_FILE, CHANGE_LOG_MAX_VERSIONS
+from models.change_log import ChangeLog
+from utils import columnar
+
+try:
+    import brotli  # optional: .br siblings are skipped without it
+except ImportError:
+    brotli = None
 
 SITE_ROOT = Path("site")
 HTML_DIR  = SITE_ROOT / "html"
-DATA_DIR  = HTML_DIR / "data"
 CACHE_FP  = Path("cache/stock_data.json")  # cache written by your server job
+CHANGE_LOG_FP = CACHE_FP.parent / CHANGE_LOG_FILE
+SOURCE_DIR = Path("html")
+
+# Output path -> content hash of the previous build, used to skip unchanged files
+BUILD_MANIFEST_FP = Path(".site_build.json")
+# Stable-named manifest the frontend reads to find the content-hashed data shards
+DATA_MANIFEST = "data/manifest.json"
+# Record fields exported in their own on-demand shards instead of the quotes shard
+DETAIL_FIELDS = ("stock_description", "holdings", "fund_stats")
+# Quotes deltas are exported from this many previous cache versions
+STATIC_DELTA_VERSIONS = 8
+
+# Assets that get content-hashed filenames (and are referenced by those names)
+HASHED_SUFFIXES = (".js", ".css")
+# Text outputs that get precompressed .gz/.br siblings
+COMPRESS_SUFFIXES = (".html", ".js", ".css", ".json", ".svg")
+COMPRESS_MIN_BYTES = 1024
 
 # The categories your UI expects (must match what's rendered on watchlist/Market Movers/RSI/PE pages)
 ACTIVE_CATEGORIES = [
@@ -26,21 +54,183 @@ ACTIVE_CATEGORIES = [
     "ETFs",
 ]
 
+# import ... from './x.js' / import './x.js' / import('./x.js')
+_IMPORT_RE = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(['"])(\.{1,2}/[^'"]+?)\2""")
+# src="..." / href="..." with a relative path
+_ATTR_RE = re.compile(r"""\b(src|href)=(["'])(?!https?:|//|#|javascript:|data:|mailto:)([^"'?#]+)\2""")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hashed_name(rel: str, data: bytes) -> str:
+    """js/main.js -> js/main.<hash>.js"""
+    stem, ext = os.path.splitext(rel)
+    return f"{stem}.{content_hash(data)[:10]}{ext}"
+
+
+def minified_json(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+class SiteWriter:
+    """
+    Writes build outputs under SITE_ROOT. A file whose content hash matches the
+    previous build is left alone; files the previous build wrote but this one
+    did not are removed. Text outputs get precompressed .gz (and .br) siblings.
+    """
+
+    def __init__(self, root: Path, manifest_fp: Path):
+        self.root = root
+        self.manifest_fp = manifest_fp
+        self.previous = {}
+        if manifest_fp.exists():
+            try:
+                self.previous = json.loads(manifest_fp.read_text())
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable build manifest: {e}")
+        self.current = {}
+        self.written = 0
+        self.skipped = 0
+
+    def write(self, rel: str, data: bytes):
+        outputs = {rel: data}
+        if rel.endswith(COMPRESS_SUFFIXES) and len(data) >= COMPRESS_MIN_BYTES:
+            outputs[rel + ".gz"] = None
+            if brotli is not None:
+                outputs[rel + ".br"] = None
+
+        digest = content_hash(data)
+        unchanged = all(self.previous.get(p) == digest and (self.root / p).exists() for p in outputs)
+        for p in outputs:
+            self.current[p] = digest
+        if unchanged:
+            self.skipped += 1
+            return
+
+        for p in outputs:
+            if p == rel:
+                payload = data
+            elif p.endswith(".gz"):
+                payload = gzip.compress(data, compresslevel=9, mtime=0)
+            else:
+                payload = brotli.compress(data, quality=11)
+            fp = self.root / p
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            tmp = fp.with_name(fp.name + ".tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, fp)
+        self.written += 1
+
+    def finish(self):
+        """Remove outputs of the previous build that are gone now, then save the manifest."""
+        removed = 0
+        for rel in set(self.previous) - set(self.current):
+            fp = self.root / rel
+            if fp.exists():
+                fp.unlink()
+                removed += 1
+        self.manifest_fp.write_text(json.dumps(self.current, indent=0, sort_keys=True))
+        print(f"Wrote {self.written} outputs, skipped {self.skipped} unchanged, removed {removed} stale")
+
+
 def load_cache():
     if not CACHE_FP.exists():
         raise FileNotFoundError(f"Cache not found: {CACHE_FP}")
     with open(CACHE_FP, "r") as f:
         return json.load(f)
 
-def copy_assets():
-    """Copies all contents of the local 'html' directory to the build 'site/html' directory."""
-    # First, ensure the destination directory is clean to avoid stale files
-    if HTML_DIR.exists():
-        shutil.rmtree(HTML_DIR)
-    
-    source_dir = Path("html")
-    if source_dir.is_dir():
-        run(["cp", "-r", f"{source_dir}/.", str(HTML_DIR)])
+def _resolve(base_rel: str, ref: str) -> str:
+    """Resolve a relative reference from the file at base_rel to a path relative to html/."""
+    return os.path.normpath(os.path.join(os.path.dirname(base_rel), ref)).replace(os.sep, "/")
+
+def _relative(base_rel: str, target_rel: str, original_ref: str) -> str:
+    """Path from base_rel to target_rel, keeping a leading './' if the original had one."""
+    ref = os.path.relpath(target_rel, os.path.dirname(base_rel) or ".").replace(os.sep, "/")
+    if original_ref.startswith("./") and not ref.startswith("."):
+        ref = "./" + ref
+    return ref
+
+def _rewrite_imports(text: str, base_rel: str, names: dict) -> str:
+    def sub(m):
+        target = _resolve(base_rel, m.group(3))
+        if target not in names:
+            return m.group(0)
+        return f"{m.group(1)}{m.group(2)}{_relative(base_rel, names[target], m.group(3))}{m.group(2)}"
+    return _IMPORT_RE.sub(sub, text)
+
+def _rewrite_html(text: str, base_rel: str, names: dict) -> str:
+    def sub(m):
+        target = _resolve(base_rel, m.group(3))
+        if target not in names:
+            return m.group(0)
+        return f"{m.group(1)}={m.group(2)}{_relative(base_rel, names[target], m.group(3))}{m.group(2)}"
+    # Inline <script type="module"> imports too
+    return _rewrite_imports(_ATTR_RE.sub(sub, text), base_rel, names)
+
+def hash_assets(sources: dict) -> tuple[dict, dict]:
+    """
+    Give every JS/CSS file (and every file an HTML page links to directly) a
+    content-hashed name. A JS module's hash covers the hashed names of the
+    modules it imports, so a change propagates to its importers.
+    Returns (logical -> hashed name, hashed name -> final bytes). Modules in an
+    import cycle are also emitted under their plain name so the cycle resolves.
+    """
+    names, outputs = {}, {}
+    visiting = set()
+
+    def visit(rel):
+        if rel in names:
+            return
+        data = sources[rel]
+        if rel.endswith(".js"):
+            visiting.add(rel)
+            text = data.decode()
+            for m in _IMPORT_RE.finditer(text):
+                dep = _resolve(rel, m.group(3))
+                if dep in sources and dep not in visiting:
+                    visit(dep)
+                elif dep in visiting:
+                    logging.warning(f"Import cycle via {rel} -> {dep}; {dep} is also written unhashed")
+                    outputs[dep] = sources[dep]
+            data = _rewrite_imports(text, rel, names).encode()
+            visiting.discard(rel)
+        names[rel] = hashed_name(rel, data)
+        outputs[names[rel]] = data
+
+    for rel in sorted(sources):
+        if rel.endswith(HASHED_SUFFIXES):
+            visit(rel)
+
+    # Images and other files linked straight from HTML (e.g. the logo) are hashed too;
+    # they also keep their plain name since JS templates reference them by it.
+    for rel, data in sources.items():
+        if not rel.endswith(".html"):
+            continue
+        for m in _ATTR_RE.finditer(data.decode()):
+            target = _resolve(rel, m.group(3))
+            if target in sources and target not in names and not target.endswith(".html"):
+                names[target] = hashed_name(target, sources[target])
+                outputs[names[target]] = sources[target]
+    return names, outputs
+
+def build_assets(writer: SiteWriter):
+    """Write html/ into the site with content-hashed JS/CSS and rewritten references."""
+    sources = {}
+    for fp in SOURCE_DIR.rglob("*"):
+        if fp.is_file():
+            sources[fp.relative_to(SOURCE_DIR).as_posix()] = fp.read_bytes()
+
+    names, outputs = hash_assets(sources)
+    for rel, data in outputs.items():
+        writer.write(f"html/{rel}", data)
+
+    for rel, data in sources.items():
+        if rel.endswith(".html"):
+            writer.write(f"html/{rel}", _rewrite_html(data.decode(), rel, names).encode())
+        elif not rel.endswith(HASHED_SUFFIXES):
+            writer.write(f"html/{rel}", data)
 
 def normalize_stock_fields(s: dict) -> dict:
     """
@@ -51,87 +241,131 @@ def normalize_stock_fields(s: dict) -> dict:
     """
     return s
 
-def build_payload(category: str, items: list, updated_at: str) -> dict:
-    return {
-        "category": category,
-        "updated_at": updated_at,
-        "items": [normalize_stock_fields(s) for s in items]
-    }
+def _trim(v):
+    # Float noise like 280.1499938964844 is most of a quote's bytes; the UI shows 2dp
+    if isinstance(v, float):
+        return round(v, 4 if abs(v) >= 1 else 6)
+    return v
 
-def add_cache_buster(version_str: str):
-    """
-    Adds a cache-busting query string to assets in all HTML files.
-    This ensures browsers fetch the new version after a deployment.
-    """
-    print(f"Adding cache-buster version: {version_str}")
-    for html_file in HTML_DIR.glob("*.html"):
-        content = html_file.read_text()
-        # Replace in both preload links and image sources
-        content = content.replace('href="cachebandit_logo.png"', f'href="cachebandit_logo.png?v={version_str}"')
-        content = content.replace('src="cachebandit_logo.png"', f'src="cachebandit_logo.png?v={version_str}"')
-        html_file.write_text(content)
+def slim_record(s: dict) -> dict:
+    """The record without the bulky fields that live in their own on-demand shards."""
+    return {k: _trim(v) for k, v in normalize_stock_fields(s).items() if k not in DETAIL_FIELDS}
 
-def main():
-    # 1) Prep dirs
-    HTML_DIR.mkdir(parents=True, exist_ok=True) # Ensure site/html exists
-    copy_assets() # Clean and copy source assets first
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+def category_items(cached: dict, cat: str) -> list:
+    # Try new-style keys first, then fall back to old static build keys
+    if cat == "ETFs":
+        key_new = "etfs:saved_stock_info:v2"
+        key_old = "category_ETFs"
+    else:
+        key_new = f"stocks:saved_stock_info:{cat}"
+        key_old = f"category_{cat}"
+    return cached.get(key_new, cached.get(key_old, []))
 
-    # 2) Load cache
-    cache = load_cache()
+def write_shard(writer: SiteWriter, logical: str, obj, data: bytes = None) -> str:
+    """Write a data shard (JSON unless `data` is given) under a content-hashed name; returns that name."""
+    data = minified_json(obj) if data is None else data
+    rel = hashed_name(logical, data)
+    writer.write(f"html/{rel}", data)
+    return rel
 
+def export_shards(writer: SiteWriter, cache: dict) -> dict:
+    """
+    Split the cache into the shards the pages load:
+      quotes          symbol -> slim record, shared by every page
+      categories/*    symbols of one category, in cache order
+      descriptions    symbol -> stock_description (on demand)
+      holdings        ETF -> {holdings, fund_stats} (on demand)
+      etf_exposure    constituent -> [{etf, weight}] (reverse holdings index)
+      heatmap         category / industry rollups for the native heatmap
+      quotes_<fmt>    the quotes as columns (npz, and arrow with pyarrow installed)
+      deltas/*        quotes changes since each of the last few cache versions
+    Returns the manifest that maps categories, symbols and deltas to shards.
+    """
     # Expected cache structure example:
     # {
-    #   "data": { "category_Owned": [ {...stocks...} , ... ] },
+    #   "data": { "stocks:saved_stock_info:Owned": [ {...stocks...} , ... ] },
     #   "last_updated": "10/14 02:00 PM"
     # }
     updated_at = cache.get("last_updated") or datetime.now().strftime("%m/%d %I:%M %p")
-    cached_categories = cache.get("data") or {}
+    cached = cache.get("data") or {}
 
-    # 3) Build each category JSON
+    quotes, descriptions, holdings = {}, {}, {}
+    categories, symbols = {}, {}
     for cat in ACTIVE_CATEGORIES:
-        # Try new-style keys first, then fall back to old static build keys
-        if cat == "ETFs":
-            key_new = "etfs:saved_stock_info:v2"
-            key_old = "category_ETFs"
-        else:
-            key_new = f"stocks:saved_stock_info:{cat}"
-            key_old = f"category_{cat}"
-        
-        items = cached_categories.get(key_new, cached_categories.get(key_old, []))
-
-        if cat == "Owned":
-            # alphabetical by symbol
-            items = sorted(items, key=lambda x: (x.get("Symbol") or x.get("symbol") or "").lower())
-        else:
-            # sort by market cap desc where available
-            def cap(x):
-                v = x.get("Market Cap")
-                try:
-                    return float(v) if v not in (None, "N/A") else 0.0
-                except Exception:
-                    return 0.0
-            items = sorted(items, key=cap, reverse=True)
-
-        payload = build_payload(cat, items, updated_at)
-        (DATA_DIR / f"{cat}.json").write_text(json.dumps(payload, indent=2))
-
-    # 4) Add cache-buster to static assets
-    version_str = datetime.now().strftime("%Y%m%d%H%M%S")
-    add_cache_buster(version_str)
-
-    # 5) Copy the fresh cache file into the build output LAST
-    source_cache_dir = Path("cache")
-    dest_cache_dir = HTML_DIR / "cache"
-    if source_cache_dir.is_dir():
-        shutil.copytree(source_cache_dir, dest_cache_dir, dirs_exist_ok=True)
-
-    # 4) Make sure a simple redirect index exists (optional nicety)
-    idx = SITE_ROOT / "index.html"
-    if not idx.exists():
-        idx.write_text('<meta http-equiv="refresh" content="0; url=html/watchlist.html" />')
-
-    print("Static build complete -> site/html/data/*.json")
+        members = []
+        for item in category_items(cached, cat):
+            sym = item.get("Symbol") or item.get("symbol")
+            if not sym:
+                continue
+            members.append(sym)
+            symbols.setdefault(sym, cat)
+            quotes[sym] = slim_record(item)
+            if item.get("stock_description"):
+                descriptions[sym] = item["stock_description"]
+            if "holdings" in item or "fund_stats" in item:
+                holdings[sym] = {"holdings": item.get("holdings") or [], "fund_stats": item.get("fund_stats")}
+        categories[cat] = write_shard(writer, f"data/categories/{cat}.json",
+                                      {"category": cat, "updated_at": updated_at, "symbols": members})
+
+    shards = {
+        "quotes": write_shard(writer, "data/quotes.json", quotes),
+        "descriptions": write_shard(writer, "data/descriptions.json", descriptions),
+        "holdings": write_shard(writer, "data/holdings.json", holdings),
+        "etf_exposure": write_shard(writer, "data/etf_exposure.json", cached.get("etf_holdings_index") or {}),
+        "heatmap": write_shard(writer, "data/heatmap.json", cached.get("heatmap_aggregates") or {}),
+    }
+    # The quotes again as typed columns, for notebooks and other bulk consumers
+    for fmt in columnar.available_formats():
+        data, _ = columnar.encode(list(quotes.values()), fmt)
+        shards[f"quotes_{fmt}"] = write_shard(writer, f"data/quotes.{fmt}", None, data=data)
+
+    version = cache.get("version")
+    deltas = export_deltas(writer, version, quotes) if version is not None else {}
+    return {"updated_at": updated_at, "version": version, "shards": shards, "categories": categories,
+            "symbols": symbols, "deltas": deltas}
+
+def slim_delta(delta: dict, quotes: dict) -> dict:
+    """A cache change-log delta restricted to what the quotes shard holds."""
+    changes = {}
+    for sym, fields in delta["changes"].items():
+        if sym not in quotes:
+            continue
+        slim = {k: _trim(v) for k, v in fields.items() if k not in DETAIL_FIELDS}
+        if slim:
+            changes[sym] = slim
+    return {"changes": changes, "removed": [s for s in delta["removed"] if s not in quotes]}
+
+def export_deltas(writer: SiteWriter, version: int, quotes: dict) -> dict:
+    """
+    Quotes changes from each of the last STATIC_DELTA_VERSIONS versions to
+    `version`, so a returning visitor with cached quotes fetches only what
+    moved. Returns {from version: shard}.
+    """
+    log = ChangeLog.load(CHANGE_LOG_FP, CHANGE_LOG_MAX_VERSIONS, version)
+    deltas = {}
+    for since in range(max(log.base_version, version - STATIC_DELTA_VERSIONS), version):
+        delta = log.since(since)
+        if delta is None:
+            continue
+        body = {"from": since, "version": version, **slim_delta(delta, quotes)}
+        deltas[since] = write_shard(writer, f"data/deltas/{since}.json", body)
+    return deltas
+
+def main():
+    writer = SiteWriter(SITE_ROOT, BUILD_MANIFEST_FP)
+
+    # 1) Static assets (HTML, content-hashed JS/CSS)
+    build_assets(writer)
+
+    # 2) Data shards, plus the stable-named manifest pointing at them
+    manifest = export_shards(writer, load_cache())
+    writer.write(f"html/{DATA_MANIFEST}", minified_json(manifest))
+
+    # 3) Make sure a simple redirect index exists (optional nicety)
+    writer.write("index.html", b'<meta http-equiv="refresh" content="0; url=html/watchlist.html" />')
+
+    writer.finish()
+    print("Static build complete -> site/html")
 
 if __name__ == "__main__":
     main()
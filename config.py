@@ -1,10 +1,107 @@
 # Server configuration
 PORT = 8000
+# Worker processes of server.py (1: a single threaded process). With more,
+# a writer process on WRITER_PORT takes every request that changes the cache
+# and the workers serve the snapshot it publishes
+SERVER_WORKERS = 1
+WRITER_PORT = 8001
+WRITER_TIMEOUT = 600
+# Seconds between checks for a cache file published by another process
+SNAPSHOT_CHECK_INTERVAL = 1.0
 
 # Cache configuration
 CACHE_DIR = 'cache'
 CACHE_FILE = 'stock_data.json'
+# Per-version symbol changes served by CHANGES_ENDPOINT
+CHANGE_LOG_FILE = 'change_log.json'
+CHANGE_LOG_MAX_VERSIONS = 100
 
 # API configuration
 STOCK_INFO_ENDPOINT = '/saved_stock_info'
-COMMIT_REFRESH_ENDPOINT = '/commit_refresh' 
\ No newline at end of file
+COMMIT_REFRESH_ENDPOINT = '/commit_refresh' 
+ETF_EXPOSURE_ENDPOINT = '/api/etf_exposure'
+LOOKTHROUGH_EXPOSURE_ENDPOINT = '/api/exposure'
+CHANGES_ENDPOINT = '/api/changes'
+HISTORY_ENDPOINT = '/api/history'
+HEATMAP_ENDPOINT = '/api/heatmap'
+RISK_ENDPOINT = '/api/risk'
+SEARCH_ENDPOINT = '/api/search'
+SEARCH_DEFAULT_LIMIT = 20
+ALERTS_ENDPOINT = '/api/alerts'
+WATCHLISTS_ENDPOINT = '/api/watchlists'
+# POST starts a refresh job; GET <endpoint>/<id> polls it (?stream=1 for server-sent events)
+REFRESH_JOBS_ENDPOINT = '/api/refresh_jobs'
+
+# Instrumentation
+METRICS_ENDPOINT = '/metrics'
+METRICS_SUMMARY_FILE = 'refresh_metrics.json'
+PROFILE_DIR = 'profiles'
+
+# Upstream rate limiting
+RATE_LIMIT_STATE_FILE = 'rate_limit_state.json'
+RATE_LIMIT_MIN_CONCURRENCY = 1
+RATE_LIMIT_MAX_CONCURRENCY = 8
+RATE_LIMIT_MAX_RETRIES = 5
+
+# Refresh retry queue / checkpointing
+REFRESH_RETRY_ROUNDS = 2
+REFRESH_RETRY_BATCH_SIZE = 5
+REFRESH_RETRY_BACKOFF = 2.0
+REFRESH_CHECKPOINT_FILE = 'refresh_checkpoint.json'
+REFRESH_CHECKPOINT_MAX_AGE = 6 * 60 * 60
+
+# Streaming refresh (run_cache_update --stream) for large universes: symbols
+# per chunk, chunks in flight, and the resident memory (MB) above which the
+# bar tables are flushed and chunks shrink
+STREAM_CHUNK_SIZE = 200
+STREAM_WORKERS = 2
+STREAM_MAX_MEMORY_MB = 1024
+STREAM_MIN_CHUNK_SIZE = 10
+
+# Refresh jobs (REFRESH_JOBS_ENDPOINT): jobs run at once, symbols per
+# incremental commit, finished jobs kept for polling, and seconds between
+# keep-alive progress events on a streamed job that is not changing
+REFRESH_JOB_WORKERS = 2
+REFRESH_JOB_CHUNK_SIZE = 25
+REFRESH_JOBS_KEEP = 50
+REFRESH_JOB_STREAM_INTERVAL = 1.0
+
+# Indicator history: download only the bars each indicator needs to converge
+# within INDICATOR_TOLERANCE (remaining weight of older bars), and only those
+# missing from the local bar store (under CACHE_DIR)
+INDICATOR_TOLERANCE = 1e-3
+BAR_STORE_DIR = 'bars'
+BAR_STORE_ENABLED = True
+# Relative difference between a stored and a re-downloaded closed bar that
+# marks a symbol's history as adjusted upstream (split, dividend)
+BAR_REVISION_TOLERANCE = 1e-4
+
+# Risk stage: correlations / volatility / beta over the last RISK_WINDOW daily
+# returns downloaded by each refresh; betas against the first of RISK_BENCHMARKS in
+# the watchlist. Pairs sharing fewer than RISK_MIN_OBSERVATIONS returns are null
+RISK_WINDOW = 63
+RISK_MIN_OBSERVATIONS = 20
+RISK_BENCHMARKS = ('SPY', 'VOO', 'IVV', 'VTI')
+
+# Watchlists: the default one, plus any WATCHLISTS_DIR/<name>.json in the same
+# format; all of them share one fetched record per symbol
+WATCHLIST_FILE = 'list_watchlist.json'
+WATCHLISTS_DIR = 'watchlists'
+DEFAULT_WATCHLIST = 'default'
+
+# Alert rules checked against every committed refresh (see services/alert_engine.py);
+# which alerts fired when is kept under CACHE_DIR for the cooldown
+ALERT_RULES_FILE = 'alert_rules.json'
+ALERT_STATE_FILE = 'alert_state.json'
+
+# ETF top holdings change slowly; refetch them weekly
+ETF_HOLDINGS_TTL = 7 * 24 * 60 * 60
+
+# Archive of committed refreshes (under CACHE_DIR); intraday rows are kept for
+# HISTORY_INTRADAY_DAYS, then reduced to the daily close
+HISTORY_DIR = 'history'
+HISTORY_INTRADAY_DAYS = 30
+HISTORY_FIELDS = (
+    'Close', 'Open', 'High', 'Low', 'Price Change', 'Percent Change', 'Market Cap',
+    'RSI', 'RSI1H', 'yRSI', 'ATR', 'ATR_Percent', 'Trailing PE', 'Forward PE', 'EV/EBITDA',
+)
@@ -1,19 +1,37 @@
 from http.server import SimpleHTTPRequestHandler
+import http.client
 import json
 import os
 import traceback
 from urllib.parse import urlparse, parse_qs
 import logging
-from datetime import datetime
+import math
+import time
+from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from config import STOCK_INFO_ENDPOINT, COMMIT_REFRESH_ENDPOINT
-from services.stock_service import fetch_category_data, fetch_detailed_info, cache as _cache, update_stock_flag, fetch_earnings_data, RateLimitError, watchlist_data, _is_etf_category, fetch_etf_top_holdings
+from config import STOCK_INFO_ENDPOINT, COMMIT_REFRESH_ENDPOINT, METRICS_ENDPOINT, ETF_EXPOSURE_ENDPOINT, LOOKTHROUGH_EXPOSURE_ENDPOINT, CHANGES_ENDPOINT, HISTORY_ENDPOINT, HISTORY_INTRADAY_DAYS, HEATMAP_ENDPOINT, RISK_ENDPOINT, SEARCH_ENDPOINT, SEARCH_DEFAULT_LIMIT, ALERTS_ENDPOINT, WATCHLISTS_ENDPOINT, REFRESH_JOBS_ENDPOINT, REFRESH_JOB_STREAM_INTERVAL, SNAPSHOT_CHECK_INTERVAL, WRITER_TIMEOUT
+from utils.metrics import metrics, HTTP_BUCKETS
+from utils import columnar
+from services.stock_service import fetch_category_data, fetch_detailed_info, cache as _cache, update_stock_flag, fetch_earnings_data, RateLimitError, watchlist_data, _is_etf_category, get_etf_exposure, ETF_HOLDINGS_INDEX_KEY, get_lookthrough_exposure, get_history, get_heatmap, get_risk, search_symbols, get_recent_alerts, get_watchlist_category, refresh_watchlist_category, category_cache_key, reload_watchlist_if_changed
+from services import watchlists
+from services.refresh_jobs import refresh_jobs, FINISHED
+from services.exposure_service import DEFAULT_TOP_SYMBOLS
+from models.snapshot import MappedSnapshot
 
 log = logging.getLogger(__name__)
 
 DEFAULT_TTL = 60 * 60 * 24  # 24h
 
+# format -> (cache version key, encoded body, content type)
+_columnar_cache = {}
+
+# The published cache file, served as-is by /api/all_stock_data
+_snapshot_file = MappedSnapshot(_cache.cache_file)
+
+# Response headers not copied when relaying the writer's response
+_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'server', 'date'}
+
 def get_cache(key):
     try:
         return _cache.get(key)
@@ -40,42 +58,128 @@ def set_cache_safe(key, value, ttl_seconds=DEFAULT_TTL):
     log.error("set_cache_safe: unable to call StockCache.set for key=%s", key)
     return None
 
-def _etf_holdings_cache_key(sym: str) -> str:
-    return f"etf_holdings::{(sym or '').upper()}"
-
-def _add_holdings_to_etfs(items, fetch_func):
-    """Add top-holdings into each ETF item; never raise."""
-    out = []
-    for item in items or []:
-        try:
-            sym = item.get("Symbol") or item.get("symbol")
-            if not sym:
-                out.append(item); continue
-
-            key = _etf_holdings_cache_key(sym)
-            cached = get_cache(key)
-            if cached is None:
-                try:
-                    holdings = fetch_func(sym)  # list[ {symbol,name,weight} ]
-                    set_cache_safe(key, holdings, ttl_seconds=DEFAULT_TTL)
-                except Exception:
-                    log.exception("fetch_etf_top_holdings failed for %s", sym)
-                    holdings = []
-            else:
-                holdings = cached
-            item["holdings"] = holdings
-        except Exception:
-            log.exception("enrich holdings failed for item=%s", item.get("Symbol"))
-        finally:
-            out.append(item)
-    return out
+def _parse_positions(query_params):
+    """
+    (symbols, weights) from ?symbols=AAPL,MSFT and ?weights=AAPL:60,MSFT:40;
+    ValueError for a weight that is not a number.
+    """
+    symbols = [s.strip() for s in query_params.get('symbols', [''])[0].split(',') if s.strip()]
+    weights = {}
+    for pair in query_params.get('weights', [''])[0].split(','):
+        if ':' in pair:
+            sym, w = pair.split(':', 1)
+            weights[sym.strip()] = float(w)
+    return symbols, weights
+
+# Paths served by the handler, the only ones used as metrics labels as they are
+_ROUTES = frozenset({
+    STOCK_INFO_ENDPOINT, COMMIT_REFRESH_ENDPOINT, '/api/earnings', '/api/all_stock_data', '/api/update_flag',
+    ETF_EXPOSURE_ENDPOINT, LOOKTHROUGH_EXPOSURE_ENDPOINT, CHANGES_ENDPOINT, HISTORY_ENDPOINT, HEATMAP_ENDPOINT,
+    RISK_ENDPOINT, SEARCH_ENDPOINT, ALERTS_ENDPOINT, WATCHLISTS_ENDPOINT, REFRESH_JOBS_ENDPOINT, METRICS_ENDPOINT,
+})
+
+def _route_label(path, status):
+    """Collapse a request path into a bounded metrics label."""
+    if path.startswith('/html/'):
+        return 'static'
+    if path.startswith(REFRESH_JOBS_ENDPOINT + '/'):
+        # One label for every job id
+        return REFRESH_JOBS_ENDPOINT + '/:id'
+    if path in _ROUTES:
+        return path
+    return 'not_found' if status == 404 else 'other'
 
 class ChartRequestHandler(SimpleHTTPRequestHandler):
     """HTTP request handler for stock chart and data requests"""
-    
+
+    # (host, port) of the writer process when this is a worker of a
+    # multi-process server (server.py --workers): requests that change the
+    # cache are relayed there, everything else is read from the snapshot
+    writer_address = None
+
+    def send_response(self, code, message=None):
+        # Remember the status so request metrics can be labelled with it
+        self._status_code = code
+        super().send_response(code, message)
+
+    def _record_request(self, method, path, started):
+        status = getattr(self, '_status_code', None)
+        route = _route_label(path, status)
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started,
+                        buckets=HTTP_BUCKETS, route=route, method=method)
+        metrics.inc("http_requests_total", route=route, method=method, status=status)
+
     def do_GET(self):
         """Handle GET requests"""
         parsed_path = urlparse(self.path)
+        started = time.perf_counter()
+        try:
+            # Pick up a cache generation (or watchlist edit) published by another process
+            _cache.reload_if_changed(SNAPSHOT_CHECK_INTERVAL)
+            reload_watchlist_if_changed()
+            if self.writer_address and self._writes_cache(parsed_path):
+                self._relay_to_writer('GET')
+            else:
+                self._route_get(parsed_path)
+        finally:
+            self._record_request('GET', parsed_path.path, started)
+
+    def _writes_cache(self, parsed_path):
+        """Whether a GET changes the cache (or reads state only the writer has)"""
+        path = parsed_path.path
+        if path == COMMIT_REFRESH_ENDPOINT or path == REFRESH_JOBS_ENDPOINT or path.startswith(REFRESH_JOBS_ENDPOINT + '/'):
+            return True
+        if path == ALERTS_ENDPOINT:
+            # Only the writer's engine sees commits (workers reload snapshots)
+            return True
+        if path == STOCK_INFO_ENDPOINT:
+            query_params = parse_qs(parsed_path.query)
+            if query_params.get('refresh', ['false'])[0].lower() == 'true':
+                return True
+            # A category with nothing cached yet is fetched (and stored) on demand
+            category = query_params.get('category', [None])[0]
+            watchlist = query_params.get('watchlist', [None])[0]
+            return bool(category) and watchlists.is_default(watchlist) and not get_cache(category_cache_key(category))
+        return False
+
+    def _relay_to_writer(self, method):
+        """Forward this request to the writer process and stream its response back"""
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        headers = {k: v for k, v in self.headers.items() if k.lower() in ('content-type', 'content-length', 'accept')}
+        try:
+            conn = http.client.HTTPConnection(*self.writer_address, timeout=WRITER_TIMEOUT)
+            conn.request(method, self.path, body=body, headers=headers)
+            response = conn.getresponse()
+        except OSError as e:
+            log.error(f"Writer process unreachable: {e}")
+            self.send_error(503, "Writer process unavailable")
+            return
+
+        self.send_response(response.status)
+        for name, value in response.getheaders():
+            if name.lower() not in _HOP_HEADERS:
+                self.send_header(name, value)
+        if response.getheader('Content-Length') is None:
+            # Streamed (server-sent events): relay until the writer closes
+            self.close_connection = True
+        self.end_headers()
+        try:
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            conn.close()
+        # Read-your-writes: the writer has published by now
+        _cache.reload_if_changed()
+
+    def _route_get(self, parsed_path):
+        """Dispatch a GET request to its handler"""
         query_params = parse_qs(parsed_path.query)
 
         # Combined endpoint for stock data and detailed info
@@ -92,7 +196,51 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
 
         # New endpoint to serve the entire cache file for RSI table
         elif parsed_path.path == '/api/all_stock_data':
-            self._handle_all_stock_data()
+            self._handle_all_stock_data(query_params)
+
+        # Which watchlist ETFs hold a symbol
+        elif parsed_path.path == ETF_EXPOSURE_ENDPOINT:
+            self._handle_etf_exposure(query_params)
+
+        # Look-through exposure of Owned (or any symbol set) via the ETFs
+        elif parsed_path.path == LOOKTHROUGH_EXPOSURE_ENDPOINT:
+            self._handle_lookthrough_exposure(query_params)
+
+        # Symbol changes since a cache version, for polling clients
+        elif parsed_path.path == CHANGES_ENDPOINT:
+            self._handle_changes(query_params)
+
+        # Archived field values of committed refreshes
+        elif parsed_path.path == HISTORY_ENDPOINT:
+            self._handle_history(query_params)
+
+        # Sector / industry rollups for the native heatmap
+        elif parsed_path.path == HEATMAP_ENDPOINT:
+            self._handle_heatmap()
+
+        # Correlation / beta / volatility of Owned (or any symbol set)
+        elif parsed_path.path == RISK_ENDPOINT:
+            self._handle_risk(query_params)
+
+        # Ranked symbol / name search over the whole watchlist
+        elif parsed_path.path == SEARCH_ENDPOINT:
+            self._handle_search(query_params)
+
+        # Alerts fired by the last refreshes
+        elif parsed_path.path == ALERTS_ENDPOINT:
+            self._handle_alerts(query_params)
+
+        # Names of the watchlists (?watchlist=<name> on the stock info endpoint)
+        elif parsed_path.path == WATCHLISTS_ENDPOINT:
+            self._handle_watchlists()
+
+        # Background refresh jobs: the list, or one job's progress
+        elif parsed_path.path == REFRESH_JOBS_ENDPOINT or parsed_path.path.startswith(REFRESH_JOBS_ENDPOINT + '/'):
+            self._handle_refresh_jobs(parsed_path.path[len(REFRESH_JOBS_ENDPOINT) + 1:], query_params)
+
+        # Prometheus scrape endpoint
+        elif parsed_path.path == METRICS_ENDPOINT:
+            self._handle_metrics()
 
         # Serve static files
         elif parsed_path.path.startswith('/html/'):
@@ -107,20 +255,24 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
         refresh = query_params.get('refresh', ['false'])[0].lower() == 'true'
         is_first = query_params.get('first', ['false'])[0].lower() == 'true'
         is_last = query_params.get('last', ['false'])[0].lower() == 'true'
+        watchlist = query_params.get('watchlist', [None])[0]
+
+        if not watchlists.is_default(watchlist):
+            self._handle_watchlist_category(watchlist, category, refresh)
+            return
 
         try:
             # Use separate cache namespaces for ETFs vs stocks
-            if _is_etf_category(category):
-                cache_key = "etfs:saved_stock_info:v2"
-            else:
-                cache_key = f"stocks:saved_stock_info:{category.strip()}"
+            cache_key = category_cache_key(category)
 
             # Try to serve from cache first if not a refresh request
             if not refresh:
+                # Version before data: a client may re-apply a change it has, but never miss one
+                snapshot = _cache.snapshot
                 cached_data = get_cache(cache_key)
                 if cached_data:
                     logging.info(f"Using cached data for category: {category}")
-                    response_data = { 'data': cached_data, 'last_updated': _cache.last_updated }
+                    response_data = { 'data': cached_data, 'last_updated': snapshot.last_updated, 'version': snapshot.version }
                     self.send_response(200)
                     self.send_header('Content-type', 'application/json')
                     self.end_headers()
@@ -129,11 +281,9 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
 
             # If refreshing or cache is empty, fetch data
             logging.info(f"Fetching fresh data for category: {category}")
+            # ETF holdings (and the reverse holdings index) are attached by fetch_category_data
             data = fetch_category_data(category, refresh=refresh)
 
-            if _is_etf_category(category):
-                data = _add_holdings_to_etfs(data, fetch_etf_top_holdings)
-
             set_cache_safe(cache_key, data, ttl_seconds=3600)
             
             # Format the timestamp consistently with the cache
@@ -141,7 +291,7 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
             ct_time = utc_now.astimezone(ZoneInfo("US/Central"))
             last_updated_str = ct_time.strftime('%m/%d %I:%M %p CT')
             
-            response_payload = {"data": data, "last_updated": last_updated_str}
+            response_payload = {"data": data, "last_updated": last_updated_str, "version": _cache.version}
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.end_headers()
@@ -154,6 +304,40 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(f"load_items failed: {e}".encode())
 
+    def _handle_watchlist_category(self, watchlist, category, refresh):
+        """A category of a named watchlist, assembled from the shared per-symbol records"""
+        try:
+            if refresh:
+                data = refresh_watchlist_category(watchlist, category)
+            else:
+                data = get_watchlist_category(watchlist, category)
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        except KeyError:
+            self.send_error(404, f"Unknown watchlist: {watchlist}")
+            return
+        except RateLimitError as e:
+            self.send_error(429, str(e))
+            return
+
+        body = json.dumps({'data': data, 'last_updated': _cache.last_updated, 'version': _cache.version,
+                           'watchlist': watchlist}).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_watchlists(self):
+        """Names of the available watchlists, the default one first"""
+        body = json.dumps({'watchlists': watchlists.list_watchlists()}).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def _handle_commit_refresh(self):
         """Handle commit refresh requests"""
         success = _cache.commit_refresh()
@@ -161,17 +345,28 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.end_headers()
-        self.wfile.write(json.dumps({"success": success}).encode())
+        self.wfile.write(json.dumps({"success": success, "version": _cache.version}).encode())
+
+    def _handle_all_stock_data(self, query_params=None):
+        """
+        Serve the entire cached stock data file. ?format=arrow|npz (or a matching
+        Accept header) returns every symbol's record as typed columns instead.
+        """
+        fmt = (query_params or {}).get('format', [None])[0] or columnar.format_from_accept(self.headers.get('Accept'))
+        if fmt and fmt != 'json':
+            self._send_columnar(fmt)
+            return
 
-    def _handle_all_stock_data(self):
-        """Serve the entire cached stock data file."""
-        cache_path = os.path.join('cache', 'stock_data.json')
         try:
-            with open(cache_path, 'rb') as f:
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(f.read())
+            view = _snapshot_file.view()
+            if view is None:
+                raise FileNotFoundError(_cache.cache_file)
+            # Straight from the mapped snapshot, shared by every serving process
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(view)))
+            self.end_headers()
+            self.wfile.write(view)
         except FileNotFoundError:
             self.send_response(404)
             self.send_header('Content-type', 'application/json')
@@ -181,6 +376,252 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, str(e))
 
+    def _handle_etf_exposure(self, query_params):
+        """
+        ETFs holding ?symbol=XYZ, heaviest first. Without a symbol the whole
+        reverse holdings index is returned.
+        """
+        symbol = query_params.get('symbol', [None])[0]
+        if symbol:
+            payload = {'symbol': symbol.upper(), 'etfs': get_etf_exposure(symbol)}
+        else:
+            payload = {'index': get_cache(ETF_HOLDINGS_INDEX_KEY) or {}}
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode())
+
+    def _handle_lookthrough_exposure(self, query_params):
+        """
+        Aggregated exposure per underlying symbol, sector and industry.
+        ?symbols=VOO,AAPL for an equal-weight set, ?weights=VOO:60,AAPL:40 for
+        explicit weights; defaults to the Owned stocks. ?top=N limits bySymbol.
+        """
+        try:
+            top = int(query_params.get('top', [DEFAULT_TOP_SYMBOLS])[0])
+            symbols, weights = _parse_positions(query_params)
+        except ValueError as e:
+            self.send_error(400, f"Invalid exposure query: {e}")
+            return
+
+        payload = get_lookthrough_exposure(symbols or None, weights or None, top=top)
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode())
+
+    def _handle_changes(self, query_params):
+        """
+        Symbol record changes after ?since=<version>: {version, full: false,
+        changes: {SYM: {field: value}}, removed, lists}. Removed fields come
+        back as null and `lists` carries the new symbol order of any cache list
+        that changed. Clients without a version, or too far behind the change
+        log, get {version, full: true, records, lists} instead.
+        """
+        since = query_params.get('since', [None])[0]
+        try:
+            delta = _cache.changes_since(int(since)) if since is not None else None
+        except ValueError:
+            self.send_error(400, f"Invalid version: {since}")
+            return
+
+        snapshot = _cache.snapshot
+        if delta is not None:
+            payload = {'full': False, 'since': int(since), **delta}
+        else:
+            # Records, lists and version all from one snapshot
+            payload = {
+                'full': True,
+                'version': snapshot.version,
+                'records': snapshot.symbol_index(),
+                'lists': snapshot.symbol_lists(),
+            }
+        payload['last_updated'] = snapshot.last_updated
+        metrics.inc("delta_responses_total", kind="full" if payload['full'] else "delta")
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_heatmap(self):
+        """Per-category and per-industry rollups precomputed at the last commit"""
+        body = json.dumps({'heatmap': get_heatmap(), 'last_updated': _cache.last_updated}).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_risk(self, query_params):
+        """
+        Correlation matrix, annualised volatility and beta (vs the benchmark
+        ETF) from the last commit. ?symbols=AAPL,MSFT or ?weights=AAPL:60,MSFT:40
+        pick the set and portfolio weights; defaults to the Owned stocks.
+        """
+        try:
+            symbols, weights = _parse_positions(query_params)
+        except ValueError as e:
+            self.send_error(400, f"Invalid risk query: {e}")
+            return
+
+        payload = get_risk(symbols or None, weights or None)
+        if payload is None:
+            self.send_error(404, "Risk matrix not built yet; it is computed with the next refresh")
+            return
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_search(self, query_params):
+        """
+        ?q=<text> -> {query, results: [{symbol, name, category, industry, score}]},
+        best first. ?limit=N caps the results; ?fuzzy=0 turns off typo matching.
+        """
+        query = query_params.get('q', [''])[0]
+        try:
+            limit = int(query_params.get('limit', [SEARCH_DEFAULT_LIMIT])[0])
+        except ValueError as e:
+            self.send_error(400, f"Invalid search limit: {e}")
+            return
+        fuzzy = query_params.get('fuzzy', ['1'])[0].lower() not in ('0', 'false', 'no')
+
+        body = json.dumps({'query': query, 'results': search_symbols(query, limit=max(limit, 0), fuzzy=fuzzy)}).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_alerts(self, query_params):
+        """Recently fired alerts, newest first: {alerts: [{rule, symbol, message, time, version}]}"""
+        try:
+            limit = int(query_params.get('limit', [50])[0])
+        except ValueError as e:
+            self.send_error(400, f"Invalid alerts limit: {e}")
+            return
+
+        body = json.dumps({'alerts': get_recent_alerts(limit)}).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_refresh_jobs(self, job_id, query_params):
+        """
+        Without an id, every kept job, newest first: {jobs: [...]}. With one,
+        that job's progress: {id, status, total, done, failed, failures,
+        etaSeconds, version, ...}; ?stream=1 (or Accept: text/event-stream)
+        sends it as server-sent events until the job finishes.
+        """
+        if not job_id:
+            payload = {'jobs': [job.to_dict() for job in refresh_jobs.list()]}
+        else:
+            job = refresh_jobs.get(job_id)
+            if job is None:
+                self.send_error(404, f"Unknown refresh job: {job_id}")
+                return
+            stream = query_params.get('stream', ['0'])[0].lower() in ('1', 'true', 'yes')
+            if stream or 'text/event-stream' in (self.headers.get('Accept') or ''):
+                self._stream_refresh_job(job)
+                return
+            payload = job.to_dict()
+
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_refresh_job(self, job):
+        """
+        A `progress` event as soon as the job changes, and every
+        REFRESH_JOB_STREAM_INTERVAL while it does not (keep-alive), until it finishes
+        """
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+        revision = None
+        try:
+            while True:
+                revision = job.wait_for_change(revision, REFRESH_JOB_STREAM_INTERVAL)
+                state = job.to_dict()
+                self.wfile.write(f"event: progress\ndata: {json.dumps(state)}\n\n".encode())
+                self.wfile.flush()
+                if state['status'] in FINISHED:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped listening; the job carries on
+            pass
+
+    def _handle_history(self, query_params):
+        """
+        Archived values per refresh: ?symbols=AAPL,MSFT (required),
+        ?fields=RSI,Close (default: every archived field), ?start=/?end=
+        YYYY-MM-DD (default: the last HISTORY_INTRADAY_DAYS days). Returns
+        {symbol: {t: [epoch seconds], field: [values]}}; missing values are null.
+        """
+        symbols = [s.strip() for s in query_params.get('symbols', query_params.get('symbol', ['']))[0].split(',') if s.strip()]
+        fields = [f.strip() for f in query_params.get('fields', [''])[0].split(',') if f.strip()] or None
+        try:
+            end = date.fromisoformat(query_params['end'][0]) if 'end' in query_params else None
+            start = (date.fromisoformat(query_params['start'][0]) if 'start' in query_params
+                     else (end or date.today()) - timedelta(days=HISTORY_INTRADAY_DAYS))
+        except ValueError as e:
+            self.send_error(400, f"Invalid history query: {e}")
+            return
+        if not symbols:
+            self.send_error(400, "symbols is required")
+            return
+
+        history = get_history(symbols, fields, start, end)
+        payload = {sym: {k: [None if isinstance(v, float) and math.isnan(v) else v for v in values]
+                         for k, values in cols.items()}
+                   for sym, cols in history.items()}
+        body = json.dumps({'start': start.isoformat(), 'end': end.isoformat() if end else None,
+                           'history': payload}).encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_columnar(self, fmt):
+        """All cached symbol records in a columnar format, encoded once per cache version"""
+        snapshot = _cache.snapshot
+        key = (fmt, snapshot.version, snapshot.last_updated)
+        cached = _columnar_cache.get(fmt)
+        if cached is None or cached[0] != key:
+            try:
+                body, content_type = columnar.encode(list(snapshot.symbol_index().values()), fmt)
+            except (ValueError, ImportError) as e:
+                self.send_error(406, f"{e}; available formats: json, {', '.join(columnar.available_formats())}")
+                return
+            cached = _columnar_cache[fmt] = (key, body, content_type)
+        _, body, content_type = cached
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_metrics(self):
+        """Serve all counters and histograms in Prometheus text format"""
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def _handle_earnings_request(self, query_params):
         """Handle earnings calendar data requests"""
         try:
@@ -222,8 +663,22 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
     def do_POST(self):
         """Handle POST requests"""
         parsed_path = urlparse(self.path)
-        
-        if parsed_path.path == '/api/update_flag':
+        started = time.perf_counter()
+        try:
+            if self.writer_address:
+                self._relay_to_writer('POST')
+            else:
+                _cache.reload_if_changed(SNAPSHOT_CHECK_INTERVAL)
+                reload_watchlist_if_changed()
+                self._route_post(parsed_path)
+        finally:
+            self._record_request('POST', parsed_path.path, started)
+
+    def _route_post(self, parsed_path):
+        """Dispatch a POST request to its handler"""
+        if parsed_path.path == REFRESH_JOBS_ENDPOINT:
+            self._handle_start_refresh_job()
+        elif parsed_path.path == '/api/update_flag':
             try:
                 content_length = int(self.headers['Content-Length'])
                 post_data = self.rfile.read(content_length)
@@ -235,7 +690,7 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
                 if symbol is None or new_flag is None:
                     raise ValueError("Missing symbol or flag parameter")
                     
-                success = update_stock_flag(symbol, new_flag)
+                success = update_stock_flag(symbol, new_flag, watchlist=data.get('watchlist'))
                 
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
@@ -251,4 +706,36 @@ class ChartRequestHandler(SimpleHTTPRequestHandler):
                     'error': str(e)
                 }).encode())
         else:
-            self.send_error(404, "Endpoint not found")
\ No newline at end of file
+            self.send_error(404, "Endpoint not found")
+
+    def _handle_start_refresh_job(self):
+        """
+        Queue a refresh of {"categories": [...], "symbols": [...], "watchlist": name}
+        and answer 202 with the job at once; poll or stream it at
+        REFRESH_JOBS_ENDPOINT/<id>. An identical job still running is returned
+        instead of starting another.
+        """
+        try:
+            content_length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(content_length) or b'{}')
+            categories = data.get('categories') or []
+            symbols = data.get('symbols') or []
+            if isinstance(categories, str):
+                categories = [categories]
+            if isinstance(symbols, str):
+                symbols = symbols.split(',')
+            job, created = refresh_jobs.submit(categories, symbols, data.get('watchlist'))
+        except (ValueError, AttributeError, TypeError) as e:
+            self.send_error(400, f"Invalid refresh job: {e}")
+            return
+        except KeyError as e:
+            self.send_error(404, f"Unknown watchlist: {e.args[0]}")
+            return
+
+        body = json.dumps({**job.to_dict(), 'created': created}).encode()
+        self.send_response(202)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Location', f"{REFRESH_JOBS_ENDPOINT}/{job.id}")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -174,6 +174,7 @@ function renderCalendar(earningsData = {}) {
 
                     companyDiv.innerHTML = `
                         <button class="company-info-btn"
+                                data-symbol="${escapeHtml(company.Symbol || company.symbol || '')}"
                                 data-stock-name="${escapeHtml(stockName)}"
                                 data-fifty-two-week-high="${escapeHtml(high52)}"
                                 data-current-price="${stockClose != null ? escapeHtml(stockClose.toFixed(2)) : 'N/A'}"
@@ -257,6 +258,7 @@ function renderCalendar(earningsData = {}) {
 
                     companyDiv.innerHTML = `
                         <button class="company-info-btn"
+                                data-symbol="${escapeHtml(company.Symbol || company.symbol || '')}"
                                 data-stock-name="${escapeHtml(stockName)}"
                                 data-fifty-two-week-high="${escapeHtml(high52)}"
                                 data-current-price="${stockClose != null ? escapeHtml(stockClose.toFixed(2)) : 'N/A'}"
@@ -1,27 +1,135 @@
 // Detect local dev
 const isLocal = () => ["localhost","127.0.0.1"].includes(location.hostname);
 
-let staticCache = null;
+// --- Deployed (GitHub Pages): sharded static export ---
+// data/manifest.json keeps a stable name and points at content-hashed shards:
+//   shards.quotes        slim records (no descriptions/holdings) for every symbol
+//   categories[cat]      the symbols of one category, in display order
+//   shards.descriptions  symbol -> description, loaded on demand
+//   shards.holdings      ETF -> {holdings, fund_stats}, loaded on demand
+//   shards.etf_exposure  constituent -> [{etf, weight}]
+//   shards.heatmap       category / industry rollups for the native heatmap
+//   deltas[version]      quotes changes from an older cache version to `version`
+let staticManifest = null;
+const shardRequests = new Map();
+let quotesRequest = null;
 
-async function fetchStaticCache() {
-    if (staticCache) return staticCache;
+// Quotes from the last visit, so a returning page only fetches a delta
+const QUOTES_STORE_KEY = 'cachebandit:quotes';
+
+async function fetchStaticManifest() {
+    if (staticManifest) return staticManifest;
     try {
-        const res = await fetch('cache/stock_data.json'); // or './cache/stock_data.json'
-        if (!res.ok) throw new Error(`Failed to fetch static cache: ${res.status}`);
-        staticCache = await res.json();
-        return staticCache;
+        const res = await fetch('data/manifest.json', { cache: "no-cache" });
+        if (!res.ok) throw new Error(`Failed to fetch data manifest: ${res.status}`);
+        staticManifest = await res.json();
     } catch (error) {
-        console.error("Error fetching static cache:", error);
-        return { data: {}, last_updated: "N/A" };
+        console.error("Error fetching data manifest:", error);
+        return { shards: {}, categories: {}, symbols: {}, updated_at: "N/A" };
+    }
+    return staticManifest;
+}
+
+// Each shard is fetched once per page, however many callers ask for it
+function fetchShard(path, fallback) {
+    if (!path) return Promise.resolve(fallback);
+    if (!shardRequests.has(path)) {
+        shardRequests.set(path, fetch(path)
+            .then(res => {
+                if (!res.ok) throw new Error(`Failed to fetch ${path}: ${res.status}`);
+                return res.json();
+            })
+            .catch(error => {
+                console.error(`Error fetching shard ${path}:`, error);
+                shardRequests.delete(path);
+                return fallback;
+            }));
+    }
+    return shardRequests.get(path);
+}
+
+async function fetchNamedShard(name) {
+    const manifest = await fetchStaticManifest();
+    return fetchShard((manifest.shards || {})[name], {});
+}
+
+function readStoredQuotes() {
+    try {
+        return JSON.parse(localStorage.getItem(QUOTES_STORE_KEY));
+    } catch {
+        return null;
+    }
+}
+
+function storeQuotes(version, quotes) {
+    if (version == null) return;
+    try {
+        localStorage.setItem(QUOTES_STORE_KEY, JSON.stringify({ version, quotes }));
+    } catch {
+        // Storage full or disabled; the next visit just loads the full shard
     }
 }
 
+function applyDelta(quotes, delta) {
+    for (const [sym, fields] of Object.entries(delta.changes || {})) {
+        const record = { ...(quotes[sym] || {}) };
+        for (const [key, value] of Object.entries(fields)) {
+            if (value === null) delete record[key];
+            else record[key] = value;
+        }
+        quotes[sym] = record;
+    }
+    for (const sym of delta.removed || []) delete quotes[sym];
+    return quotes;
+}
+
+// The quotes shard, or the stored quotes plus the delta from their version
+async function loadQuotes() {
+    const manifest = await fetchStaticManifest();
+    const version = manifest.version;
+    const stored = readStoredQuotes();
+    if (stored && version != null) {
+        if (stored.version === version) return stored.quotes;
+        const deltaPath = (manifest.deltas || {})[stored.version];
+        if (deltaPath) {
+            const delta = await fetchShard(deltaPath, null);
+            if (delta) {
+                const quotes = applyDelta(stored.quotes || {}, delta);
+                storeQuotes(version, quotes);
+                return quotes;
+            }
+        }
+    }
+    const quotes = await fetchNamedShard('quotes');
+    storeQuotes(version, quotes);
+    return quotes;
+}
+
+function getQuotes({ full = false } = {}) {
+    if (full) {
+        quotesRequest = fetchNamedShard('quotes').then(async quotes => {
+            storeQuotes((await fetchStaticManifest()).version, quotes);
+            return quotes;
+        });
+    } else if (!quotesRequest) {
+        quotesRequest = loadQuotes();
+    }
+    return quotesRequest;
+}
+
+// Named watchlist picked with ?watchlist=<name> in the page URL (local server only)
+export function currentWatchlist() {
+    return new URLSearchParams(location.search).get('watchlist');
+}
+
 export async function getCategoryData(category, { refresh = false, scope } = {}) {
     // --- Local dev: hit the Python server endpoint ---
     if (isLocal()) {
         // If you changed STOCK_INFO_ENDPOINT in config.py,
         // update this path to match it.
-        const url = `/saved_stock_info?category=${encodeURIComponent(category)}&refresh=${refresh}`;
+        const watchlist = currentWatchlist();
+        const url = `/saved_stock_info?category=${encodeURIComponent(category)}&refresh=${refresh}` +
+            (watchlist ? `&watchlist=${encodeURIComponent(watchlist)}` : '');
         const res = await fetch(url, { cache: "no-store" });
         if (!res.ok) {
             let body = "";
@@ -31,36 +139,98 @@ export async function getCategoryData(category, { refresh = false, scope } = {})
         return res.json();
     }
 
-    // --- Deployed (GitHub Pages): use static cache/stock_data.json ---
-    const cache = await fetchStaticCache();
-    const root = cache.data || cache || {};
-    const trimmed = category.trim();
+    // --- Deployed (GitHub Pages): category shard joined with the shared quotes shard ---
+    const manifest = await fetchStaticManifest();
+    const lastUpdated = manifest.updated_at || 'N/A';
+    const shardPath = (manifest.categories || {})[category.trim()];
+    if (!shardPath) return { data: [], last_updated: lastUpdated };
 
-    let key;
+    let [shard, quotes] = await Promise.all([
+        fetchShard(shardPath, { symbols: [] }),
+        getQuotes(),
+    ]);
+    const members = shard.symbols || [];
+    // Stored quotes can miss a symbol that joined without changing; reload them once
+    if (members.some(sym => !quotes[sym])) quotes = await getQuotes({ full: true });
+    const data = members.map(sym => quotes[sym]).filter(Boolean);
 
-    if (trimmed === 'ETFs') {
-        // Prefer new ETF key if present, otherwise fall back to static-style key
-        if ('etfs:saved_stock_info:v2' in root) {
-            key = 'etfs:saved_stock_info:v2';
-        } else if ('category_ETFs' in root) {
-            key = 'category_ETFs';
-        } else {
-            key = null;
-        }
-    } else {
-        const kNew = `stocks:saved_stock_info:${trimmed}`;
-        const kOld = `category_${trimmed}`;
-        if (kNew in root) {
-            key = kNew;
-        } else if (kOld in root) {
-            key = kOld;
+    return { data, last_updated: lastUpdated };
+}
+
+// Description of a symbol. The local API already embeds descriptions in the
+// records, so this only loads the descriptions shard on the static site.
+export async function getDescription(symbol) {
+    if (isLocal() || !symbol) return null;
+    const descriptions = await fetchNamedShard('descriptions');
+    return descriptions[symbol] || null;
+}
+
+// {holdings, fund_stats, stock_description} for an ETF on the static site;
+// null locally, where the ETF records carry them.
+export async function getEtfDetails(symbol) {
+    if (isLocal() || !symbol) return null;
+    const [holdings, description] = await Promise.all([
+        fetchNamedShard('holdings'),
+        getDescription(symbol),
+    ]);
+    return { ...(holdings[symbol] || {}), stock_description: description };
+}
+
+
+// Reverse ETF holdings index: { SYMBOL: [ {etf, weight}, ... ] }
+let exposureIndex = null;
+
+export async function getEtfExposureIndex({ refresh = false } = {}) {
+    if (exposureIndex && !refresh) return exposureIndex;
+    try {
+        if (isLocal()) {
+            const res = await fetch('/api/etf_exposure', { cache: "no-store" });
+            if (!res.ok) throw new Error(`API ${res.status} for /api/etf_exposure`);
+            exposureIndex = (await res.json()).index || {};
         } else {
-            key = null;
+            exposureIndex = await fetchNamedShard('etf_exposure');
         }
+    } catch (error) {
+        console.error("Error fetching ETF exposure index:", error);
+        return {};
     }
+    return exposureIndex;
+}
 
-    const data = key ? (root[key] || []) : [];
-    const lastUpdated = cache.last_updated || cache.updated_at || 'N/A';
+// Which watchlist ETFs hold `symbol`, heaviest first
+export async function getEtfExposure(symbol) {
+    const index = await getEtfExposureIndex();
+    return index[(symbol || '').toUpperCase()] || [];
+}
 
-    return { data, last_updated: lastUpdated };
-}
\ No newline at end of file
+// Category / industry rollups computed at the last cache commit
+export async function getHeatmap() {
+    try {
+        if (isLocal()) {
+            const res = await fetch('/api/heatmap', { cache: "no-store" });
+            if (!res.ok) throw new Error(`API ${res.status} for /api/heatmap`);
+            return (await res.json()).heatmap || {};
+        }
+        return await fetchNamedShard('heatmap');
+    } catch (error) {
+        console.error("Error fetching heatmap:", error);
+        return {};
+    }
+}
+
+// Ranked symbol / name / description search across the whole watchlist.
+// Resolves to [{symbol, name, category, industry, score}], or null where the
+// search endpoint is not available (static site) so callers fall back to
+// filtering what is rendered.
+export async function searchSymbols(query, { limit = 500 } = {}) {
+    if (!isLocal()) return null;
+    try {
+        const params = new URLSearchParams({ q: query, limit: String(limit) });
+        const res = await fetch(`/api/search?${params}`, { cache: "no-store" });
+        if (!res.ok) throw new Error(`API ${res.status} for /api/search`);
+        return (await res.json()).results || [];
+    } catch (error) {
+        console.error("Error searching symbols:", error);
+        return null;
+    }
+}
@@ -6,7 +6,7 @@ import {
     formatRsi,
     getRsiBackgroundStyle
 } from './utils.js';
-import { getCategoryData } from './dataSource.js';
+import { getCategoryData, getEtfExposureIndex, getEtfDetails } from './dataSource.js';
 import { showInfoPopup } from './popup.js';
 import { showChartPopup } from './chart.js';
 
@@ -193,7 +193,16 @@ function renderFundOverview(description = "") {
   `;
 }
 
-function renderHoldingsCard(holdings = []) {
+// Reverse holdings index (constituent -> ETFs holding it), loaded with the ETF data
+let exposureIndex = {};
+
+function otherEtfsHolding(sym, etfSymbol) {
+  return (exposureIndex[sym] || [])
+    .filter(e => e.etf !== etfSymbol)
+    .map(e => (e.weight != null && isFinite(e.weight)) ? `${e.etf} (${e.weight.toFixed(2)}%)` : e.etf);
+}
+
+function renderHoldingsCard(holdings = [], etfSymbol = '') {
   if (!holdings || holdings.length === 0) {
     return `
       <div class="holdings-card">
@@ -206,9 +215,11 @@ function renderHoldingsCard(holdings = []) {
     const sym = (h.symbol || '').toUpperCase();
     const wt = (h.weight != null && isFinite(h.weight)) ? h.weight.toFixed(2) + '%' : '—';
     const safeName = h.name || sym || '-';
+    const others = otherEtfsHolding(sym, etfSymbol);
+    const rowTitle = others.length ? ` title="Also held by: ${others.join(', ')}"` : '';
 
     return `
-      <tr>
+      <tr${rowTitle}>
         <td class="h-col-symbol"><span class="symbol-badge">${sym || '-'}</span></td>
         <td class="h-col-name" title="${safeName}">${safeName}</td>
         <td class="h-col-weight h-wt">${wt}</td>
@@ -288,34 +299,7 @@ document.addEventListener('DOMContentLoaded', async function() {
       if (!isOpen) {
         const sym = row?.dataset?.symbol || row.getAttribute('data-symbol');
 
-        // --- Expandable description logic ---
-        const descriptionContainer = expandRow.querySelector('.holdings-card:first-child');
-        if (descriptionContainer) {
-            const descriptionElement = descriptionContainer.querySelector('.etf-description');
-            const expandBtn = descriptionContainer.querySelector('.expand-description-btn');
-
-            if (descriptionElement && expandBtn) {
-                // Use a timeout to allow the browser to render and calculate element heights
-                setTimeout(() => {
-                    const isOverflowing = descriptionElement.scrollHeight > descriptionElement.clientHeight;
-                    
-                    if (isOverflowing) {
-                        expandBtn.style.display = 'block';
-
-                        // Add listener only once
-                        if (!expandBtn.dataset.listenerAttached) {
-                            expandBtn.addEventListener('click', () => {
-                                const isExpanded = descriptionElement.classList.toggle('expanded');
-                                expandBtn.innerHTML = isExpanded ? 'Less ▲' : 'More ▼';
-                            });
-                            expandBtn.dataset.listenerAttached = 'true';
-                        }
-                    } else {
-                        expandBtn.style.display = 'none';
-                    }
-                }, 100); // Delay to ensure rendering is complete
-            }
-        }
+        fillEtfDetails(expandRow, sym).then(() => setupDescriptionToggle(expandRow));
 
         // Wait for layout to apply, then mount, then nudge autosize.
         requestAnimationFrame(() => {
@@ -337,6 +321,52 @@ document.addEventListener('DOMContentLoaded', async function() {
     });
 });
 
+// On the static site holdings, fund stats and descriptions live in shards
+// loaded on first expand; locally the ETF records already carry them.
+async function fillEtfDetails(expandRow, sym) {
+  if (expandRow.dataset.detailsLoaded === 'true') return;
+  expandRow.dataset.detailsLoaded = 'true';
+  const details = await getEtfDetails(sym);
+  if (!details) return;
+  const column = expandRow.querySelector('.left-panel-column');
+  if (column) {
+    column.innerHTML = `
+          ${renderFundOverview(details.stock_description)}
+          ${renderHoldingsCard(details.holdings, sym)}
+          ${renderFundStatsCard(details.fund_stats)}`;
+  }
+}
+
+// --- Expandable description logic ---
+function setupDescriptionToggle(expandRow) {
+  const descriptionContainer = expandRow.querySelector('.holdings-card:first-child');
+  if (!descriptionContainer) return;
+  const descriptionElement = descriptionContainer.querySelector('.etf-description');
+  const expandBtn = descriptionContainer.querySelector('.expand-description-btn');
+
+  if (descriptionElement && expandBtn) {
+      // Use a timeout to allow the browser to render and calculate element heights
+      setTimeout(() => {
+          const isOverflowing = descriptionElement.scrollHeight > descriptionElement.clientHeight;
+          
+          if (isOverflowing) {
+              expandBtn.style.display = 'block';
+
+              // Add listener only once
+              if (!expandBtn.dataset.listenerAttached) {
+                  expandBtn.addEventListener('click', () => {
+                      const isExpanded = descriptionElement.classList.toggle('expanded');
+                      expandBtn.innerHTML = isExpanded ? 'Less ▲' : 'More ▼';
+                  });
+                  expandBtn.dataset.listenerAttached = 'true';
+              }
+          } else {
+              expandBtn.style.display = 'none';
+          }
+      }, 100); // Delay to ensure rendering is complete
+  }
+}
+
 function formatCT(ts) {
   // Accept ISO or plain strings; always show CT-like label
   try {
@@ -361,6 +391,8 @@ async function loadEtfData(opts = {}) {
 
     try {
         const response = await getCategoryData('ETFs', { refresh: isRefreshing, scope: 'etf' });
+        // Loaded after the ETF data so a refresh sees the rebuilt index
+        exposureIndex = await getEtfExposureIndex({ refresh: isRefreshing });
         const lastUpdated = response.updated_at || response.last_updated;
         const ts = document.getElementById('last-updated');
         if (ts && lastUpdated) ts.textContent = `Last Updated: ${formatCT(lastUpdated)}`;
@@ -498,7 +530,7 @@ function renderEtfRow(etf) {
       <div class="expand-panel">
         <div class="left-panel-column">
           ${renderFundOverview(etf.stock_description)}
-          ${renderHoldingsCard(etf.holdings)}
+          ${renderHoldingsCard(etf.holdings, symbol)}
           ${renderFundStatsCard(etf.fund_stats)}
         </div>
         <div class="tv-adv tradingview-widget-container" id="tv-adv-${symbol}">
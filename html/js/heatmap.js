@@ -1,7 +1,86 @@
+import { getHeatmap } from './dataSource.js';
+
 document.addEventListener('DOMContentLoaded', function() {
+    loadWatchlistHeatmap();
     loadHeatmapWidget();
 });
 
+// Green for gains, red for losses, saturating at +/-3%
+function changeColor(change) {
+    if (change === null || change === undefined) return '#d0d0d0';
+    const strength = Math.min(Math.abs(change) / 3, 1);
+    const lightness = 88 - strength * 48;
+    return change >= 0 ? `hsl(140, 55%, ${lightness}%)` : `hsl(0, 65%, ${lightness}%)`;
+}
+
+function formatChange(change) {
+    if (change === null || change === undefined) return 'N/A';
+    return `${change > 0 ? '+' : ''}${change.toFixed(2)}%`;
+}
+
+function describe(group) {
+    const parts = [
+        `${group.name}: ${formatChange(group.change)} (equal-weight ${formatChange(group.equalChange)})`,
+        `${group.advancers} up / ${group.decliners} down / ${group.unchanged} flat`,
+    ];
+    if (group.medianRsi !== null) parts.push(`Median RSI ${group.medianRsi}`);
+    if (group.atrPercent !== null) parts.push(`ATR% ${group.atrPercent} \u00b1 ${group.atrPercentStd}`);
+    if (group.symbols) parts.push(group.symbols.join(', '));
+    return parts.join('\n');
+}
+
+async function loadWatchlistHeatmap() {
+    const container = document.getElementById('watchlist-heatmap');
+    if (!container) return;
+
+    const heatmap = await getHeatmap();
+    const categories = heatmap.categories || [];
+    if (!categories.length) {
+        container.style.display = 'none';
+        return;
+    }
+
+    const industries = {};
+    (heatmap.industries || []).forEach(industry => {
+        (industries[industry.category] = industries[industry.category] || []).push(industry);
+    });
+
+    const fragment = document.createDocumentFragment();
+    categories.forEach(category => {
+        const block = document.createElement('div');
+        block.className = 'heatmap-category';
+        block.style.flexGrow = Math.max(category.marketCap || 0, 1);
+
+        const header = document.createElement('div');
+        header.className = 'heatmap-category-header';
+        header.title = describe(category);
+        header.textContent = `${category.name} ${formatChange(category.change)}`;
+        block.appendChild(header);
+
+        const tiles = document.createElement('div');
+        tiles.className = 'heatmap-tiles';
+        (industries[category.name] || []).forEach(industry => {
+            const tile = document.createElement('div');
+            tile.className = 'heatmap-tile';
+            tile.style.flexGrow = Math.max(industry.marketCap || 0, 1);
+            tile.style.backgroundColor = changeColor(industry.change);
+            tile.title = describe(industry);
+
+            const name = document.createElement('span');
+            name.className = 'heatmap-tile-name';
+            name.textContent = industry.name;
+            const change = document.createElement('span');
+            change.className = 'heatmap-tile-change';
+            change.textContent = formatChange(industry.change);
+            tile.append(name, change);
+            tiles.appendChild(tile);
+        });
+        block.appendChild(tiles);
+        fragment.appendChild(block);
+    });
+    container.replaceChildren(fragment);
+}
+
 function loadHeatmapWidget() {
     const container = document.getElementById('heatmap-widget-container');
     if (!container) return;
@@ -12,7 +12,7 @@ import {
 
 import { showInfoPopup } from './popup.js';
 import { showChartPopup } from './chart.js';
-import { getCategoryData } from './dataSource.js';
+import { getCategoryData, searchSymbols, currentWatchlist } from './dataSource.js';
 
 // Main JavaScript functionality
 
@@ -63,9 +63,12 @@ document.addEventListener('DOMContentLoaded', function() {
     const searchInput = document.getElementById('search-input');
     const clearSearch = document.getElementById('clear-search');
     if (searchInput) {
+        let searchTimer = null;
         searchInput.addEventListener('input', function() {
-            filterTable(this.value);
-            clearSearch.style.display = this.value ? 'inline' : 'none';
+            const query = this.value;
+            clearSearch.style.display = query ? 'inline' : 'none';
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => runSearch(query), 120);
         });
     }
 
@@ -267,6 +270,7 @@ function renderCategory(category, data) {
                               data-symbol="${stock.Symbol || stock.symbol}" 
                               onclick="toggleFlag(event, '${stock.Symbol || stock.symbol}', this)">★</span>
                         <button class="company-info-btn"
+                                data-symbol="${stock.Symbol || stock.symbol}"
                                 data-stock-name="${stock.Name || stock.name}"
                                 data-fifty-two-week-high="${stock.fiftyTwoWeekHigh || 'N/A'}"
                                 data-current-price="${stock.Close ? stock.Close.toFixed(2) : 'N/A'}"
@@ -392,6 +396,7 @@ function renderCategory(category, data) {
                                   data-symbol="${stock.Symbol || stock.symbol}" 
                                   onclick="toggleFlag(event, '${stock.Symbol || stock.symbol}', this)">★</span>
                             <button class="company-info-btn"
+                                    data-symbol="${stock.Symbol || stock.symbol}"
                                     data-stock-name="${stock.Name || stock.name}"
                                     data-fifty-two-week-high="${stock.fiftyTwoWeekHigh || 'N/A'}"
                                     data-current-price="${stock.Close ? stock.Close.toFixed(2) : 'N/A'}"
@@ -466,9 +471,21 @@ function renderCategory(category, data) {
     });
 }
 
-function filterTable(query) {
+// Filter with the server's search index (symbol, name, industry and description,
+// typo tolerant); without it, by substring of the rendered symbol and name
+async function runSearch(query) {
+    const results = query.trim() ? await searchSymbols(query) : null;
+    const searchInput = document.getElementById('search-input');
+    if (searchInput && searchInput.value !== query) return; // a newer query is on its way
+    filterTable(query, results ? new Set(results.map(r => r.symbol.toLowerCase())) : null);
+}
+
+function filterTable(query, matches = null) {
     const searchTerm = query.toLowerCase();
     const sections = document.querySelectorAll('.section');
+    const rowMatches = (symbol, name) => matches
+        ? matches.has(symbol)
+        : symbol.includes(searchTerm) || name.includes(searchTerm);
 
     // If search is empty, show everything and exit
     if (searchTerm === '') {
@@ -495,7 +512,7 @@ function filterTable(query) {
                     const name = row.querySelector('.company-name-text')?.textContent.toLowerCase() || '';
                     const symbol = row.querySelector('.ticker-chip')?.textContent.toLowerCase() || '';
                     
-                    if (symbol.includes(searchTerm) || name.includes(searchTerm)) {
+                    if (rowMatches(symbol, name)) {
                         row.style.display = '';
                         isIndustryVisible = true;
                     } else {
@@ -517,7 +534,7 @@ function filterTable(query) {
                 const name = row.querySelector('.company-name-text')?.textContent.toLowerCase() || '';
                 const symbol = row.querySelector('.ticker-chip')?.textContent.toLowerCase() || '';
                 
-                if (symbol.includes(searchTerm) || name.includes(searchTerm)) {
+                if (rowMatches(symbol, name)) {
                     row.style.display = '';
                     isSectionVisible = true;
                 } else {
@@ -546,7 +563,8 @@ window.toggleFlag = function(event, symbol, element) {
         },
         body: JSON.stringify({
             symbol: symbol,
-            flag: newFlag
+            flag: newFlag,
+            watchlist: currentWatchlist()
         })
     })
     .then(response => response.json())
@@ -184,6 +184,7 @@ function renderMoverRow(stock) {
             <!-- COL 1: company block -->
             <div class="mover-company-cell">
                 <button class="company-info-btn"
+                        data-symbol="${escapeHtml(symbol)}"
                         data-stock-name="${escapeHtml(name)}"
                         data-fifty-two-week-high="${escapeHtml(high52)}"
                         data-current-price="${priceNum != null && !isNaN(priceNum) ? escapeHtml(priceNum.toFixed(2)) : 'N/A'}"
@@ -1,5 +1,7 @@
 import { getForwardPeColor, getTrailingPeColor } from './utils.js';
+import { getEtfExposure, getDescription } from './dataSource.js';
 function showInfoPopup(button) { // eslint-disable-line no-unused-vars
+    const symbol = button.getAttribute('data-symbol');
     const stockName = button.getAttribute('data-stock-name');
     const beta = button.getAttribute('data-beta');
     const atrPercent = button.getAttribute('data-atr-percent');
@@ -129,20 +131,44 @@ function showInfoPopup(button) { // eslint-disable-line no-unused-vars
         <div style="text-align: center; margin-top: 2px;">
             <strong style="font-size: 14px;"><strong>Current Price:</strong> $${formattedCurrentPrice}</strong>
         </div>
+        <div class="etf-exposure" style="font-size: 14px; margin-top: 10px; display: none;"></div>
     `;
 
     popup.innerHTML = content;
     overlay.appendChild(popup);
     document.body.appendChild(overlay);
 
+    // --- Watchlist ETFs that hold this stock (reverse holdings index lookup) ---
+    const exposureEl = popup.querySelector('.etf-exposure');
+    if (symbol && exposureEl) {
+        getEtfExposure(symbol).then(entries => {
+            if (!entries.length) return;
+            const parts = entries.map(e => {
+                const wt = (e.weight != null && isFinite(e.weight)) ? ` ${e.weight.toFixed(2)}%` : '';
+                return `${e.etf}${wt}`;
+            });
+            exposureEl.innerHTML = `<strong>Held by your ETFs:</strong> ${parts.join(', ')}`;
+            exposureEl.style.display = 'block';
+        });
+    }
+
     // --- Add logic for expandable description button ---
     const descriptionContainer = popup.querySelector('.description-container');
+    const needsDescription = symbol && (!description || description === 'No description available');
+    // The static site ships descriptions in a separate shard; load it on demand
+    const descriptionReady = needsDescription
+        ? getDescription(symbol).then(text => {
+            if (text && descriptionContainer) {
+                descriptionContainer.querySelector('.popup-description').textContent = text;
+            }
+        })
+        : Promise.resolve();
     if (descriptionContainer) {
         const descriptionElement = descriptionContainer.querySelector('.popup-description');
         const expandBtn = descriptionContainer.querySelector('.expand-description-btn');
 
         // Use a small timeout to allow the browser to render and calculate element heights
-        setTimeout(() => {
+        descriptionReady.then(() => setTimeout(() => {
             const isOverflowing = descriptionElement.scrollHeight > descriptionElement.clientHeight;
             
             if (isOverflowing) {
@@ -170,7 +196,7 @@ function showInfoPopup(button) { // eslint-disable-line no-unused-vars
                     }
                 });
             }
-        }, 10); // A minimal delay is sufficient
+        }, 10)); // A minimal delay is sufficient
     }
 
     // Close popup when clicking outside
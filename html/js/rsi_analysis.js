@@ -208,6 +208,7 @@ function renderRowHtml(stock) {
         <div class="company-cell">
             <div style="position: relative;">
                 <button class="company-info-btn"
+                        data-symbol="${escapeHtml(symbol)}"
                         data-stock-name="${escapeHtml(name)}"
                         data-fifty-two-week-high="${escapeHtml(high52)}"
                         data-current-price="${isFinite(closeNum) ? closeNum.toFixed(2) : 'N/A'}"
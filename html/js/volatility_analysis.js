@@ -172,6 +172,7 @@ function renderRowHtml(stock) {
         <!-- COMPANY (col 1) -->
         <div class="company-cell">
             <button class="company-info-btn"
+                    data-symbol="${escapeHtml(symbol)}"
                     data-stock-name="${escapeHtml(name)}"
                     data-fifty-two-week-high="${escapeHtml(high52)}"
                     data-current-price="${isFinite(closeNum) ? closeNum.toFixed(2) : 'N/A'}"
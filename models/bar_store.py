@@ -0,0 +1,184 @@
+"""
+Local store of downloaded OHLCV bars, one table per interval.
+
+Tables keep yfinance's download(group_by='ticker') layout (columns are
+(Ticker, Price) pairs) so frames served from the store are drop-in
+replacements for a fresh download. They are saved as compressed .npz under
+the store directory (no pickling): 1d.npz, 1h.npz, ...
+"""
+import logging
+import math
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Regular-session bars per trading day, to turn a bar count into a date range
+BARS_PER_DAY = {"1d": 1, "1h": 7, "30m": 13, "15m": 26, "5m": 78}
+
+
+def calendar_days(bars, interval):
+    """Calendar days that hold at least `bars` bars of `interval`, with a holiday margin."""
+    trading_days = math.ceil(bars / BARS_PER_DAY.get(interval, 1))
+    return math.ceil(trading_days * 365 / 252) + 5
+
+
+class BarStore:
+    """Per-interval tables of bars, merged from incremental downloads."""
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self._tables = {}
+        # Callers save after each merge unless a streaming refresh defers it to the end
+        self.autosave = True
+
+    def _path(self, interval):
+        return os.path.join(self.root, f"{interval}.npz")
+
+    def table(self, interval):
+        if interval not in self._tables:
+            self._tables[interval] = self._load(interval)
+        return self._tables[interval]
+
+    def _load(self, interval):
+        path = self._path(interval)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        try:
+            with np.load(path) as z:
+                index = pd.DatetimeIndex(z["index"])
+                tz = str(z["tz"])
+                if tz:
+                    index = index.tz_localize("UTC").tz_convert(tz)
+                columns = pd.MultiIndex.from_arrays([z["tickers"], z["prices"]], names=["Ticker", "Price"])
+                return pd.DataFrame(z["values"], index=index, columns=columns)
+        except Exception as e:
+            logging.error(f"Error loading bar store {path}: {e}")
+            return pd.DataFrame()
+
+    def save(self, interval, keep_bars=None):
+        """Write the table, keeping only the last `keep_bars` rows."""
+        frame = self.table(interval)
+        if keep_bars:
+            frame = self._tables[interval] = frame.iloc[-keep_bars:]
+        if frame.empty:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        index = frame.index
+        tz = str(index.tz) if index.tz is not None else ""
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+        path = self._path(interval)
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(
+                    f, index=index.to_numpy(dtype="datetime64[ns]"),
+                    tz=np.array(tz),
+                    tickers=np.array(frame.columns.get_level_values(0), dtype=str),
+                    prices=np.array(frame.columns.get_level_values(1), dtype=str),
+                    values=frame.to_numpy(dtype=np.float64))
+            os.replace(tmp, path)
+        except Exception as e:
+            logging.error(f"Error saving bar store {path}: {e}")
+
+    def release(self, interval, keep_bars=None):
+        """Save the table and drop it from memory; it is reloaded on next use."""
+        if interval in self._tables:
+            self.save(interval, keep_bars)
+            del self._tables[interval]
+
+    def loaded(self):
+        """Intervals whose table is in memory."""
+        return list(self._tables)
+
+    def merge(self, interval, frame):
+        """
+        Fold a download into the table; returns the symbols it had data for.
+        Newly downloaded values win, so a bar re-fetched after it closed
+        replaces the partial one stored earlier.
+        """
+        if frame is None or frame.empty or not isinstance(frame.columns, pd.MultiIndex):
+            return set()
+        frame = frame.astype(np.float64)
+        closes = frame.xs("Close", axis=1, level=1) if "Close" in frame.columns.get_level_values(1) else None
+        fresh = set(closes.columns[closes.notna().any()]) if closes is not None else set()
+        existing = self.table(interval)
+        if existing.empty:
+            merged = frame
+        else:
+            merged = frame.combine_first(existing)
+        self._tables[interval] = merged.sort_index()
+        return fresh
+
+    def revised(self, interval, frame, rtol):
+        """
+        Symbols whose closed bars in `frame` differ from the stored ones by more
+        than `rtol`. yfinance prices are adjusted, so after a split or dividend
+        every earlier bar moves and the stored history no longer matches. The
+        last stored bar of each symbol may have been partial and is not compared.
+        """
+        existing = self.table(interval)
+        if existing.empty or frame is None or frame.empty or not isinstance(frame.columns, pd.MultiIndex):
+            return set()
+        if "Close" not in frame.columns.get_level_values(1):
+            return set()
+        new = frame.xs("Close", axis=1, level=1).astype(np.float64)
+        old = existing.xs("Close", axis=1, level=1)
+        rows = old.index.intersection(new.index)
+        revised = set()
+        for symbol in new.columns.intersection(old.columns):
+            stored = old[symbol].dropna()
+            overlap = rows.intersection(stored.index[:-1])
+            if overlap.empty:
+                continue
+            a, b = stored.loc[overlap].to_numpy(), new[symbol].loc[overlap].to_numpy()
+            both = ~np.isnan(b)
+            if not np.allclose(a[both], b[both], rtol=rtol, atol=0.0):
+                revised.add(symbol)
+        return revised
+
+    def drop(self, interval, symbols):
+        """Forget the stored bars of `symbols`; their next download starts cold."""
+        table = self.table(interval)
+        if table.empty or not symbols:
+            return
+        self._tables[interval] = table.drop(columns=list(symbols), level=0, errors="ignore")
+
+    def download_starts(self, interval, symbols, bars, today=None):
+        """
+        Group symbols by the date their download has to start from: the date
+        of the bar before their last stored one (the last may have been
+        partial, and the one before is compared to catch revised history), or
+        far enough back for `bars` bars when the store has fewer than that.
+        """
+        today = today or date.today()
+        cold_start = today - timedelta(days=calendar_days(bars, interval))
+        table = self.table(interval)
+        stored = {}
+        if not table.empty:
+            closes = table.xs("Close", axis=1, level=1)
+            valid = closes.notna().to_numpy()
+            first = valid.argmax(axis=0)
+            last = len(valid) - 1 - valid[::-1].argmax(axis=0)
+            for j, symbol in enumerate(closes.columns):
+                # Deep enough when its history spans `bars` rows (gaps included)
+                if valid[:, j].any() and len(valid) - first[j] >= bars:
+                    stored[symbol] = closes.index[max(last[j] - 1, first[j])].date()
+        starts = {}
+        for symbol in symbols:
+            starts.setdefault(stored.get(symbol, cold_start), []).append(symbol)
+        return starts
+
+    def frame(self, interval, symbols, bars):
+        """The last `bars` bars of `symbols`, in download(group_by='ticker') layout."""
+        table = self.table(interval)
+        present = [s for s in symbols if not table.empty and s in table.columns.get_level_values(0)]
+        if not present:
+            return pd.DataFrame()
+        frame = table.loc[:, present]
+        frame = frame[frame.xs("Close", axis=1, level=1).notna().any(axis=1)]
+        return frame.iloc[-bars:]
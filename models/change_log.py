@@ -0,0 +1,132 @@
+"""
+Bounded log of per-symbol field changes between cache versions.
+
+Every commit that changes at least one symbol record gets the next version
+number and one log entry: the changed fields of each symbol (new value, or
+None when a field disappeared), the symbols that were removed, and the cache
+lists whose symbol order changed. Only the last `max_versions` entries are
+kept; a client further behind than that needs a full snapshot.
+"""
+import json
+import logging
+import os
+from collections import deque
+
+# Bookkeeping fields that move on every fetch; they never make a change on their own
+IGNORED_FIELDS = frozenset({'fetchedAt'})
+
+
+def diff_records(old, new):
+    """Fields of `new` that differ from `old`; removed fields map to None."""
+    changed = {k: v for k, v in new.items()
+               if k not in IGNORED_FIELDS and (k not in old or old[k] != v)}
+    for k in old:
+        if k not in new and k not in IGNORED_FIELDS:
+            changed[k] = None
+    return changed
+
+
+def symbol_lists(data):
+    """Cache key -> symbol order, for every list of symbol records"""
+    lists = {}
+    for key, value in data.items():
+        if isinstance(value, list) and value and isinstance(value[0], dict) and 'Symbol' in value[0]:
+            lists[key] = [item.get('Symbol') for item in value if isinstance(item, dict)]
+    return lists
+
+
+class ChangeLog:
+    """Versioned change entries, oldest first, capped at max_versions."""
+
+    def __init__(self, max_versions, version=0):
+        self.version = version
+        # Oldest version a delta can be computed from
+        self.base_version = version
+        self.entries = deque(maxlen=max_versions)
+
+    def record(self, old_index, new_index, old_lists, new_lists):
+        """
+        Diff two symbol indexes (Symbol -> record) and append an entry under a
+        new version. Returns the entry, or None when nothing changed.
+        """
+        changes = {}
+        for symbol, record in new_index.items():
+            changed = diff_records(old_index.get(symbol) or {}, record)
+            if changed:
+                changes[symbol] = changed
+        removed = [s for s in old_index if s not in new_index]
+        lists = {k: v for k, v in new_lists.items() if old_lists.get(k) != v}
+        lists.update({k: None for k in old_lists if k not in new_lists})
+        if not (changes or removed or lists):
+            return None
+
+        self.version += 1
+        entry = {'version': self.version, 'changes': changes, 'removed': removed, 'lists': lists}
+        if len(self.entries) == self.entries.maxlen:
+            self.base_version = self.entries[0]['version']
+        self.entries.append(entry)
+        return entry
+
+    def covers(self, since):
+        return self.base_version <= since <= self.version
+
+    def since(self, since):
+        """
+        Merged changes after version `since`: {changes, removed, lists}.
+        None when the log no longer (or never did) cover that version.
+        """
+        if not self.covers(since):
+            return None
+        changes, removed, lists = {}, set(), {}
+        for entry in self.entries:
+            if entry['version'] <= since:
+                continue
+            for symbol, fields in entry['changes'].items():
+                removed.discard(symbol)
+                changes.setdefault(symbol, {}).update(fields)
+            for symbol in entry['removed']:
+                changes.pop(symbol, None)
+                removed.add(symbol)
+            lists.update(entry['lists'])
+        return {'changes': changes, 'removed': sorted(removed), 'lists': lists}
+
+    def reset(self, version):
+        """Start over at `version`; older clients will get a full snapshot."""
+        self.version = self.base_version = version
+        self.entries.clear()
+
+    def save(self, path):
+        state = {'version': self.version, 'base_version': self.base_version, 'entries': list(self.entries)}
+        try:
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+        except Exception as e:
+            logging.error(f"Error saving change log: {e}")
+
+    @classmethod
+    def load(cls, path, max_versions, version):
+        """
+        Load the log written alongside a cache at `version`. A log that does not
+        end at that version no longer describes the cache and is discarded.
+        """
+        log = cls(max_versions, version)
+        if not os.path.exists(path):
+            return log
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+            logged = state.get('version') or 0
+            if logged != version:
+                # Clients may hold any version up to `logged`, so continue past it
+                logging.info(f"Change log is at version {logged}, cache at {version}; starting a new log")
+                log.reset(version if logged < version else logged + 1)
+                return log
+            log.entries.extend(state.get('entries', []))
+            log.base_version = state.get('base_version', version)
+            if log.entries and log.base_version < log.entries[0]['version'] - 1:
+                log.base_version = log.entries[0]['version'] - 1
+        except Exception as e:
+            logging.error(f"Error loading change log: {e}")
+        return log
@@ -0,0 +1,254 @@
+"""
+Append-only columnar archive of committed refreshes.
+
+Each commit appends one segment (compressed .npz) under a directory for its
+market date:
+
+    history/2026-10-18/143005-v12.npz
+    history/2026-10-18/150002-v13.npz
+
+Once a date is over its segments are compacted into a single file:
+
+    history/2026-10-17.npz           resolution "intraday"
+
+Dates older than `intraday_days` are reduced to the last row per symbol
+(the daily close):
+
+    history/2026-09-01.npz           resolution "daily"
+
+Every file holds one table of rows ([t, *fields], sorted by symbol then t)
+with a per-symbol offset index, so a symbol's rows are one slice. The table
+is stored uncompressed, so a read seeks to the rows of the symbols it wants
+and never inflates the rest. Files written before this layout (compressed
+symbol / t / field columns) are still read, and are rewritten when they are
+compacted.
+"""
+import logging
+import math
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_SEGMENT_SUFFIX = ".npz"
+
+
+def _number(v):
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return math.nan
+    return float(v)
+
+
+def _column(arrays, name, length):
+    # Fields added to the config after a file was written read back as NaN
+    if name in arrays:
+        return arrays[name]
+    return np.full(length, math.nan)
+
+
+def _save(path, **arrays):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+class HistoryStore:
+    """Date-partitioned archive of per-symbol numeric fields."""
+
+    def __init__(self, root, fields, intraday_days=30, tz="US/Central"):
+        self.root = root
+        self.fields = tuple(fields)
+        self.intraday_days = intraday_days
+        self.tz = ZoneInfo(tz)
+
+    def _day(self, ts):
+        return datetime.fromtimestamp(ts, self.tz).date()
+
+    def append(self, records, ts=None, version=None):
+        """Append one snapshot (Symbol -> record) and compact finished dates."""
+        ts = time.time() if ts is None else ts
+        symbols = sorted(records)
+        if not symbols:
+            return None
+        columns = {
+            field: np.fromiter((_number(records[s].get(field)) for s in symbols), dtype=np.float64, count=len(symbols))
+            for field in self.fields
+        }
+        columns["symbol"] = np.array(symbols, dtype=str)
+        columns["t"] = np.full(len(symbols), ts)
+        day = self._day(ts)
+        day_dir = os.path.join(self.root, day.isoformat())
+        os.makedirs(day_dir, exist_ok=True)
+        stamp = datetime.fromtimestamp(ts, self.tz).strftime("%H%M%S")
+        name = f"{stamp}-v{version}" if version is not None else stamp
+        path = os.path.join(day_dir, name + _SEGMENT_SUFFIX)
+        self._write(path, columns, "segment")
+        self.compact(today=day)
+        return path
+
+    def append_commit(self, cache):
+        """StockCache commit listener: archive the committed symbol records."""
+        try:
+            self.append(cache.symbol_index(), version=cache.version)
+        except Exception as e:
+            logging.error(f"Error appending refresh to history: {e}")
+
+    # --- compaction / retention -------------------------------------------
+
+    def _partitions(self):
+        """[(date, path, is_open_segment_dir)] sorted by date."""
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in os.listdir(self.root):
+            stem = name[:-len(_SEGMENT_SUFFIX)] if name.endswith(_SEGMENT_SUFFIX) else name
+            if not _DAY_RE.match(stem):
+                continue
+            path = os.path.join(self.root, name)
+            out.append((date.fromisoformat(stem), path, os.path.isdir(path)))
+        return sorted(out)
+
+    def compact(self, today=None):
+        """
+        Merge the segments of every finished date into one sorted file, and
+        reduce dates older than intraday_days to one row per symbol.
+        """
+        today = today or self._day(time.time())
+        cutoff = today - timedelta(days=self.intraday_days)
+        for day, path, is_dir in self._partitions():
+            if is_dir and day < today:
+                self._merge_day(day, path)
+            elif not is_dir and day < cutoff:
+                self._downsample(path)
+
+    def _merge_day(self, day, day_dir):
+        frames = [self._load(os.path.join(day_dir, n))
+                  for n in sorted(os.listdir(day_dir)) if n.endswith(_SEGMENT_SUFFIX)]
+        out = os.path.join(self.root, day.isoformat() + _SEGMENT_SUFFIX)
+        if os.path.exists(out):
+            # A re-opened date (e.g. clock change): fold the compacted rows back in
+            frames.append(self._load(out))
+        if frames:
+            merged = {k: np.concatenate([f[k] for f in frames]) for k in ("symbol", "t", *self.fields)}
+            self._write(out, merged, "intraday")
+        for n in os.listdir(day_dir):
+            os.remove(os.path.join(day_dir, n))
+        os.rmdir(day_dir)
+        logging.info(f"Compacted history for {day} ({len(frames)} segments)")
+
+    def _downsample(self, path):
+        with np.load(path) as z:
+            if str(z["resolution"]) == "daily":
+                return
+        rows = self._load(path)
+        # Rows are sorted by (symbol, t), so the last row of each symbol is its close
+        symbols = rows["symbol"]
+        last = np.nonzero(np.append(symbols[1:] != symbols[:-1], True))[0] if len(symbols) else np.array([], dtype=int)
+        self._write(path, {k: v[last] for k, v in rows.items()}, "daily")
+
+    def _write(self, path, columns, resolution):
+        """Write {symbol, t, *fields} columns as a (rows x [t, *fields]) table sorted by (symbol, t)."""
+        order = np.lexsort((columns["t"], columns["symbol"]))
+        symbols = columns["symbol"][order]
+        names, starts = np.unique(symbols, return_index=True)
+        n = len(order)
+        rows = np.empty((n, 1 + len(self.fields)))
+        rows[:, 0] = columns["t"][order]
+        for j, field in enumerate(self.fields, 1):
+            col = columns.get(field)
+            rows[:, j] = col[order] if col is not None and len(col) == n else math.nan
+        _save(path, symbols=names, offsets=np.append(starts, n).astype(np.int64),
+              fields=np.array(self.fields, dtype=str), resolution=np.array(resolution), rows=rows)
+
+    def _load(self, path):
+        """Every row of a file as {symbol, t, *fields} columns, sorted by (symbol, t)."""
+        with np.load(path) as z:
+            if "rows" not in z.files:
+                return self._load_legacy(z)
+            names, offsets, stored, table = z["symbols"], z["offsets"], list(z["fields"]), z["rows"]
+        rows = {"symbol": np.repeat(names, np.diff(offsets)), "t": table[:, 0]}
+        for field in self.fields:
+            rows[field] = table[:, 1 + stored.index(field)] if field in stored else np.full(len(table), math.nan)
+        return rows
+
+    def _load_legacy(self, z):
+        if "offsets" in z.files:
+            rows = {"symbol": np.repeat(z["symbols"], np.diff(z["offsets"]))}
+        else:
+            rows = {"symbol": z["symbol"]}
+        n = len(rows["symbol"])
+        for k in ("t", *self.fields):
+            rows[k] = _column(z, k, n)
+        return rows
+
+    # --- reads ---------------------------------------------------------------
+
+    def read(self, symbols, fields=None, start=None, end=None):
+        """
+        Rows for `symbols` between the dates `start` and `end` (inclusive):
+        {symbol: {"t": [epoch seconds], field: [values]}}, oldest first.
+        """
+        fields = [f for f in (fields or self.fields) if f in self.fields]
+        wanted = sorted(set(symbols))
+        parts = {s: {"t": [], **{f: [] for f in fields}} for s in wanted}
+        for day, path, is_dir in self._partitions():
+            if (start and day < start) or (end and day > end):
+                continue
+            if is_dir:
+                for n in sorted(os.listdir(path)):
+                    if n.endswith(_SEGMENT_SUFFIX):
+                        self._read_file(os.path.join(path, n), wanted, fields, parts)
+            else:
+                self._read_file(path, wanted, fields, parts)
+        return {s: {k: np.concatenate(v).tolist() if v else [] for k, v in cols.items()}
+                for s, cols in parts.items()}
+
+    def _read_file(self, path, wanted, fields, parts):
+        """Append the rows of the `wanted` symbols in one file to `parts`."""
+        with np.load(path) as z:
+            if "rows" not in z.files:
+                self._read_legacy(z, wanted, fields, parts)
+                return
+            names, offsets, stored = z["symbols"], z["offsets"], list(z["fields"])
+            pos = np.searchsorted(names, wanted)
+            hits = [(s, i) for s, i in zip(wanted, pos) if i < len(names) and names[i] == s]
+            if not hits:
+                return
+            columns = [0] + [1 + stored.index(f) if f in stored else None for f in fields]
+            with z.zip.open("rows.npy") as f:
+                if npy_format.read_magic(f) == (1, 0):
+                    shape, _, dtype = npy_format.read_array_header_1_0(f)
+                else:
+                    shape, _, dtype = npy_format.read_array_header_2_0(f)
+                header = f.tell()
+                row_bytes = shape[1] * dtype.itemsize
+                # `wanted` and the table are both sorted, so every seek is forward
+                for s, i in hits:
+                    a, b = int(offsets[i]), int(offsets[i + 1])
+                    f.seek(header + a * row_bytes)
+                    rows = np.frombuffer(f.read((b - a) * row_bytes), dtype=dtype).reshape(b - a, shape[1])
+                    for k, j in zip(("t", *fields), columns):
+                        parts[s][k].append(rows[:, j] if j is not None else np.full(b - a, math.nan))
+
+    def _read_legacy(self, z, wanted, fields, parts):
+        if "offsets" in z.files:
+            names, offsets = z["symbols"], z["offsets"]
+        else:
+            # Segment: one row per symbol
+            names = z["symbol"]
+            offsets = np.arange(len(names) + 1)
+        pos = np.searchsorted(names, wanted)
+        hits = [(s, i) for s, i in zip(wanted, pos) if i < len(names) and names[i] == s]
+        if not hits:
+            return
+        n = int(offsets[-1])
+        for k in ("t", *fields):
+            col = _column(z, k, n)
+            for s, i in hits:
+                parts[s][k].append(col[offsets[i]:offsets[i + 1]])
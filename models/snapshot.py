@@ -0,0 +1,60 @@
+"""
+Published cache snapshots, shared by every serving process.
+
+The cache file is the snapshot. A writer publishes a new generation by
+writing it beside the old one and renaming it into place, so a reader opens
+either the old generation or the new one, never a partial write. A
+generation is identified by the file's (inode, mtime, size): readers stat
+the file to notice that a new one was published.
+
+MappedSnapshot keeps the current generation memory-mapped, so the serving
+processes send the raw snapshot from the same page-cache pages instead of
+each reading its own copy per request.
+"""
+import mmap
+import os
+import threading
+
+
+def generation(path):
+    """Identity of the snapshot published at `path`, or None when there is none."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def publish(path, write):
+    """Atomically replace `path` with what write(f) writes; returns the new generation."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        write(f)
+    os.replace(tmp, path)
+    return generation(path)
+
+
+class MappedSnapshot:
+    """Read-only mapping of the snapshot at `path`, remapped when a new generation is published."""
+
+    def __init__(self, path):
+        self.path = path
+        self._generation = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    def view(self):
+        """The current generation's bytes, or None when nothing is published."""
+        current = generation(self.path)
+        with self._lock:
+            if current != self._generation:
+                # A response still sending the old mapping keeps it alive until it is done
+                self._map = None
+                if current is not None and current[2] > 0:
+                    try:
+                        with open(self.path, 'rb') as f:
+                            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except FileNotFoundError:
+                        current = None
+                self._generation = current
+            return self._map
@@ -1,25 +1,115 @@
 import os
 import json
+import threading
+import time
 from datetime import datetime
 import logging
-from config import CACHE_DIR, CACHE_FILE
+from types import MappingProxyType
+from config import CACHE_DIR, CACHE_FILE, CHANGE_LOG_FILE, CHANGE_LOG_MAX_VERSIONS
 from zoneinfo import ZoneInfo
+from utils.metrics import metrics
+from models.change_log import ChangeLog, symbol_lists
+from models.snapshot import generation, publish
+
+def _now_ct():
+    # Current time in US/Central, the cache's display format
+    utc_now = datetime.now(ZoneInfo("UTC"))
+    return utc_now.astimezone(ZoneInfo("US/Central")).strftime('%m/%d %I:%M %p CT')
+
+def _symbol_index(data):
+    index = {}
+    for value in data.values():
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and item.get('Symbol'):
+                    index.setdefault(item['Symbol'], item)
+    return index
+
+class CacheSnapshot:
+    """
+    One immutable generation of the cache: its data, version and timestamp.
+    A reader takes StockCache.snapshot once and gets a consistent view for
+    as long as it holds it. Writers never change a published snapshot, its
+    lists or its records; they build a new snapshot and swap it in.
+    """
+
+    def __init__(self, data, version, last_updated, index=None, lists=None):
+        self._data = dict(data)
+        self.data = MappingProxyType(self._data)
+        self.version = version
+        self.last_updated = last_updated
+        self._index = index
+        self._lists = lists
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def symbol_index(self):
+        """Map each Symbol to its record across every cached category list (built once per snapshot)"""
+        if self._index is None:
+            self._index = _symbol_index(self._data)
+        return self._index
+
+    def symbol_lists(self):
+        if self._lists is None:
+            self._lists = symbol_lists(self._data)
+        return self._lists
+
+    def to_json(self, f):
+        json.dump({'data': self._data, 'last_updated': self.last_updated, 'version': self.version}, f)
 
 class StockCache:
-    """Cache for storing stock data to reduce API calls"""
+    """
+    Cache for storing stock data to reduce API calls.
+
+    The current data is an immutable CacheSnapshot. Reads take the snapshot
+    reference without locking. Writes (set, commits, flag updates) hold the
+    writer lock while they build the next snapshot, swap it in with a single
+    assignment and save it.
+    """
     
     def __init__(self):
         # Create cache directory if it doesn't exist
         os.makedirs(CACHE_DIR, exist_ok=True)
         self.cache_file = os.path.join(CACHE_DIR, CACHE_FILE)
-        self.data = {}
         self.temp_data = {}  # Temporary storage for refresh operations
         self.is_refreshing = False  # Flag to track refresh operations
-        self.last_updated = None  # Initialize as None
-        self._load()
+        self._commit_stages = []  # Derive extra cache entries from each refresh before it is saved
+        self._commit_listeners = []  # Called with the cache after each committed refresh
+        self.lock = threading.RLock()  # The single writer lock (refresh jobs, HTTP refreshes, commits, flags)
+        self._generation = None  # Identity of the cache file this process last loaded or published
+        self._checked_at = 0.0
+        self._current = self._load()
+
+    @property
+    def snapshot(self):
+        """The current CacheSnapshot; hold on to it for a consistent view across several reads"""
+        return self._current
+
+    @property
+    def data(self):
+        return self._current.data
+
+    @data.setter
+    def data(self, value):
+        # Replace the data wholesale without saving (benchmarks, tools)
+        with self.lock:
+            self._current = CacheSnapshot(value, self.version, self.last_updated)
+
+    @property
+    def version(self):
+        """Bumped by every save that changes a symbol record"""
+        return self._current.version
+
+    @property
+    def last_updated(self):
+        return self._current.last_updated
     
     def _load(self):
-        """Load cache from file if it exists"""
+        """The snapshot in the cache file (with its change log), or an empty one"""
+        self._generation = generation(self.cache_file)
+        data, version = {}, 0
+        last_updated = datetime.now().strftime('%m/%d %I:%M %p')  # 12-hour format
         if os.path.exists(self.cache_file):
             try:
                 with open(self.cache_file, 'r') as f:
@@ -27,76 +117,173 @@ class StockCache:
                     
                     # Check if the cache data has the new format with metadata
                     if isinstance(cache_data, dict) and 'data' in cache_data and 'last_updated' in cache_data:
-                        self.data = cache_data['data']
-                        self.last_updated = cache_data['last_updated']
+                        data = cache_data['data']
+                        last_updated = cache_data['last_updated']
+                        version = cache_data.get('version', 0)
                     else:
                         # Old format - just data
-                        self.data = cache_data
-                        # Set a default timestamp
-                        self.last_updated = datetime.now().strftime('%m/%d %I:%M %p')  # 12-hour format
+                        data = cache_data
                         
-                logging.info(f"Cache loaded with {len(self.data)} entries")
+                logging.info(f"Cache loaded with {len(data)} entries")
             except Exception as e:
                 logging.error(f"Error loading cache: {e}")
-                self.data = {}
-                self.last_updated = datetime.now().strftime('%m/%d %I:%M %p')  # 12-hour format
-        else:
-            # No cache file exists
-            self.data = {}
-            self.last_updated = datetime.now().strftime('%m/%d %I:%M %p')  # 12-hour format
+                data = {}
+        self.changes = ChangeLog.load(os.path.join(CACHE_DIR, CHANGE_LOG_FILE), CHANGE_LOG_MAX_VERSIONS, version)
+        return CacheSnapshot(data, self.changes.version, last_updated)
     
     def save(self):
-        """Save cache to file"""
+        """Save the current data to file, with a new timestamp (and version, if a record changed)"""
+        with self.lock:
+            self._publish(self._current.data)
+
+    def _publish(self, data):
+        """
+        Swap in a snapshot of `data`, then write it to the cache file. The
+        version only moves when a symbol record changed since the previous
+        snapshot. Callers hold the writer lock.
+        """
+        previous = self._current
+        index = _symbol_index(data)
+        lists = symbol_lists(data)
+        entry = self.changes.record(previous.symbol_index(), index, previous.symbol_lists(), lists)
+        version = previous.version
+        if entry is not None:
+            version = self.changes.version
+            metrics.inc("cache_versions_total")
+        snapshot = CacheSnapshot(data, version, _now_ct(), index=index, lists=lists)
+        self._current = snapshot
         try:
-            # Get current UTC time, convert to US/Central, and format it
-            utc_now = datetime.now(ZoneInfo("UTC"))
-            ct_time = utc_now.astimezone(ZoneInfo("US/Central"))
-            self.last_updated = ct_time.strftime('%m/%d %I:%M %p CT')
-            
-            # Save both the data and the timestamp
-            cache_data = {
-                'data': self.data,
-                'last_updated': self.last_updated
-            }
-            
-            with open(self.cache_file, 'w') as f:
-                json.dump(cache_data, f)
-            logging.info(f"Cache saved with {len(self.data)} entries")
+            # The change log goes first: replacing the cache file publishes
+            # the new generation, and readers load the log that matches it
+            if entry is not None:
+                self.changes.save(os.path.join(CACHE_DIR, CHANGE_LOG_FILE))
+            with metrics.stage("cache_save"):
+                self._generation = publish(self.cache_file, snapshot.to_json)
+            logging.info(f"Cache saved with {len(snapshot.data)} entries (version {snapshot.version})")
         except Exception as e:
             logging.error(f"Error saving cache: {e}")
     
+    def reload_if_changed(self, min_interval=0.0):
+        """
+        Load the cache file again if another process (run_cache_update, the
+        writer of a multi-process server) published a new generation since
+        this one last loaded or saved it. Checks at most every `min_interval`
+        seconds; returns whether it reloaded.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < min_interval:
+            return False
+        self._checked_at = now
+        if generation(self.cache_file) == self._generation:
+            return False
+        with self.lock:
+            if self.is_refreshing or generation(self.cache_file) == self._generation:
+                return False
+            self._current = self._load()
+        logging.info(f"Reloaded cache generation published by another process (version {self.version})")
+        return True
+
     def get(self, key):
         """Get item from cache"""
-        return self.data.get(key)
+        value = self._current.get(key)
+        metrics.inc("cache_requests_total", result="miss" if value is None else "hit")
+        return value
     
+    def symbol_index(self):
+        """Map each Symbol to its record across every cached category list"""
+        return self._current.symbol_index()
+
+    def changes_since(self, version):
+        """
+        Merged symbol changes after `version`, or None when the client must
+        reload a full snapshot (too far behind, or a version this cache never had).
+        """
+        delta = self.changes.since(version)
+        if delta is not None:
+            delta['version'] = self.version
+        return delta
+
     def set(self, key, value):
         """Set item in cache and save"""
-        if self.is_refreshing:
-            # During refresh, store in temp_data
-            self.temp_data[key] = value
-            logging.debug(f"Temporarily stored {key} during refresh")
-        else:
-            # Normal operation, store directly in data
-            self.data[key] = value
-            self.save()
+        with self.lock:
+            if self.is_refreshing:
+                # During refresh, store in temp_data
+                self.temp_data[key] = value
+                logging.debug(f"Temporarily stored {key} during refresh")
+            else:
+                # Normal operation: publish a new snapshot with the item
+                self._publish({**self._current.data, key: value})
     
+    def set_many(self, items):
+        """Set several items with a single save"""
+        with self.lock:
+            if self.is_refreshing:
+                self.temp_data.update(items)
+            else:
+                self._publish({**self._current.data, **items})
+
+    def update(self, change):
+        """
+        Publish change(snapshot) -> {key: new value} as one write: the change
+        reads the current snapshot and the result is swapped in under the
+        writer lock, so concurrent writers cannot lose each other's updates.
+        """
+        with self.lock:
+            items = change(self._current)
+            if items:
+                self._publish({**self._current.data, **items})
+            return items
+
+    def add_commit_stage(self, stage):
+        """
+        Run stage(snapshot) on every commit, over the merged data before it is
+        published; the {key: value} it returns is stored with the refresh.
+        """
+        self._commit_stages.append(stage)
+
+    def add_commit_listener(self, listener):
+        """Call listener(cache) after every successful commit_refresh"""
+        self._commit_listeners.append(listener)
+
     def start_refresh(self):
         """Start a refresh operation"""
-        self.is_refreshing = True
-        self.temp_data = {}
+        with self.lock:
+            self.is_refreshing = True
+            self.temp_data = {}
         logging.info("Started refresh operation")
     
     def commit_refresh(self):
         """Commit the refresh operation"""
-        if self.is_refreshing and self.temp_data:
-            # Replace cache data with temp data
-            self.data = self.temp_data
-            self.temp_data = {}
-            self.is_refreshing = False
-            utc_now = datetime.now(ZoneInfo("UTC"))
-            ct_time = utc_now.astimezone(ZoneInfo("US/Central"))
-            self.last_updated = ct_time.strftime('%m/%d %I:%M %p CT')
-            self.save()
-            logging.info("Committed refresh operation")
-            return True
-        return False 
\ No newline at end of file
+        with self.lock:
+            if self.is_refreshing and self.temp_data:
+                # Merge into the existing data, so anything this refresh did not
+                # produce (e.g. a category that failed) keeps its last good value
+                items, self.temp_data = self.temp_data, {}
+                self.is_refreshing = False
+                self._commit(items)
+                return True
+            return False
+
+    def commit(self, items):
+        """
+        Store {key: value} outside refresh mode and commit it like a refresh:
+        commit stages, one save, then the commit listeners.
+        """
+        with self.lock:
+            self._commit(items)
+
+    def _commit(self, items):
+        data = {**self._current.data, **items}
+        for stage in self._commit_stages:
+            try:
+                # Stages see the merged data as an unpublished snapshot
+                data.update(stage(CacheSnapshot(data, self.version, self.last_updated)) or {})
+            except Exception as e:
+                logging.error(f"Commit stage {stage} failed: {e}", exc_info=True)
+        self._publish(data)
+        logging.info("Committed refresh operation")
+        for listener in self._commit_listeners:
+            try:
+                listener(self)
+            except Exception as e:
+                logging.error(f"Commit listener {listener} failed: {e}")
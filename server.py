@@ -1,10 +1,13 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import argparse
 import logging
 import os
+import signal
 import subprocess
 import socket
+import time
 from handlers.request_handler import ChartRequestHandler
-from config import PORT
+from config import PORT, SERVER_WORKERS, WRITER_PORT
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,7 +24,68 @@ def kill_existing_process(port):
     except Exception as e:
         print(f"Error killing process on port {port}: {e}")
 
+def serve_prefork(server_address, workers):
+    """
+    One writer process and `workers` worker processes sharing the listening
+    socket. The writer (on WRITER_PORT, loopback only) takes every request
+    that changes the cache: refreshes, flag updates, refresh jobs. Each save
+    publishes a new generation of the cache file, which the workers pick up
+    without restarting. The workers answer everything else from that
+    snapshot, so reads scale with cores. This process only restarts children
+    that exit.
+    """
+    # Bound before forking: every worker accepts on the same socket
+    public = ThreadingHTTPServer(server_address, ChartRequestHandler)
+    writer = ThreadingHTTPServer(('127.0.0.1', WRITER_PORT), ChartRequestHandler)
+    children = {}
+
+    def spawn(role):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                if role == 'writer':
+                    public.socket.close()
+                    writer.serve_forever()
+                else:
+                    writer.socket.close()
+                    ChartRequestHandler.writer_address = ('127.0.0.1', WRITER_PORT)
+                    public.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        children[pid] = role
+
+    def stop(signum, frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        raise SystemExit(0)
+
+    spawn('writer')
+    for _ in range(workers):
+        spawn('worker')
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            pid, status = os.wait()
+            role = children.pop(pid, None)
+            if role:
+                logging.warning(f"{role} process {pid} exited (status {status}); restarting it")
+                time.sleep(1)
+                spawn(role)
+    except KeyboardInterrupt:
+        stop(signal.SIGINT, None)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the watchlist UI and API")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="Worker processes; more than 1 adds a writer process and shares the cache snapshot")
+    args = parser.parse_args()
+
     # Change to the project root directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
@@ -31,8 +95,13 @@ if __name__ == "__main__":
     # Kill any existing process on the port
     kill_existing_process(PORT)
     
-    # Start the server
+    # Start the server; one thread per request, so streamed refresh jobs and
+    # slow requests do not hold up the rest
     server_address = ('localhost', PORT)
-    httpd = HTTPServer(server_address, ChartRequestHandler)
     print(f"Serving on http://localhost:{PORT}/html/watchlist.html")
-    httpd.serve_forever()
\ No newline at end of file
+    if args.workers > 1 and hasattr(os, 'fork'):
+        kill_existing_process(WRITER_PORT)
+        serve_prefork(server_address, args.workers)
+    else:
+        httpd = ThreadingHTTPServer(server_address, ChartRequestHandler)
+        httpd.serve_forever()
\ No newline at end of file
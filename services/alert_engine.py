@@ -0,0 +1,404 @@
+"""
+Alert rules evaluated against what each committed refresh changed.
+
+Rules come from a JSON file (alert_rules.json):
+
+    {
+      "cooldown_seconds": 21600,
+      "sinks": [{"type": "log"}, {"type": "file", "path": "cache/alerts.jsonl"}],
+      "rules": [
+        {"id": "rsi-oversold", "field": "RSI", "op": "<", "value": 30},
+        {"id": "rsi-bounce", "type": "cross", "field": "RSI", "from": "yRSI", "value": 30, "direction": "up"},
+        {"id": "52w-high", "type": "compare", "field": "High", "op": ">=", "other": "fiftyTwoWeekHigh"},
+        {"id": "earnings-soon", "type": "earnings", "days": 3, "categories": ["Owned"]}
+      ]
+    }
+
+Rule types:
+
+    threshold  field <op> value; fires when the field crosses the level
+    cross      `from` on one side of value and `field` on the other (the
+               yRSI -> RSI transitions of the RSI page)
+    compare    field <op> other field of the same record
+    earnings   earningsDate within `days` days
+
+Every rule fires when its condition goes from false to true, so a symbol
+that stays oversold alerts once. Optional "symbols" / "categories" limit a
+rule to part of the watchlist, and "message" overrides the alert text.
+
+Only symbols the commit changed are looked at. Threshold rules are indexed by
+field and kept sorted by level, so the rules a value change crosses are one
+bisect away however many rules there are; the other types are indexed by the
+fields they read. Earnings rules depend on the date too and run over every
+symbol. An alert that fired for a rule and symbol is not repeated within
+cooldown_seconds.
+"""
+import json
+import logging
+import math
+import operator
+import os
+import threading
+import time
+import urllib.request
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import date, datetime
+
+OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+DEFAULT_COOLDOWN = 6 * 60 * 60
+RECENT_ALERTS = 200
+
+
+def _number(v):
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or math.isnan(v):
+        return None
+    return float(v)
+
+
+def _earnings_date(record):
+    try:
+        return datetime.strptime(record.get("earningsDate") or "", "%m-%d-%Y").date()
+    except ValueError:
+        return None
+
+
+class Rule:
+    """One alert rule; holds(record) says whether its condition is met."""
+
+    def __init__(self, spec):
+        self.id = spec["id"]
+        self.type = spec.get("type", "threshold")
+        self.field = spec.get("field")
+        self.op = spec.get("op")
+        self.value = spec.get("value")
+        self.symbols = set(spec["symbols"]) if spec.get("symbols") else None
+        self.categories = set(spec["categories"]) if spec.get("categories") else None
+        self.message = spec.get("message")
+        if self.type in ("threshold", "compare") and self.op not in OPS:
+            raise ValueError(f"rule {self.id}: op must be one of {sorted(OPS)}")
+        if self.type == "threshold":
+            self.value = float(self.value)
+            self.fields = (self.field,)
+        elif self.type == "cross":
+            self.source = spec["from"]
+            self.value = float(self.value)
+            self.direction = spec.get("direction", "up")
+            if self.direction not in ("up", "down"):
+                raise ValueError(f"rule {self.id}: direction must be up or down")
+            self.fields = (self.source, self.field)
+        elif self.type == "compare":
+            self.other = spec["other"]
+            self.fields = (self.field, self.other)
+        elif self.type == "earnings":
+            self.days = int(spec.get("days", 3))
+            self.fields = ("earningsDate",)
+        else:
+            raise ValueError(f"rule {self.id}: unknown type {self.type!r}")
+
+    def applies(self, symbol, record):
+        if self.symbols is not None and symbol not in self.symbols:
+            return False
+        if self.categories is not None:
+            lists = {record.get("category"), "Owned" if record.get("flag") else None}
+            if not lists & self.categories:
+                return False
+        return True
+
+    def holds(self, record, today=None):
+        if self.type == "threshold":
+            v = _number(record.get(self.field))
+            return v is not None and OPS[self.op](v, self.value)
+        if self.type == "cross":
+            before, now = _number(record.get(self.source)), _number(record.get(self.field))
+            if before is None or now is None:
+                return False
+            if self.direction == "up":
+                return before <= self.value < now
+            return before >= self.value > now
+        if self.type == "compare":
+            a, b = _number(record.get(self.field)), _number(record.get(self.other))
+            return a is not None and b is not None and OPS[self.op](a, b)
+        when = _earnings_date(record)
+        return when is not None and 0 <= (when - (today or date.today())).days <= self.days
+
+    def describe(self, record):
+        if self.message:
+            return self.message
+        if self.type == "threshold":
+            return f"{self.field} {self.op} {self.value:g} ({self.field} {record.get(self.field)})"
+        if self.type == "cross":
+            side = "above" if self.direction == "up" else "below"
+            return f"{self.field} crossed {side} {self.value:g} ({record.get(self.source)} -> {record.get(self.field)})"
+        if self.type == "compare":
+            return f"{self.field} {self.op} {self.other} ({record.get(self.field)} vs {record.get(self.other)})"
+        return f"Earnings on {record.get('earningsDate')} ({record.get('earningsTiming', 'TBA')})"
+
+
+class _ThresholdIndex:
+    """Threshold rules of one field, sorted by level per comparison."""
+
+    def __init__(self):
+        self.levels = {op: [] for op in OPS}
+        self.rules = {op: [] for op in OPS}
+
+    def add(self, rule):
+        pos = bisect_right(self.levels[rule.op], rule.value)
+        self.levels[rule.op].insert(pos, rule.value)
+        self.rules[rule.op].insert(pos, rule)
+
+    def crossed(self, old, new):
+        """Rules whose condition is false at `old` and true at `new` (old None: false everywhere)."""
+        lo, hi = -math.inf, math.inf
+        out = []
+        for op, levels in self.levels.items():
+            if not levels:
+                continue
+            if op == "<":     # old >= t > new
+                i, j = bisect_right(levels, new), bisect_right(levels, hi if old is None else old)
+            elif op == "<=":  # old > t >= new
+                i, j = bisect_left(levels, new), bisect_left(levels, hi if old is None else old)
+            elif op == ">":   # old <= t < new
+                i, j = bisect_left(levels, lo if old is None else old), bisect_left(levels, new)
+            else:             # old < t <= new
+                i, j = bisect_right(levels, lo if old is None else old), bisect_right(levels, new)
+            out.extend(self.rules[op][i:j])
+        return out
+
+
+# --- sinks ------------------------------------------------------------------
+
+class LogSink:
+    """Alerts to the application log."""
+
+    def __init__(self, level="warning"):
+        self.level = getattr(logging, level.upper(), logging.WARNING)
+
+    def send(self, alerts):
+        for alert in alerts:
+            logging.log(self.level, f"ALERT [{alert['rule']}] {alert['symbol']}: {alert['message']}")
+
+
+class FileSink:
+    """Alerts appended to a file, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, alerts):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + "\n")
+
+    def recent(self, limit):
+        """The last `limit` alerts in the file, newest first."""
+        if limit <= 0 or not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            # Read back from the end until the block holds `limit` whole lines
+            pos = f.seek(0, os.SEEK_END)
+            data = b""
+            while pos > 0 and data.count(b"\n") <= limit:
+                step = min(64 * 1024, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        alerts = []
+        for line in reversed(data.splitlines()[-limit:]):
+            try:
+                alerts.append(json.loads(line))
+            except ValueError:
+                continue
+        return alerts
+
+
+class WebhookSink:
+    """Alerts POSTed as {"alerts": [...]} JSON to a URL."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        body = json.dumps({"alerts": alerts}).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+SINK_TYPES = {"log": LogSink, "file": FileSink, "webhook": WebhookSink}
+
+
+def register_sink(name, factory):
+    """Make `{"type": name, ...}` in the rules file build factory(**options)."""
+    SINK_TYPES[name] = factory
+
+
+def build_sink(spec):
+    options = {k: v for k, v in spec.items() if k != "type"}
+    return SINK_TYPES[spec.get("type", "log")](**options)
+
+
+# --- engine -----------------------------------------------------------------
+
+class AlertEngine:
+    """Evaluates rules on each commit's changed symbols and sends what fired to the sinks."""
+
+    def __init__(self, rules, sinks=None, cooldown=DEFAULT_COOLDOWN, state_file=None):
+        self.rules = list(rules)
+        self.sinks = list(sinks if sinks is not None else [LogSink()])
+        self.cooldown = cooldown
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=RECENT_ALERTS)
+
+        self.thresholds = {}   # field -> _ThresholdIndex
+        self.by_field = {}     # field -> [non-threshold rules reading it]
+        self.earnings = []
+        for rule in self.rules:
+            if rule.type == "threshold":
+                self.thresholds.setdefault(rule.field, _ThresholdIndex()).add(rule)
+            elif rule.type == "earnings":
+                self.earnings.append(rule)
+            else:
+                for field in rule.fields:
+                    self.by_field.setdefault(field, []).append(rule)
+
+        self.values = {}       # symbol -> {field: last number} for threshold fields
+        self.holding = set()   # (rule id, symbol) whose condition held at the last look
+        self.version = None
+        self.last_fired = self._load_state()
+
+    @classmethod
+    def from_file(cls, path, state_file=None):
+        with open(path) as f:
+            config = json.load(f)
+        rules = [Rule(spec) for spec in config.get("rules", [])]
+        sinks = [build_sink(spec) for spec in config.get("sinks", [{"type": "log"}])]
+        return cls(rules, sinks, cooldown=config.get("cooldown_seconds", DEFAULT_COOLDOWN), state_file=state_file)
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return {tuple(k.split("|", 1)): t for k, t in json.load(f).items()}
+        except Exception as e:
+            logging.error(f"Error loading alert state {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self, now):
+        if not self.state_file:
+            return
+        cutoff = now - self.cooldown
+        state = {f"{r}|{s}": t for (r, s), t in self.last_fired.items() if t >= cutoff}
+        try:
+            tmp = f"{self.state_file}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except Exception as e:
+            logging.error(f"Error saving alert state {self.state_file}: {e}")
+
+    def prime(self, cache):
+        """Take the cache's current values as the baseline, without alerting."""
+        with self.lock:
+            self._evaluate(cache.symbol_index(), None, today=date.today(), fire=False)
+            self.version = cache.version
+
+    def on_commit(self, cache):
+        """StockCache commit listener."""
+        try:
+            self.check(cache)
+        except Exception as e:
+            logging.error(f"Error evaluating alerts: {e}", exc_info=True)
+
+    def check(self, cache, today=None, now=None):
+        """Evaluate the symbols changed since the last check; returns the alerts sent."""
+        with self.lock:
+            delta = cache.changes_since(self.version) if self.version is not None else None
+            index = cache.symbol_index()
+            changed = None if delta is None else delta["changes"]
+            self.version = cache.version
+            alerts = self._evaluate(index, changed, today=today or date.today(), now=now or time.time())
+        for sink in self.sinks:
+            try:
+                if alerts:
+                    sink.send(alerts)
+            except Exception as e:
+                logging.error(f"Alert sink {type(sink).__name__} failed: {e}")
+        return alerts
+
+    def _evaluate(self, index, changed, today, now=None, fire=True):
+        """
+        Look at `changed` ({symbol: {field: value}}; None means every symbol and
+        field) and return the alerts for conditions that became true.
+        """
+        candidates = []
+        symbols = index.keys() if changed is None else [s for s in changed if s in index]
+        for symbol in symbols:
+            record = index[symbol]
+            fields = record.keys() if changed is None else changed[symbol].keys()
+            seen = self.values.setdefault(symbol, {})
+            touched = {}
+            for field in fields:
+                thresholds = self.thresholds.get(field)
+                if thresholds is not None:
+                    new = _number(record.get(field))
+                    if new is None:
+                        continue  # keep the last number across an 'N/A'
+                    old = seen.get(field)
+                    seen[field] = new
+                    if old != new:
+                        candidates.extend((rule, symbol) for rule in thresholds.crossed(old, new))
+                for rule in self.by_field.get(field, ()):
+                    touched[rule.id] = rule
+            for rule in touched.values():
+                if self._transition(rule, symbol, record, today):
+                    candidates.append((rule, symbol))
+        for symbol, record in index.items():
+            for rule in self.earnings:
+                if self._transition(rule, symbol, record, today):
+                    candidates.append((rule, symbol))
+
+        if not fire:
+            return []
+        alerts = []
+        for rule, symbol in candidates:
+            record = index[symbol]
+            if not rule.applies(symbol, record):
+                continue
+            key = (rule.id, symbol)
+            if now - self.last_fired.get(key, -math.inf) < self.cooldown:
+                continue
+            self.last_fired[key] = now
+            alerts.append({"rule": rule.id, "symbol": symbol, "message": rule.describe(record),
+                           "time": now, "version": self.version})
+        if alerts:
+            self.recent.extend(alerts)
+            self._save_state(now)
+        return alerts
+
+    def _transition(self, rule, symbol, record, today):
+        """Whether the rule's condition turned true for the symbol since the last look."""
+        key = (rule.id, symbol)
+        holds = rule.holds(record, today)
+        was = key in self.holding
+        if holds:
+            self.holding.add(key)
+        else:
+            self.holding.discard(key)
+        return holds and not was
+
+    def recent_alerts(self, limit=50):
+        """
+        Newest first. With a file sink they are read back from the file, so
+        every process (server workers, run_cache_update) sees the same alerts.
+        """
+        for sink in self.sinks:
+            if isinstance(sink, FileSink):
+                return sink.recent(limit)
+        return list(self.recent)[-limit:][::-1]
@@ -0,0 +1,280 @@
+"""
+Vectorized backtest of the RSI / ATR% screens across the watchlist.
+
+The volatility page screens on ATR% >= 2 with RSI <= 30 (oversold) or >= 70
+(overbought). This module replays such rules over an OHLC panel (bars x
+symbols) for a grid of parameters:
+
+    rsi_window   RSI length (TradingView definition, services.indicators)
+    lower/upper  RSI entry / exit thresholds
+    atr_cutoff   minimum ATR% (ATR-14 / close) on the entry bar
+    hold         maximum bars a trade is held
+
+A long trade enters at the close of a bar with RSI <= lower and ATR% >=
+atr_cutoff, and exits at the close of the first later bar with RSI >= upper,
+or after `hold` bars. Shorts mirror it. Every signal bar counts as a trade (no
+position sizing or overlap handling), so the results describe the signal
+rather than a portfolio.
+
+Indicators and forward returns are computed once per worker and shared by
+every grid cell that uses them; grid cells are spread over a process pool.
+
+    python -m services.backtest --period 2y --rsi-windows 3,7,14 \\
+        --lower 15:35:5 --upper 65:85:5 --atr 0:4:0.5 --hold 1,2,3,5,10
+"""
+import argparse
+import csv
+import itertools
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.indicators import atr_percent, wilder_rsi
+
+PARAM_NAMES = ("rsi_window", "lower", "upper", "atr_cutoff", "hold")
+STAT_NAMES = ("trades", "win_rate", "avg_return", "median_return", "profit_factor", "avg_bars")
+ATR_WINDOW = 14
+SIDES = ("long", "short")
+
+
+class Panel:
+    """OHLC prices of N symbols over T bars, as (T, N) float arrays."""
+
+    def __init__(self, symbols, index, open_, high, low, close):
+        self.symbols = list(symbols)
+        self.index = np.asarray(index)
+        self.open = np.asarray(open_, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+
+    @classmethod
+    def from_download(cls, frame, symbols):
+        """From a yfinance download(group_by='ticker') frame; absent symbols are dropped."""
+        present = [s for s in symbols if s in frame.columns.get_level_values(0)]
+        fields = {f: np.column_stack([frame[s][f].to_numpy(dtype=np.float64) for s in present])
+                  for f in ("Open", "High", "Low", "Close")}
+        index = frame.index.astype("int64") // 10**9  # epoch seconds
+        return cls(present, index, fields["Open"], fields["High"], fields["Low"], fields["Close"])
+
+    def save(self, path):
+        np.savez_compressed(path, symbols=np.array(self.symbols, dtype=str), index=self.index,
+                            open=self.open, high=self.high, low=self.low, close=self.close)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            return cls(z["symbols"].tolist(), z["index"], z["open"], z["high"], z["low"], z["close"])
+
+
+def parameter_grid(rsi_windows, lowers, uppers, atr_cutoffs, holds):
+    """Every (rsi_window, lower, upper, atr_cutoff, hold) with lower < upper."""
+    return [cell for cell in itertools.product(rsi_windows, lowers, uppers, atr_cutoffs, holds)
+            if cell[1] < cell[2]]
+
+
+class Evaluator:
+    """Scores grid cells on one panel, memoising indicators and trade returns."""
+
+    def __init__(self, panel, side="long"):
+        if side not in SIDES:
+            raise ValueError(f"side must be one of {SIDES}")
+        self.panel = panel
+        self.side = side
+        self.atr_pct = atr_percent(panel.high, panel.low, panel.close, ATR_WINDOW)
+        self._rsi = {}
+        self._trades = {}
+
+    def rsi(self, window):
+        if window not in self._rsi:
+            self._rsi[window] = wilder_rsi(self.panel.close, window)
+        return self._rsi[window]
+
+    def trades(self, window, exit_level, hold):
+        """
+        (return, bars held) of a trade entered at every bar, exiting when RSI
+        crosses `exit_level` or after `hold` bars; NaN where it cannot complete.
+        """
+        key = (window, exit_level, hold)
+        if key not in self._trades:
+            close = self.panel.close
+            rsi = self.rsi(window)
+            exit_hit = rsi >= exit_level if self.side == "long" else rsi <= exit_level
+            n = len(close)
+            offset = np.full(close.shape, hold, dtype=np.int64)
+            # Walk back from the horizon so the earliest exit wins
+            for k in range(hold, 0, -1):
+                hit = np.zeros(close.shape, dtype=bool)
+                hit[:n - k] = exit_hit[k:]
+                offset[hit] = k
+            exit_row = np.arange(n)[:, None] + offset
+            complete = exit_row < n
+            exit_close = np.take_along_axis(close, np.minimum(exit_row, n - 1), axis=0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ret = exit_close / close - 1.0
+            if self.side == "short":
+                ret = -ret
+            ret[~complete] = np.nan
+            self._trades[key] = (ret, offset)
+        return self._trades[key]
+
+    def evaluate(self, cell):
+        window, lower, upper, atr_cutoff, hold = cell
+        rsi = self.rsi(window)
+        if self.side == "long":
+            entry = rsi <= lower
+            ret, bars = self.trades(window, upper, hold)
+        else:
+            entry = rsi >= upper
+            ret, bars = self.trades(window, lower, hold)
+        entry &= self.atr_pct >= atr_cutoff
+        entry &= ~np.isnan(ret)
+        return _stats(ret[entry], bars[entry])
+
+
+def _stats(returns, bars):
+    if not len(returns):
+        return dict.fromkeys(STAT_NAMES, 0)
+    gains = returns[returns > 0].sum()
+    losses = -returns[returns < 0].sum()
+    return {
+        "trades": int(len(returns)),
+        "win_rate": round(float((returns > 0).mean()) * 100, 2),
+        "avg_return": round(float(returns.mean()) * 100, 4),
+        "median_return": round(float(np.median(returns)) * 100, 4),
+        "profit_factor": round(float(gains / losses), 4) if losses > 0 else math.inf,
+        "avg_bars": round(float(bars.mean()), 2),
+    }
+
+
+# --- process pool -----------------------------------------------------------
+
+_worker = None
+
+
+def _init_worker(panel, side):
+    global _worker
+    _worker = Evaluator(panel, side)
+
+
+def _evaluate_chunk(cells):
+    return [(cell, _worker.evaluate(cell)) for cell in cells]
+
+
+def run_grid(panel, cells, side="long", workers=None):
+    """Evaluate every cell; returns [(cell, stats)] in grid order."""
+    workers = workers or os.cpu_count() or 1
+    # Cells sharing an RSI window / exit / hold share indicator and return arrays,
+    # so chunks are cut from the grid sorted that way
+    ordered = sorted(cells, key=lambda c: (c[0], c[2], c[1], c[4], c[3]))
+    if workers == 1 or len(cells) < 2 * workers:
+        evaluator = Evaluator(panel, side)
+        results = [(cell, evaluator.evaluate(cell)) for cell in ordered]
+    else:
+        size = max(1, math.ceil(len(ordered) / (workers * 4)))
+        chunks = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(panel, side)) as pool:
+            results = [r for chunk in pool.map(_evaluate_chunk, chunks) for r in chunk]
+    position = {cell: i for i, cell in enumerate(cells)}
+    return sorted(results, key=lambda r: position[r[0]])
+
+
+# --- command line -----------------------------------------------------------
+
+def _values(spec, kind=float):
+    """'3,7,14' -> [3, 7, 14]; 'start:stop:step' -> inclusive range."""
+    out = []
+    for part in spec.split(","):
+        if ":" in part:
+            start, stop, step = (kind(x) for x in part.split(":"))
+            count = int(round((stop - start) / step)) + 1
+            out.extend(kind(round(start + i * step, 10)) for i in range(count))
+        elif part.strip():
+            out.append(kind(part))
+    return out
+
+
+def load_panel(symbols, period, interval):
+    """Download OHLC for `symbols` through the rate-limited market data provider."""
+    from services import stock_service
+    frame = stock_service._download(symbols, period=period, interval=interval, progress=False, group_by="ticker")
+    return Panel.from_download(frame, symbols)
+
+
+def watchlist_symbols():
+    from services import stock_service
+    symbols = []
+    for stocks in stock_service.watchlist_data.values():
+        for stock in stocks:
+            if stock.get("symbol") and stock["symbol"] not in symbols:
+                symbols.append(stock["symbol"])
+    return symbols
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the RSI / ATR% screens over a parameter grid")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: every watchlist symbol)")
+    parser.add_argument("--period", default="2y", help="History to test over (default: 2y)")
+    parser.add_argument("--interval", default="1d", help="Bar interval, e.g. 1d or 1h (default: 1d)")
+    parser.add_argument("--fixture", metavar="PATH", help="Replay recorded market data instead of calling yfinance")
+    parser.add_argument("--panel", metavar="PATH",
+                        help="Load the OHLC panel from this .npz if it exists, otherwise download and save it there")
+    parser.add_argument("--rsi-windows", default="3,7,14")
+    parser.add_argument("--lower", default="20:35:5", help="RSI entry (long) / exit (short) levels")
+    parser.add_argument("--upper", default="65:80:5", help="RSI exit (long) / entry (short) levels")
+    parser.add_argument("--atr", default="0:4:0.5", help="Minimum ATR%% on the entry bar")
+    parser.add_argument("--hold", default="1,2,3,5,10", help="Maximum bars held")
+    parser.add_argument("--side", choices=SIDES, default="long")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--out", metavar="CSV", help="Write every cell's results to this CSV file")
+    parser.add_argument("--top", type=int, default=20, help="Best cells to print, by average return")
+    parser.add_argument("--min-trades", type=int, default=30, help="Ignore cells with fewer trades when ranking")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.panel and os.path.exists(args.panel):
+        panel = Panel.load(args.panel)
+    else:
+        if args.fixture:
+            from services import stock_service
+            from services.fixtures import ReplayProvider
+            stock_service.set_market_data_provider(ReplayProvider(args.fixture))
+        symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else watchlist_symbols()
+        panel = load_panel(symbols, args.period, args.interval)
+        if args.panel:
+            panel.save(args.panel)
+
+    cells = parameter_grid(_values(args.rsi_windows, int), _values(args.lower), _values(args.upper),
+                           _values(args.atr), _values(args.hold, int))
+    print(f"Backtesting {len(cells)} parameter sets over {len(panel.symbols)} symbols x {len(panel.close)} bars...")
+    started = time.perf_counter()
+    results = run_grid(panel, cells, side=args.side, workers=args.workers)
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(PARAM_NAMES + STAT_NAMES)
+            for cell, stats in results:
+                writer.writerow(list(cell) + [stats[k] for k in STAT_NAMES])
+        print(f"Results written to {args.out}")
+
+    ranked = sorted((r for r in results if r[1]["trades"] >= args.min_trades),
+                    key=lambda r: r[1]["avg_return"], reverse=True)[:args.top]
+    writer = csv.writer(sys.stdout)
+    writer.writerow(PARAM_NAMES + STAT_NAMES)
+    for cell, stats in ranked:
+        writer.writerow(list(cell) + [stats[k] for k in STAT_NAMES])
+
+
+if __name__ == "__main__":
+    main()
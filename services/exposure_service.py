@@ -0,0 +1,199 @@
+"""
+Look-through exposure of a set of positions via the watchlist ETFs.
+
+ETF top-holdings weights are kept as a sparse ETF x constituent matrix (COO:
+row, col, weight), built once per holdings refresh. Exposure for a set of
+positions is then a weighted bincount over the non-zero entries, so it stays
+cheap as the number of ETFs and the holdings depth grow.
+"""
+import math
+
+import numpy as np
+
+UNCLASSIFIED = "Unclassified"
+# ETF weight outside the reported top holdings
+OTHER_HOLDINGS = "Other holdings"
+
+_MEMO_SIZE = 128
+# Symbols listed (with their per-ETF breakdown) in bySymbol
+DEFAULT_TOP_SYMBOLS = 100
+
+
+class HoldingsMatrix:
+    """Sparse ETF x constituent weight matrix; weights are fractions of each ETF."""
+
+    def __init__(self, etfs, constituents, rows, cols, weights, sectors=None, industries=None, built_at=None):
+        self.etfs = list(etfs)
+        self.constituents = list(constituents)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.sectors = list(sectors or [UNCLASSIFIED] * len(self.constituents))
+        self.industries = list(industries or [UNCLASSIFIED] * len(self.constituents))
+        self.built_at = built_at
+
+        self.etf_pos = {s: i for i, s in enumerate(self.etfs)}
+        self.constituent_pos = {s: i for i, s in enumerate(self.constituents)}
+        # Share of each ETF covered by its reported holdings (capped at 100%)
+        self.coverage = np.minimum(np.bincount(self.rows, weights=self.weights, minlength=len(self.etfs)), 1.0)
+        # Constituent -> sector / industry codes, so grouping is a bincount too
+        self.sector_names, self.sector_codes = _encode(self.sectors)
+        self.industry_names, self.industry_codes = _encode(self.industries)
+        self._memo = {}
+
+    @classmethod
+    def from_etf_items(cls, etf_items, classify, built_at=None):
+        """
+        Build from ETF records carrying "holdings" lists ({symbol, name, weight%}).
+        classify(symbol) -> (sector, industry) labels each constituent.
+        """
+        etfs, positions, rows, cols, weights = [], {}, [], [], []
+        for item in etf_items:
+            etf = (item.get("Symbol") or item.get("symbol") or "").upper()
+            if not etf or etf in etfs:
+                continue
+            row = len(etfs)
+            etfs.append(etf)
+            for h in item.get("holdings") or []:
+                symbol = (h.get("symbol") or "").upper()
+                weight = h.get("weight")
+                if not symbol or not isinstance(weight, (int, float)) or not math.isfinite(weight) or weight <= 0:
+                    continue
+                rows.append(row)
+                cols.append(positions.setdefault(symbol, len(positions)))
+                weights.append(weight / 100.0)
+        constituents = list(positions)
+        labels = [classify(s) for s in constituents]
+        return cls(etfs, constituents, rows, cols, weights,
+                   sectors=[l[0] for l in labels], industries=[l[1] for l in labels], built_at=built_at)
+
+    def to_dict(self):
+        return {
+            "etfs": self.etfs,
+            "constituents": self.constituents,
+            "rows": self.rows.tolist(),
+            "cols": self.cols.tolist(),
+            "weights": self.weights.tolist(),
+            "sectors": self.sectors,
+            "industries": self.industries,
+            "builtAt": self.built_at,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["etfs"], d["constituents"], d["rows"], d["cols"], d["weights"],
+                   sectors=d.get("sectors"), industries=d.get("industries"), built_at=d.get("builtAt"))
+
+    def exposure(self, positions, classify, top=DEFAULT_TOP_SYMBOLS):
+        """
+        Aggregated look-through exposure for {symbol: position weight}. Weights
+        are normalised to sum to 1; ETFs in the matrix are looked through and
+        anything else counts as a direct holding. bySymbol lists the `top`
+        largest exposures; sector/industry totals cover everything. Results are
+        memoised per position set for the lifetime of the matrix.
+        """
+        key = (tuple(sorted(positions.items())), top)
+        cached = self._memo.get(key)
+        if cached is None:
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            cached = self._memo[key] = self._exposure(positions, classify, top)
+        return cached
+
+    def _exposure(self, positions, classify, top):
+        total = sum(w for w in positions.values() if w > 0)
+        if total <= 0:
+            return {"positions": {}, "bySymbol": [], "bySector": {}, "byIndustry": {}, "otherHoldings": 0.0}
+
+        etf_weights = np.zeros(len(self.etfs))
+        direct = {}
+        for symbol, w in positions.items():
+            if w <= 0:
+                continue
+            i = self.etf_pos.get(symbol)
+            if i is None:
+                direct[symbol] = direct.get(symbol, 0.0) + w / total
+            else:
+                etf_weights[i] += w / total
+
+        # Contribution of every non-zero (ETF, constituent) entry, then sum per constituent
+        contrib = etf_weights[self.rows] * self.weights
+        via = np.bincount(self.cols, weights=contrib, minlength=len(self.constituents))
+        other = float(etf_weights.sum() - (etf_weights * self.coverage).sum())
+
+        by_sector = _grouped(self.sector_names, self.sector_codes, via)
+        by_industry = _grouped(self.industry_names, self.industry_codes, via)
+
+        for symbol, w in direct.items():
+            sector, industry = classify(symbol)
+            by_sector[sector] = by_sector.get(sector, 0.0) + w
+            by_industry[industry] = by_industry.get(industry, 0.0) + w
+
+        # Total per symbol (look-through plus direct), then keep the `top` largest
+        totals = via.copy()
+        extra = []
+        for symbol, w in direct.items():
+            j = self.constituent_pos.get(symbol)
+            if j is None:
+                extra.append((symbol, w))
+            else:
+                totals[j] += w
+        candidates = [(float(totals[j]), self.constituents[j]) for j in _top_indices(totals, top)]
+        candidates += [(w, symbol) for symbol, w in extra]
+        candidates = sorted(candidates, reverse=True)[:top]
+
+        # Per-ETF breakdown, only for the listed symbols
+        listed = np.array([self.constituent_pos[s] for _, s in candidates if s in self.constituent_pos], dtype=np.int32)
+        breakdown = {}
+        active = np.nonzero((contrib > 0) & np.isin(self.cols, listed))[0]
+        for k in active[np.argsort(-contrib[active], kind="stable")]:
+            symbol = self.constituents[self.cols[k]]
+            breakdown.setdefault(symbol, []).append({"etf": self.etfs[self.rows[k]], "exposure": _pct(contrib[k])})
+
+        by_symbol = [{
+            "symbol": symbol,
+            "exposure": _pct(total_w),
+            "direct": _pct(direct.get(symbol, 0.0)),
+            "viaEtfs": breakdown.get(symbol, []),
+        } for total_w, symbol in candidates if total_w > 0]
+
+        if other > 0:
+            by_sector[OTHER_HOLDINGS] = by_sector.get(OTHER_HOLDINGS, 0.0) + other
+            by_industry[OTHER_HOLDINGS] = by_industry.get(OTHER_HOLDINGS, 0.0) + other
+
+        return {
+            "positions": {s: _pct(w / total) for s, w in positions.items() if w > 0},
+            "bySymbol": by_symbol,
+            "bySector": _sorted_pct(by_sector),
+            "byIndustry": _sorted_pct(by_industry),
+            "otherHoldings": _pct(other),
+        }
+
+
+def _top_indices(values, k):
+    """Indices of the k largest non-zero values (unordered)."""
+    nonzero = np.nonzero(values > 0)[0]
+    if len(nonzero) <= k:
+        return nonzero
+    return nonzero[np.argpartition(-values[nonzero], k)[:k]]
+
+
+def _encode(labels):
+    names = sorted(set(labels))
+    pos = {n: i for i, n in enumerate(names)}
+    return names, np.array([pos[l] for l in labels], dtype=np.int32)
+
+
+def _grouped(names, codes, values):
+    if not len(codes):
+        return {}
+    sums = np.bincount(codes, weights=values, minlength=len(names))
+    return {names[i]: float(v) for i, v in enumerate(sums) if v > 0}
+
+
+def _pct(fraction):
+    return round(float(fraction) * 100.0, 4)
+
+
+def _sorted_pct(totals):
+    return {k: _pct(v) for k, v in sorted(totals.items(), key=lambda kv: kv[1], reverse=True)}
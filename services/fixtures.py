@@ -0,0 +1,183 @@
+"""
+Record and replay upstream market data.
+
+RecordingProvider wraps yfinance and captures every download, .info,
+fast_info and funds_data.top_holdings response; ReplayProvider serves a saved
+recording so a refresh (or a profile of one) can be reproduced offline.
+Either can be installed with stock_service.set_market_data_provider().
+"""
+import logging
+import os
+import pickle
+import threading
+
+import pandas as pd
+
+
+class _Recording:
+    """Holds recorded responses; panels are merged per interval across calls."""
+
+    def __init__(self):
+        self.panels = {}      # interval -> DataFrame (group_by='ticker' layout)
+        self.info = {}        # symbol -> dict
+        self.fast_info = {}   # symbol -> dict
+        self.holdings = {}    # symbol -> DataFrame or None
+
+    def add_panel(self, interval, frame):
+        if frame is None or frame.empty:
+            return
+        if not isinstance(frame.columns, pd.MultiIndex):
+            return
+        existing = self.panels.get(interval)
+        if existing is None:
+            self.panels[interval] = frame
+            return
+        # New symbols and new bars of recorded ones; the latest download wins
+        # where they overlap, as a re-fetched bar replaces a partial one
+        self.panels[interval] = frame.combine_first(existing).sort_index()
+
+
+# yfinance `period` units, as offsets back from the last bar
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def _window_start(index, start=None, period=None):
+    """First timestamp of a download with `start` or `period`, or None for all of it."""
+    if start is not None:
+        first = pd.Timestamp(start)
+        if index.tz is not None and first.tz is None:
+            first = first.tz_localize(index.tz)
+        return first
+    if not period or period == "max" or index.empty:
+        return None
+    end = index[-1]
+    if period == "ytd":
+        return end.normalize().replace(month=1, day=1)
+    for unit, name in _PERIOD_UNITS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            # Whole days, so the first day of the window keeps all its bars
+            return (end - pd.DateOffset(**{name: int(period[:-len(unit)])})).normalize()
+    return None
+
+
+class _FundsData:
+    def __init__(self, top_holdings):
+        self.top_holdings = top_holdings
+
+
+class _RecordingTicker:
+    def __init__(self, provider, symbol):
+        self._provider = provider
+        self._ticker = provider.real.Ticker(symbol)
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        value = self._ticker.info
+        with self._provider.lock:
+            self._provider.recording.info[self.ticker] = dict(value or {})
+        return value
+
+    @property
+    def fast_info(self):
+        fi = self._ticker.fast_info
+        try:
+            snapshot = dict(fi)
+        except Exception:
+            snapshot = {}
+        with self._provider.lock:
+            self._provider.recording.fast_info[self.ticker] = snapshot
+        return fi
+
+    @property
+    def funds_data(self):
+        fd = self._ticker.funds_data
+        th = getattr(fd, "top_holdings", None) if fd is not None else None
+        with self._provider.lock:
+            self._provider.recording.holdings[self.ticker] = th
+        return fd
+
+
+class _Tickers:
+    def __init__(self, make_ticker, symbols):
+        if isinstance(symbols, str):
+            symbols = symbols.split()
+        self.tickers = {s: make_ticker(s) for s in symbols}
+
+
+class RecordingProvider:
+    """Pass-through to the live provider that records every response."""
+
+    def __init__(self, real, path):
+        self.real = real
+        self.path = path
+        self.lock = threading.Lock()
+        self.recording = _Recording()
+
+    def download(self, symbols, *args, **kwargs):
+        frame = self.real.download(symbols, *args, **kwargs)
+        with self.lock:
+            self.recording.add_panel(kwargs.get("interval", "1d"), frame)
+        return frame
+
+    def Ticker(self, symbol):
+        return _RecordingTicker(self, symbol)
+
+    def Tickers(self, symbols):
+        return _Tickers(self.Ticker, symbols)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.lock, open(self.path, "wb") as f:
+            pickle.dump(self.recording, f)
+        logging.info(f"Recorded market data fixture to {self.path}")
+
+
+class _ReplayTicker:
+    def __init__(self, recording, symbol):
+        self._recording = recording
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        return dict(self._recording.info.get(self.ticker, {}))
+
+    @property
+    def fast_info(self):
+        return dict(self._recording.fast_info.get(self.ticker, {}))
+
+    @property
+    def funds_data(self):
+        return _FundsData(self._recording.holdings.get(self.ticker))
+
+
+class ReplayProvider:
+    """Serves a recording made by RecordingProvider; never touches the network."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.recording = pickle.load(f)
+        logging.info(f"Replaying market data fixture from {path}")
+
+    def download(self, symbols, *args, **kwargs):
+        if isinstance(symbols, str):
+            symbols = symbols.split()
+        panel = self.recording.panels.get(kwargs.get("interval", "1d"))
+        if panel is None:
+            return pd.DataFrame()
+        available = set(panel.columns.get_level_values(0))
+        wanted = [s for s in symbols if s in available]
+        if not wanted:
+            return pd.DataFrame()
+        frame = panel.loc[:, wanted]
+        # Only the bars the live download would have returned
+        first = _window_start(frame.index, kwargs.get("start"), kwargs.get("period"))
+        if first is not None:
+            frame = frame[frame.index >= first]
+        return frame.dropna(how="all")
+
+    def Ticker(self, symbol):
+        return _ReplayTicker(self.recording, symbol)
+
+    def Tickers(self, symbols):
+        return _Tickers(self.Ticker, symbols)
@@ -0,0 +1,120 @@
+"""
+Sector / industry rollups of the watchlist for the native heatmap.
+
+Computed once per cache commit from the symbol records (each carries the
+`category` and `industry` from list_watchlist.json) and stored in the cache,
+so the heatmap endpoint and the static export only serve a small payload.
+Per group:
+
+    count, marketCap              symbols with data, summed market cap
+    change, equalChange           market-cap-weighted / equal-weighted Percent Change
+    medianRsi                     median daily RSI
+    atrPercent, atrPercentStd     mean and standard deviation of ATR%
+    advancers, decliners, unchanged
+"""
+import math
+import time
+
+import numpy as np
+
+UNCLASSIFIED = "Unclassified"
+
+
+def _number(v):
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return math.nan
+    return float(v)
+
+
+def _round(v, digits=2):
+    v = float(v)
+    return None if math.isnan(v) or math.isinf(v) else round(v, digits)
+
+
+def _group_stats(codes, n_groups, change, mcap, rsi, atr_pct):
+    """Per-group statistics via bincount; medians from one sort by (group, value)."""
+    def count(mask):
+        return np.bincount(codes[mask], minlength=n_groups)
+
+    def total(values, mask):
+        return np.bincount(codes[mask], weights=values[mask], minlength=n_groups)
+
+    has_change = ~np.isnan(change)
+    weighted = has_change & ~np.isnan(mcap) & (mcap > 0)
+    has_atr = ~np.isnan(atr_pct)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats = {
+            "count": np.bincount(codes, minlength=n_groups),
+            "marketCap": total(np.nan_to_num(mcap), ~np.isnan(mcap)),
+            "change": total(change * mcap, weighted) / total(mcap, weighted),
+            "equalChange": total(change, has_change) / count(has_change),
+            "atrPercent": total(atr_pct, has_atr) / count(has_atr),
+            "advancers": count(has_change & (change > 0)),
+            "decliners": count(has_change & (change < 0)),
+            "unchanged": count(has_change & (change == 0)),
+        }
+        mean_sq = total(atr_pct ** 2, has_atr) / count(has_atr)
+        stats["atrPercentStd"] = np.sqrt(np.maximum(mean_sq - stats["atrPercent"] ** 2, 0.0))
+
+    medians = np.full(n_groups, np.nan)
+    has_rsi = ~np.isnan(rsi)
+    order = np.lexsort((rsi[has_rsi], codes[has_rsi]))
+    sorted_codes, sorted_rsi = codes[has_rsi][order], rsi[has_rsi][order]
+    bounds = np.searchsorted(sorted_codes, np.arange(n_groups + 1))
+    for g in range(n_groups):
+        if bounds[g + 1] > bounds[g]:
+            medians[g] = np.median(sorted_rsi[bounds[g]:bounds[g + 1]])
+    stats["medianRsi"] = medians
+    return stats
+
+
+def _rows(names, stats, extra=None):
+    rows = []
+    for g, name in enumerate(names):
+        row = {"name": name, **(extra(g) if extra else {})}
+        for key, values in stats.items():
+            v = values[g]
+            if key in ("count", "advancers", "decliners", "unchanged"):
+                row[key] = int(v)
+            elif key == "marketCap":
+                row[key] = _round(v, 0)
+            else:
+                row[key] = _round(v)
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["marketCap"] or 0, reverse=True)
+
+
+def build_heatmap(records, built_at=None):
+    """
+    Rollups of `records` (one per symbol) by category and by category/industry.
+    Industries also list their symbols, largest first, for drill-down.
+    """
+    records = [r for r in records if isinstance(r, dict) and r.get("Symbol")]
+    categories = [r.get("category") or UNCLASSIFIED for r in records]
+    industries = [(c, r.get("industry") or UNCLASSIFIED) for c, r in zip(categories, records)]
+
+    change = np.array([_number(r.get("Percent Change")) for r in records])
+    mcap = np.array([_number(r.get("Market Cap")) for r in records])
+    rsi = np.array([_number(r.get("RSI")) for r in records])
+    atr_pct = np.array([_number(r.get("ATR_Percent")) for r in records])
+
+    cat_names = sorted(set(categories))
+    cat_pos = {k: i for i, k in enumerate(cat_names)}
+    cat_codes = np.array([cat_pos[c] for c in categories], dtype=np.int64)
+    ind_names = sorted(set(industries))
+    ind_pos = {k: i for i, k in enumerate(ind_names)}
+    ind_codes = np.array([ind_pos[k] for k in industries], dtype=np.int64)
+
+    members = [[] for _ in ind_names]
+    for i in np.argsort(-np.nan_to_num(mcap), kind="stable"):
+        members[ind_codes[i]].append(records[i]["Symbol"])
+
+    cat_stats = _group_stats(cat_codes, len(cat_names), change, mcap, rsi, atr_pct)
+    ind_stats = _group_stats(ind_codes, len(ind_names), change, mcap, rsi, atr_pct)
+    return {
+        "builtAt": built_at if built_at is not None else time.time(),
+        "categories": _rows(cat_names, cat_stats),
+        "industries": _rows([n for _, n in ind_names], ind_stats,
+                            extra=lambda g: {"category": ind_names[g][0], "symbols": members[g]}),
+    }
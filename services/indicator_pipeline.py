@@ -0,0 +1,270 @@
+"""
+Declarative indicator registry and the single-pass pipeline that fills it.
+
+Each Indicator names the record field it produces, the bar interval it reads,
+the price columns it needs and how many bars it needs before its value is
+defined (warm-up). compute_fields() turns each interval's yfinance download
+into one bars x symbols panel and evaluates every registered indicator on it
+through a shared BarPanel, which memoises intermediates (price changes, true
+range, RSI/ATR/EMA series) so indicators built on the same series do not
+recompute it. Values land in the cached record under their field names.
+
+Adding an indicator is one register() call:
+
+    register(Indicator("RSI3", "1d", ("Close",), 4, lambda p: p.rsi(3)[-1], digits=2, alpha=1 / 3))
+
+Recursive indicators (Wilder RSI/ATR, EMAs) also declare their smoothing
+factor `alpha`: the weight left on bars older than k is (1 - alpha)^k, which
+plan_lookback() uses to size downloads for a given convergence tolerance.
+"""
+import math
+import warnings
+
+import numpy as np
+
+from services.indicators import ema, price_changes, true_range, wilder_atr, wilder_rsi
+
+class Indicator:
+    """One record field computed from the bars of a single interval."""
+
+    def __init__(self, field, interval, inputs, warmup, compute, digits=None, alpha=None, window=None):
+        self.field = field
+        self.interval = interval      # yfinance interval, e.g. "1d" or "1h"
+        self.inputs = tuple(inputs)   # price columns read
+        self.warmup = warmup          # bars needed before the value is defined
+        self.compute = compute        # BarPanel -> latest value per symbol, shape (N,)
+        self.digits = digits          # round to this many decimals, if set
+        self.alpha = alpha            # smoothing factor of a recursive indicator, else None
+        self.window = window or warmup  # bars read by a windowed indicator
+
+    def lookback(self, tolerance):
+        """
+        Bars needed for the value to be within `tolerance` of one computed over
+        unlimited history: the warm-up, plus for recursive indicators enough
+        bars for the seed's remaining weight (1 - alpha)^k to drop below it.
+        """
+        if not self.alpha:
+            return max(self.warmup, self.window)
+        return self.warmup + math.ceil(math.log(tolerance) / math.log(1.0 - self.alpha))
+
+    def __repr__(self):
+        return f"Indicator({self.field!r}, {self.interval!r})"
+
+
+REGISTRY = []
+
+
+def register(indicator):
+    """Add an indicator (replacing one with the same field) and return it."""
+    REGISTRY[:] = [i for i in REGISTRY if i.field != indicator.field]
+    REGISTRY.append(indicator)
+    return indicator
+
+
+def registered_fields():
+    return [i.field for i in REGISTRY]
+
+
+def intervals():
+    """Intervals the registered indicators read, in registration order."""
+    return list(dict.fromkeys(i.interval for i in REGISTRY))
+
+
+def plan_lookback(tolerance, indicators=None):
+    """{interval: bars} to download so every indicator converges within `tolerance`."""
+    plan = {}
+    for ind in REGISTRY if indicators is None else indicators:
+        plan[ind.interval] = max(plan.get(ind.interval, 0), ind.lookback(tolerance))
+    return plan
+
+
+class BarPanel:
+    """Price columns of one interval as (T, N) arrays, with memoised derived series."""
+
+    def __init__(self, columns, length, index=None):
+        self.columns = columns
+        self.length = length
+        self.index = index  # bar timestamps, when built from a download
+        self._memo = {}
+
+    @classmethod
+    def from_download(cls, frame, symbols, inputs):
+        """From a yfinance download(group_by='ticker'); absent symbols are all-NaN columns."""
+        n = len(symbols)
+        if frame is None or getattr(frame, "empty", True):
+            return cls({c: np.full((0, n), np.nan) for c in inputs}, 0)
+        columns = {}
+        for col in inputs:
+            try:
+                # (bars x tickers) for one price column, in `symbols` order
+                sub = frame.xs(col, axis=1, level=1)
+                columns[col] = sub.reindex(columns=symbols).to_numpy(dtype=np.float64)
+            except (KeyError, TypeError, ValueError):
+                columns[col] = np.full((len(frame.index), n), np.nan)
+        return cls(columns, len(frame.index), frame.index)
+
+    def _cached(self, key, fn):
+        if key not in self._memo:
+            self._memo[key] = fn()
+        return self._memo[key]
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def close(self):
+        return self.columns["Close"]
+
+    def changes(self):
+        return self._cached("changes", lambda: price_changes(self.close))
+
+    def true_range(self):
+        return self._cached("tr", lambda: true_range(self["High"], self["Low"], self.close))
+
+    def rsi(self, window):
+        return self._cached(("rsi", window), lambda: wilder_rsi(self.close, window, changes=self.changes()))
+
+    def atr(self, window):
+        return self._cached(("atr", window), lambda: wilder_atr(None, None, None, window, tr=self.true_range()))
+
+    def ema(self, span, column="Close"):
+        return self._cached(("ema", span, column), lambda: ema(self[column], span))
+
+    def tail(self, window, column="Close"):
+        """The last `window` bars of a column (fewer when the panel is shorter)."""
+        return self[column][-window:]
+
+
+def quote_snapshot(panel):
+    """
+    Latest quote of every symbol of a daily panel, as arrays of shape (N,):
+
+        last, previous     last valid Close and the valid Close before it
+        lastPos, prevPos   their bar positions (-1 when there is none)
+        open, high, low    of the last valid bar
+        change, percent    last - previous, and that as % of previous
+        gaps               missing bars between the previous and the last close
+        valid              bars with a Close
+        missing            whether any bar of the panel lacks a Close
+    """
+    close = panel.close
+    t, n = close.shape
+    cols = np.arange(n)
+    valid = ~np.isnan(close)
+    pos = np.arange(t)[:, None]
+    last_pos = np.where(valid, pos, -1).max(axis=0, initial=-1)
+    prev_pos = np.where(valid & (pos < last_pos), pos, -1).max(axis=0, initial=-1)
+
+    def at(column, rows):
+        if t == 0:
+            return np.full(n, np.nan)
+        values = column[np.maximum(rows, 0), cols]
+        return np.where(rows >= 0, values, np.nan)
+
+    last = at(close, last_pos)
+    previous = at(close, prev_pos)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = last - previous
+        percent = np.where(previous != 0, change / previous * 100.0, np.nan)
+    return {
+        "last": last,
+        "previous": previous,
+        "lastPos": last_pos,
+        "prevPos": prev_pos,
+        "open": at(panel["Open"], last_pos) if "Open" in panel.columns else np.full(n, np.nan),
+        "high": at(panel["High"], last_pos) if "High" in panel.columns else np.full(n, np.nan),
+        "low": at(panel["Low"], last_pos) if "Low" in panel.columns else np.full(n, np.nan),
+        "change": change,
+        "percent": percent,
+        "gaps": np.where(prev_pos >= 0, last_pos - prev_pos - 1, 0),
+        "valid": valid.sum(axis=0),
+        "missing": ~valid.all(axis=0),
+    }
+
+
+def _sma(panel, window):
+    return np.nanmean(panel.tail(window), axis=0)
+
+
+def _macd(panel):
+    return panel.ema(12) - panel.ema(26)
+
+
+def _macd_signal(panel):
+    return panel._cached("macd_signal", lambda: ema(_macd(panel), 9))
+
+
+def _percent_b(panel, window=20, width=2.0):
+    tail = panel.tail(window)
+    mean = np.nanmean(tail, axis=0)
+    band = width * np.nanstd(tail, axis=0)
+    return (panel.close[-1] - (mean - band)) / (2 * band)
+
+
+def _year_position(panel, bars=252):
+    high = np.nanmax(panel.tail(bars, "High"), axis=0)
+    low = np.nanmin(panel.tail(bars, "Low"), axis=0)
+    return (panel.close[-1] - low) / (high - low) * 100.0
+
+
+# --- the indicators every refresh computes ----------------------------------
+
+_WILDER_14 = 1 / 14
+_EMA_26 = 2 / 27
+
+register(Indicator("RSI", "1d", ("Close",), 15, lambda p: p.rsi(14)[-1], alpha=_WILDER_14))
+# RSI as of the previous bar; the Wilder recursion at a bar only sees bars up to it
+register(Indicator("yRSI", "1d", ("Close",), 16, lambda p: p.rsi(14)[-2], alpha=_WILDER_14))
+register(Indicator("ATR", "1d", ("High", "Low", "Close"), 14, lambda p: p.atr(14)[-1], digits=4,
+                   alpha=_WILDER_14))
+register(Indicator("ATR_Percent", "1d", ("High", "Low", "Close"), 14,
+                   lambda p: p.atr(14)[-1] / p.close[-1] * 100.0, digits=2, alpha=_WILDER_14))
+register(Indicator("RSI1H", "1h", ("Close",), 15, lambda p: p.rsi(14)[-1], digits=2, alpha=_WILDER_14))
+register(Indicator("SMA50", "1d", ("Close",), 50, lambda p: _sma(p, 50), digits=4))
+register(Indicator("SMA200", "1d", ("Close",), 200, lambda p: _sma(p, 200), digits=4))
+register(Indicator("EMA20", "1d", ("Close",), 20, lambda p: p.ema(20)[-1], digits=4, alpha=2 / 21))
+register(Indicator("MACD", "1d", ("Close",), 26, lambda p: _macd(p)[-1], digits=4, alpha=_EMA_26))
+register(Indicator("MACD_Signal", "1d", ("Close",), 34, lambda p: _macd_signal(p)[-1], digits=4, alpha=_EMA_26))
+register(Indicator("MACD_Hist", "1d", ("Close",), 34,
+                   lambda p: _macd(p)[-1] - _macd_signal(p)[-1], digits=4, alpha=_EMA_26))
+register(Indicator("BB_PercentB", "1d", ("Close",), 20, lambda p: _percent_b(p), digits=4))
+register(Indicator("FiftyTwoWeekPosition", "1d", ("High", "Low", "Close"), 1,
+                   lambda p: _year_position(p), digits=2, window=252))
+
+
+def _clean(value, digits):
+    value = float(value)
+    if math.isnan(value) or math.isinf(value):
+        return 'N/A'
+    return round(value, digits) if digits is not None else value
+
+
+def compute_fields(frames, symbols, indicators=None):
+    """
+    Evaluate `indicators` (default: the registry) for every symbol in one pass
+    per interval. frames maps interval -> yfinance download(group_by='ticker'),
+    or a BarPanel of `symbols` already holding the columns the indicators read.
+    Returns {symbol: {field: value or 'N/A'}}.
+    """
+    indicators = REGISTRY if indicators is None else indicators
+    out = {sym: {} for sym in symbols}
+    by_interval = {}
+    for ind in indicators:
+        by_interval.setdefault(ind.interval, []).append(ind)
+
+    for interval, group in by_interval.items():
+        inputs = sorted({c for ind in group for c in ind.inputs} | {"Close"})
+        panel = frames.get(interval)
+        if not isinstance(panel, BarPanel):
+            panel = BarPanel.from_download(panel, symbols, inputs)
+        for ind in group:
+            if panel.length < ind.warmup:
+                values = np.full(len(symbols), np.nan)
+            else:
+                with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+                    # 'Mean of empty slice' for symbols with no bars in a window
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    values = np.asarray(ind.compute(panel), dtype=np.float64)
+            for sym, value in zip(symbols, values):
+                out[sym][ind.field] = _clean(value, ind.digits)
+    return out
@@ -0,0 +1,106 @@
+"""
+NumPy implementations of the TradingView-matching indicator definitions.
+
+Every function takes a 1-D series (T,) or a panel (T, N) of N symbols side by
+side and returns an array of the same shape, so the live refresh and the
+backtester compute RSI/ATR the same way. Wilder recursions loop over time
+only; each step is one vector operation across all symbols.
+"""
+import numpy as np
+
+
+def _as_float(a):
+    return np.asarray(a, dtype=np.float64)
+
+
+def price_changes(close):
+    """(gain, loss) per bar change, shape (T-1, ...); a missing close counts as no change."""
+    delta = np.diff(_as_float(close), axis=0)
+    return np.where(delta > 0, delta, 0.0), np.where(delta < 0, -delta, 0.0)
+
+
+def wilder_rsi(close, window=14, changes=None):
+    """
+    RSI with Wilder's smoothing seeded by the SMA of the first `window`
+    changes, as on TradingView. Values before the seed are NaN; a missing close
+    counts as no change (as in the pandas version this replaces). `changes`
+    may pass a precomputed price_changes(close).
+    """
+    close = _as_float(close)
+    out = np.full(close.shape, np.nan)
+    if close.shape[0] < window + 1:
+        return out
+    gain, loss = changes if changes is not None else price_changes(close)
+
+    avg_gain = np.empty(gain.shape)
+    avg_loss = np.empty(loss.shape)
+    avg_gain[:window - 1] = np.nan
+    avg_loss[:window - 1] = np.nan
+    g = gain[:window].mean(axis=0)
+    l = loss[:window].mean(axis=0)
+    avg_gain[window - 1], avg_loss[window - 1] = g, l
+    for i in range(window, len(gain)):
+        g = (g * (window - 1) + gain[i]) / window
+        l = (l * (window - 1) + loss[i]) / window
+        avg_gain[i], avg_loss[i] = g, l
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        out[1:] = 100.0 - 100.0 / (1.0 + rs)
+    return out
+
+
+def true_range(high, low, close):
+    """max(high - low, |high - prev close|, |low - prev close|), ignoring missing terms."""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev = np.empty_like(close)
+    prev[0] = np.nan
+    prev[1:] = close[:-1]
+    ranges = np.stack([high - low, np.abs(high - prev), np.abs(low - prev)])
+    valid = ~np.isnan(ranges)
+    tr = np.where(valid, ranges, -np.inf).max(axis=0)
+    return np.where(valid.any(axis=0), tr, np.nan)
+
+
+def ewm(values, alpha):
+    """
+    Exponential moving average seeded with the first value; matches pandas
+    ewm(alpha=alpha, adjust=False), including how it re-weights after
+    missing values.
+    """
+    values = _as_float(values)
+    out = np.empty_like(values)
+    avg = np.array(values[0], dtype=np.float64)
+    skipped = np.zeros(avg.shape)
+    out[0] = avg
+    for i in range(1, len(values)):
+        x = values[i]
+        valid = ~np.isnan(x)
+        w_old = (1 - alpha) ** (skipped + 1)
+        step = (w_old * avg + alpha * x) / (w_old + alpha)
+        started = ~np.isnan(avg)
+        avg = np.where(valid, np.where(started, step, x), avg)
+        skipped = np.where(valid | ~started, 0, skipped + 1)
+        out[i] = avg
+    return out
+
+
+def ema(values, span):
+    """EMA with alpha = 2 / (span + 1), as TradingView's ta.ema."""
+    return ewm(values, 2.0 / (span + 1))
+
+
+def wilder_atr(high, low, close, window=14, tr=None):
+    """
+    ATR as an EMA of the true range with alpha = 1/window, seeded with the
+    first true range (pandas ewm(adjust=False)). `tr` may pass a precomputed
+    true_range(high, low, close).
+    """
+    return ewm(true_range(high, low, close) if tr is None else tr, 1.0 / window)
+
+
+def atr_percent(high, low, close, window=14):
+    """ATR as a percentage of the close."""
+    close = _as_float(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return wilder_atr(high, low, close, window) / close * 100.0
@@ -0,0 +1,214 @@
+"""
+Process-wide adaptive limiter for upstream (yfinance) calls.
+
+Every download, .info and funds_data request goes through `limiter.call()`.
+The limiter runs AIMD on concurrency: the number of calls allowed in flight
+is raised additively while calls succeed and cut multiplicatively on a 429.
+A 429 also starts a cooldown (Retry-After when the upstream sends one,
+otherwise exponential backoff with jitter) during which no call starts, and
+the call is retried, so a refresh slows down instead of failing. The learned
+state is persisted so the next run starts at the last known-good rate and
+honours a pending cooldown.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from config import (
+    CACHE_DIR, RATE_LIMIT_STATE_FILE, RATE_LIMIT_MIN_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY, RATE_LIMIT_MAX_RETRIES,
+)
+from utils.metrics import metrics
+
+
+class RateLimitError(Exception):
+    """Raised when yfinance (or the upstream API) returns a 429 / rate limit error."""
+    pass
+
+
+def is_rate_limit_error(exc):
+    """True if exc (or an error message) looks like an upstream 429."""
+    if isinstance(exc, RateLimitError):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    msg = str(exc)
+    return '429' in msg or 'Too Many Requests' in msg or 'rate limit' in msg.lower()
+
+
+def retry_after_seconds(exc):
+    """Read a Retry-After header (seconds or HTTP date) off the exception's response."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("Retry-After")
+    except Exception:
+        return None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class AdaptiveRateLimiter:
+    """AIMD concurrency limiter with cooldowns and persistent state."""
+
+    def __init__(self, state_file=None, min_concurrency=1, max_concurrency=8, initial_concurrency=2,
+                 additive_increase=1.0, multiplicative_decrease=0.5, max_retries=5,
+                 base_backoff=2.0, max_backoff=300.0):
+        self.state_file = state_file
+        self.min_concurrency = float(min_concurrency)
+        self.max_concurrency = float(max_concurrency)
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._save_lock = threading.Lock()
+        self.in_flight = 0
+        self.concurrency = float(initial_concurrency)
+        self.cooldown_until = 0.0
+        self.last_rate_limited_at = None
+        self.rate_limited_total = 0
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.concurrency = min(self.max_concurrency, max(self.min_concurrency, float(state.get('concurrency', self.concurrency))))
+            self.cooldown_until = float(state.get('cooldown_until', 0.0))
+            self.last_rate_limited_at = state.get('last_rate_limited_at')
+            self.rate_limited_total = int(state.get('rate_limited_total', 0))
+            logging.info(f"Rate limiter state loaded: concurrency={self.concurrency:.2f}")
+        except Exception as e:
+            logging.error(f"Error loading rate limiter state: {e}")
+
+    def save(self):
+        """Persist the learned limits so the next run starts from them."""
+        if not self.state_file:
+            return
+        with self._cond:
+            state = {
+                'concurrency': round(self.concurrency, 4),
+                'cooldown_until': self.cooldown_until,
+                'last_rate_limited_at': self.last_rate_limited_at,
+                'rate_limited_total': self.rate_limited_total,
+                'updated_at': time.time(),
+            }
+        try:
+            with self._save_lock:
+                os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+                tmp = f"{self.state_file}.tmp"
+                with open(tmp, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp, self.state_file)
+        except Exception as e:
+            logging.error(f"Error saving rate limiter state: {e}")
+
+    # -- slots -------------------------------------------------------------
+
+    def acquire(self):
+        """Block until a concurrency slot is free and no cooldown is pending."""
+        with self._cond:
+            while True:
+                wait = self.cooldown_until - time.time()
+                if wait <= 0 and self.in_flight < max(1, int(self.concurrency)):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self):
+        with self._cond:
+            # Additive increase: roughly +1 slot per "round" of successful calls
+            self.concurrency = min(self.max_concurrency,
+                                   self.concurrency + self.additive_increase / max(1.0, self.concurrency))
+            self._cond.notify_all()
+
+    def _on_rate_limited(self, retry_after, attempt):
+        with self._cond:
+            now = time.time()
+            # Calls in flight tend to fail together; treat a burst as one
+            # congestion signal and only cut once per cooldown window.
+            if now >= self.cooldown_until:
+                self.concurrency = max(self.min_concurrency, self.concurrency * self.multiplicative_decrease)
+            if retry_after is None:
+                delay = min(self.max_backoff, self.base_backoff * (2 ** attempt)) * random.uniform(0.8, 1.2)
+            else:
+                delay = min(self.max_backoff, retry_after)
+            self.cooldown_until = max(self.cooldown_until, now + delay)
+            self.last_rate_limited_at = now
+            self.rate_limited_total += 1
+            self._cond.notify_all()
+        self.save()
+        return delay
+
+    # -- calls -------------------------------------------------------------
+
+    def call(self, kind, fn, *args, **kwargs):
+        """
+        Run fn under the limiter. Rate-limited attempts are retried after a
+        cooldown; RateLimitError is raised only once max_retries is exhausted.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                metrics.inc("upstream_calls_total", kind=kind)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self.release()
+                if not is_rate_limit_error(e):
+                    raise
+                metrics.inc("upstream_rate_limited_total", kind=kind)
+                delay = self._on_rate_limited(retry_after_seconds(e), attempt)
+                if attempt >= self.max_retries:
+                    raise RateLimitError(str(e)) from e
+                attempt += 1
+                metrics.inc("upstream_retries_total", kind=kind)
+                logging.warning(f"Rate limited on {kind} (attempt {attempt}/{self.max_retries}); "
+                                f"backing off {delay:.1f}s, concurrency now {self.concurrency:.2f}")
+                continue
+            self.release()
+            self._on_success()
+            return result
+
+    def snapshot(self):
+        """Current limiter state, for logs and run summaries."""
+        with self._cond:
+            return {
+                'concurrency': round(self.concurrency, 3),
+                'in_flight': self.in_flight,
+                'cooldown_remaining': max(0.0, round(self.cooldown_until - time.time(), 3)),
+                'rate_limited_total': self.rate_limited_total,
+            }
+
+
+# Shared by every upstream call in the process
+limiter = AdaptiveRateLimiter(
+    state_file=os.path.join(CACHE_DIR, RATE_LIMIT_STATE_FILE),
+    min_concurrency=RATE_LIMIT_MIN_CONCURRENCY,
+    max_concurrency=RATE_LIMIT_MAX_CONCURRENCY,
+    max_retries=RATE_LIMIT_MAX_RETRIES,
+)
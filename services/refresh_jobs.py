@@ -0,0 +1,209 @@
+"""
+Background refresh jobs, so a refresh does not hold an HTTP request open.
+
+POST REFRESH_JOBS_ENDPOINT queues a job for some categories and/or symbols
+and returns its id straight away; a small worker pool runs the jobs, so the
+Owned category can finish in seconds while a larger job carries on beside it.
+A job fetches its symbols in chunks of REFRESH_JOB_CHUNK_SIZE (see
+streaming_refresh) and saves each chunk into the cache as it lands, so
+clients polling /api/changes see records update during the job; the end of
+the job commits through the commit stages (heatmap, risk, alerts).
+
+Progress (symbols done, failures, ETA) is polled from the job, or streamed as
+server-sent events while the job runs.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from services.refresh_tracker import RefreshTracker
+from services.stock_service import (
+    cache, fetch_category_data, merge_records, category_cache_key, get_watchlist, _is_etf_category, _sort_category,
+)
+from services.streaming_refresh import StreamingRefresh, StreamJob
+from services import watchlists
+from services.watchlists import SHARED_STOCKS_KEY
+from config import (
+    REFRESH_JOB_WORKERS, REFRESH_JOB_CHUNK_SIZE, REFRESH_JOBS_KEEP, STREAM_MAX_MEMORY_MB, STREAM_MIN_CHUNK_SIZE,
+)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+def plan(categories=(), symbols=(), watchlist=None):
+    """
+    The StreamJobs refreshing `categories` and `symbols` of `watchlist`.
+    ValueError for an unknown category or an empty request, KeyError for an
+    unknown watchlist.
+    """
+    lists = get_watchlist(watchlist)
+    default = watchlists.is_default(watchlist)
+    parts = []
+    for category in categories:
+        if category not in lists:
+            raise ValueError(f"Unknown category: {category}")
+        key = category_cache_key(category) if default else SHARED_STOCKS_KEY
+        parts.append(StreamJob(key, category, lists[category], splittable=not _is_etf_category(category)))
+
+    if symbols:
+        # Symbols keep their watchlist entry (and so their category); others are fetched bare
+        entries = {stock["symbol"]: stock for stocks in lists.values() for stock in stocks if stock.get("symbol")}
+        grouped = {}
+        for symbol in dict.fromkeys(symbols):
+            stock = entries.get(symbol) or {"symbol": symbol}
+            grouped.setdefault(stock.get("category") or "Other", []).append(stock)
+        parts += [StreamJob(SHARED_STOCKS_KEY, category, stocks, splittable=not _is_etf_category(category))
+                  for category, stocks in grouped.items()]
+
+    if not any(part.stocks for part in parts):
+        raise ValueError("Nothing to refresh: give categories or symbols")
+    return parts
+
+
+class RefreshJob:
+    """One queued, running or finished refresh and its progress."""
+
+    def __init__(self, categories, symbols, watchlist, parts):
+        self.id = uuid.uuid4().hex[:12]
+        self.categories = list(categories)
+        self.symbols = list(symbols)
+        self.watchlist = watchlist
+        self.parts = parts
+        self.total = sum(len(part.stocks) for part in parts)
+        self.tracker = RefreshTracker()
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = 0
+        self.version = None
+        self.error = None
+        self.revision = 0
+        self._changed = threading.Condition()
+
+    @property
+    def request(self):
+        return (tuple(self.categories), tuple(self.symbols), self.watchlist)
+
+    def update(self, done=0, **fields):
+        with self._changed:
+            self.done += done
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.revision += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, revision, timeout):
+        """Block until the job moves past `revision` (or `timeout` passes); returns the current revision."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.revision != revision, timeout)
+            return self.revision
+
+    def to_dict(self):
+        summary = self.tracker.summary()
+        now = time.time()
+        elapsed = ((self.finished_at or now) - self.started_at) if self.started_at else 0.0
+        eta = None
+        if self.status == RUNNING and self.done:
+            eta = round(elapsed / self.done * (self.total - self.done), 1)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "categories": self.categories,
+            "symbols": self.symbols,
+            "watchlist": self.watchlist,
+            "total": self.total,
+            "done": self.done,
+            "failed": summary["failed"],
+            "failures": summary["failures"],
+            "staleFallbacks": summary["stale_fallbacks"],
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "elapsedSeconds": round(elapsed, 1),
+            "etaSeconds": eta,
+            "version": self.version,
+            "error": self.error,
+        }
+
+
+class RefreshJobs:
+    """The jobs of this process and the worker pool that runs them."""
+
+    def __init__(self, workers=REFRESH_JOB_WORKERS, keep=REFRESH_JOBS_KEEP, chunk_size=REFRESH_JOB_CHUNK_SIZE):
+        self.keep = keep
+        self.chunk_size = chunk_size
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh-job")
+
+    def submit(self, categories=(), symbols=(), watchlist=None):
+        """
+        Queue a refresh and return (job, created). A request identical to a
+        job still queued or running returns that job instead.
+        """
+        categories = list(dict.fromkeys(categories))
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+        watchlist = None if watchlists.is_default(watchlist) else watchlist
+        parts = plan(categories, symbols, watchlist)
+        request = (tuple(categories), tuple(symbols), watchlist)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.request == request and job.status not in FINISHED:
+                    return job, False
+            job = RefreshJob(categories, symbols, watchlist, parts)
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        """Every kept job, newest first."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        job.update(status=RUNNING, started_at=time.time())
+
+        def fetch(category, stocks):
+            return fetch_category_data(category, tracker=job.tracker, stocks=stocks)
+
+        streamer = StreamingRefresh(fetch, self.chunk_size, 1, STREAM_MAX_MEMORY_MB, STREAM_MIN_CHUNK_SIZE)
+        try:
+            for part, stocks, records, error in streamer.run(job.parts):
+                if error is not None:
+                    # The chunk's symbols keep their cached records
+                    logging.error(f"Refresh job {job.id}: {len(stocks)} symbols of {part.category} failed: {error}")
+                    for stock in stocks:
+                        job.tracker.record_failure(stock["symbol"], f"error: {error}")
+                    records = []
+                with cache.lock:
+                    cache.set_many(merge_records(records, part.key))
+                    version = cache.version
+                job.update(done=len(stocks), version=version)
+
+            # Category lists back in display order, then the commit stages over the result
+            with cache.lock:
+                cache.commit({part.key: _sort_category(list(cache.data.get(part.key) or []), part.category)
+                              for part in job.parts if part.key != SHARED_STOCKS_KEY})
+                version = cache.version
+            job.update(status=DONE, finished_at=time.time(), version=version)
+            logging.info(f"Refresh job {job.id} done: {job.done} symbols, version {version}")
+        except Exception as e:
+            logging.error(f"Refresh job {job.id} failed: {e}", exc_info=True)
+            job.update(status=FAILED, finished_at=time.time(), error=str(e))
+
+
+refresh_jobs = RefreshJobs()
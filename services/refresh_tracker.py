@@ -0,0 +1,92 @@
+"""
+Per-symbol bookkeeping for a refresh run.
+
+The tracker remembers which symbols already produced a complete record and
+which failed (and why). It checkpoints to disk after each category, so a
+refresh that dies half-way can be re-run without refetching symbols that
+already succeeded; the checkpoint is cleared once the refresh is committed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+
+class RefreshTracker:
+    """Tracks per-symbol refresh results and checkpoints them to disk."""
+
+    def __init__(self, checkpoint_file=None):
+        self.checkpoint_file = checkpoint_file
+        self.started_at = time.time()
+        self.records = {}    # symbol -> complete, freshly fetched record
+        self.failures = {}   # symbol -> reason of the last failed attempt
+        self.stale = {}      # symbol -> age (seconds) of the fallback record served
+        self._lock = threading.Lock()
+
+    @classmethod
+    def resume_or_start(cls, checkpoint_file, max_age_seconds):
+        """Resume a recent unfinished run from its checkpoint, or start fresh."""
+        tracker = cls(checkpoint_file)
+        if not checkpoint_file or not os.path.exists(checkpoint_file):
+            return tracker
+        try:
+            with open(checkpoint_file, 'r') as f:
+                state = json.load(f)
+            if time.time() - state.get('started_at', 0) > max_age_seconds:
+                logging.info("Discarding stale refresh checkpoint")
+                return tracker
+            tracker.started_at = state['started_at']
+            tracker.records = state.get('records', {})
+            logging.info(f"Resuming refresh: {len(tracker.records)} symbols already fetched")
+        except Exception as e:
+            logging.error(f"Error loading refresh checkpoint: {e}")
+        return tracker
+
+    def succeeded(self, symbol):
+        return symbol in self.records
+
+    def get(self, symbol):
+        return self.records.get(symbol)
+
+    def record_success(self, symbol, record):
+        with self._lock:
+            self.records[symbol] = record
+            self.failures.pop(symbol, None)
+            self.stale.pop(symbol, None)
+
+    def record_failure(self, symbol, reason):
+        with self._lock:
+            self.failures[symbol] = reason
+
+    def record_stale(self, symbol, age_seconds):
+        with self._lock:
+            self.stale[symbol] = age_seconds
+
+    def checkpoint(self):
+        """Write succeeded records to disk so an interrupted run can resume."""
+        if not self.checkpoint_file:
+            return
+        with self._lock:
+            state = {'started_at': self.started_at, 'records': dict(self.records)}
+        try:
+            tmp = f"{self.checkpoint_file}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self.checkpoint_file)
+        except Exception as e:
+            logging.error(f"Error writing refresh checkpoint: {e}")
+
+    def clear(self):
+        """Drop the checkpoint once the refresh has been committed."""
+        if self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'succeeded': len(self.records),
+                'failed': len(self.failures),
+                'stale_fallbacks': len(self.stale),
+                'failures': dict(self.failures),
+            }
@@ -0,0 +1,161 @@
+"""
+Correlation, beta and portfolio volatility from daily closes.
+
+Once per committed refresh the daily closes of every cached symbol (those
+the refresh downloaded, else the bar store's) become one aligned returns
+panel (bars x symbols) over the last `window` bars. All pairwise statistics
+come from four matrix products over that panel, using for each pair only the
+bars where both symbols traded:
+
+    n    = M'M          bars observed together
+    sx   = X'M          sum of i's returns over the bars j was observed
+    sxx  = (X*X)'M
+    sxy  = X'X
+
+with X the returns (missing as 0) and M the observed mask, so a full
+watchlist (hundreds of symbols) is a few milliseconds of BLAS rather than
+N^2 pandas correlations.
+"""
+import math
+import time
+
+import numpy as np
+
+TRADING_DAYS = 252
+# Correlations are stored as integers in units of 1 / CORRELATION_SCALE
+CORRELATION_SCALE = 10000
+
+
+def daily_returns(closes):
+    """Simple returns of a (T, N) close panel; NaN where either close is missing."""
+    closes = np.asarray(closes, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return closes[1:] / closes[:-1] - 1.0
+
+
+def pairwise_moments(returns, min_observations=2):
+    """
+    (covariance, variance) matrices of a (T, N) returns panel over pairwise
+    complete bars: variance[i, j] is the variance of i over the bars shared
+    with j. Pairs with fewer than `min_observations` shared bars are NaN.
+    """
+    mask = ~np.isnan(returns)
+    x = np.where(mask, returns, 0.0)
+    m = mask.astype(np.float64)
+    n = m.T @ m
+    sx = x.T @ m
+    sxx = (x * x).T @ m
+    sxy = x.T @ x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (sxy - sx * sx.T / n) / (n - 1)
+        var = (sxx - sx * sx / n) / (n - 1)
+    thin = n < max(min_observations, 2)
+    cov[thin] = np.nan
+    var[thin] = np.nan
+    return cov, var
+
+
+class RiskModel:
+    """Correlation matrix, annualised volatility and beta of a set of symbols."""
+
+    def __init__(self, symbols, correlation, volatility, beta, benchmark=None, window=None, built_at=None):
+        self.symbols = list(symbols)
+        self.correlation = np.asarray(correlation, dtype=np.float64).reshape(len(self.symbols), len(self.symbols))
+        self.volatility = np.asarray(volatility, dtype=np.float64)
+        self.beta = np.asarray(beta, dtype=np.float64)
+        self.benchmark = benchmark
+        self.window = window
+        self.built_at = built_at
+        self.pos = {s: i for i, s in enumerate(self.symbols)}
+
+    @classmethod
+    def from_closes(cls, symbols, closes, window, benchmark=None, min_observations=20, built_at=None):
+        """
+        From a (T, N) panel of daily closes, oldest first; statistics use the
+        last `window` returns. `benchmark` is the symbol betas are measured against.
+        """
+        returns = daily_returns(np.asarray(closes, dtype=np.float64)[-(window + 1):])
+        cov, var = pairwise_moments(returns, min_observations)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = cov / np.sqrt(var * var.T)
+            daily_vol = np.sqrt(np.diag(cov))
+            b = symbols.index(benchmark) if benchmark in symbols else None
+            # beta_i = cov(i, b) / var(b), over the bars i and b share
+            beta = cov[:, b] / var.T[:, b] if b is not None else np.full(len(symbols), np.nan)
+        np.fill_diagonal(correlation, np.where(np.isnan(daily_vol), np.nan, 1.0))
+        return cls(symbols, np.clip(correlation, -1.0, 1.0), daily_vol * math.sqrt(TRADING_DAYS), beta,
+                   benchmark=benchmark, window=window, built_at=built_at if built_at is not None else time.time())
+
+    def to_dict(self):
+        # Upper triangle only, as integers: a 270-symbol matrix is ~36k small numbers
+        upper = self.correlation[np.triu_indices(len(self.symbols), k=1)]
+        scaled = np.where(np.isnan(upper), CORRELATION_SCALE + 1, np.round(upper * CORRELATION_SCALE))
+        return {
+            "symbols": self.symbols,
+            "correlation": scaled.astype(np.int32).tolist(),
+            "volatility": [_round(v, 4) for v in self.volatility],
+            "beta": [_round(v, 4) for v in self.beta],
+            "benchmark": self.benchmark,
+            "window": self.window,
+            "builtAt": self.built_at,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        n = len(d["symbols"])
+        correlation = np.eye(n)
+        rows, cols = np.triu_indices(n, k=1)
+        scaled = np.asarray(d["correlation"], dtype=np.float64)
+        upper = np.where(scaled > CORRELATION_SCALE, np.nan, scaled / CORRELATION_SCALE)
+        correlation[rows, cols] = upper
+        correlation[cols, rows] = upper
+        volatility = np.array([np.nan if v is None else v for v in d["volatility"]], dtype=np.float64)
+        np.fill_diagonal(correlation, np.where(np.isnan(volatility), np.nan, 1.0))
+        beta = [np.nan if v is None else v for v in d["beta"]]
+        return cls(d["symbols"], correlation, volatility, beta,
+                   benchmark=d.get("benchmark"), window=d.get("window"), built_at=d.get("builtAt"))
+
+    def covariance(self, idx):
+        """Annualised covariance of the symbols at `idx`; pairs without enough overlap count as 0."""
+        vol = self.volatility[idx]
+        cov = self.correlation[np.ix_(idx, idx)] * np.outer(vol, vol)
+        return np.nan_to_num(cov)
+
+    def portfolio(self, weights):
+        """
+        Annualised volatility of {symbol: weight} (normalised to sum to 1) and
+        each position's share of the portfolio variance. Positions without a
+        volatility are left out and listed under "missing".
+        """
+        held = [s for s in weights if s in self.pos and not math.isnan(self.volatility[self.pos[s]])]
+        missing = sorted(s for s in weights if s not in held)
+        total = sum(weights[s] for s in held)
+        if not held or total <= 0:
+            return {"volatility": None, "contributions": {}, "missing": missing}
+        idx = np.array([self.pos[s] for s in held])
+        w = np.array([weights[s] for s in held], dtype=np.float64) / total
+        marginal = self.covariance(idx) @ w
+        variance = max(float(w @ marginal), 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = w * marginal / variance
+        return {
+            "volatility": _round(math.sqrt(variance), 4),
+            "contributions": {s: _round(v, 4) for s, v in zip(held, shares)},
+            "missing": missing,
+        }
+
+    def subset(self, symbols):
+        """Correlation sub-matrix, volatility and beta of `symbols` (unknown ones are skipped)."""
+        known = [s for s in symbols if s in self.pos]
+        idx = np.array([self.pos[s] for s in known], dtype=np.int64)
+        return {
+            "symbols": known,
+            "correlation": [[_round(v, 4) for v in row] for row in self.correlation[np.ix_(idx, idx)]],
+            "volatility": {s: _round(self.volatility[i], 4) for s, i in zip(known, idx)},
+            "beta": {s: _round(self.beta[i], 4) for s, i in zip(known, idx)},
+        }
+
+
+def _round(v, digits):
+    v = float(v)
+    return None if math.isnan(v) or math.isinf(v) else round(v, digits)
@@ -1,4 +1,22 @@
-from .stock_service import fetch_category_data, cache, _is_etf_category
+import argparse
+import logging
+import os
+from datetime import datetime
+from . import stock_service
+from .stock_service import (
+    fetch_category_data, fetch_unshared_stocks, cache, _is_etf_category, _sort_category, category_cache_key,
+)
+from .watchlists import SHARED_STOCKS_KEY
+from .fixtures import RecordingProvider, ReplayProvider
+from .rate_limiter import limiter
+from .refresh_tracker import RefreshTracker
+from .streaming_refresh import StreamingRefresh, StreamJob
+from config import (
+    CACHE_DIR, METRICS_SUMMARY_FILE, PROFILE_DIR, REFRESH_CHECKPOINT_FILE, REFRESH_CHECKPOINT_MAX_AGE,
+    STREAM_CHUNK_SIZE, STREAM_WORKERS, STREAM_MAX_MEMORY_MB, STREAM_MIN_CHUNK_SIZE,
+)
+from utils.metrics import metrics
+from utils.profiling import StageProfiler
 
 # These categories must match the ones used by the UI and build_static.py
 ACTIVE_CATEGORIES = [
@@ -15,28 +33,161 @@ ACTIVE_CATEGORIES = [
     "ETFs",
 ]
 
-def main():
+def _refresh_categories(tracker, failed_categories):
+    """One fetch per category, then the symbols only other watchlists hold."""
+    for category in ACTIVE_CATEGORIES:
+        print(f"  - Fetching data for: {category}")
+        try:
+            with metrics.stage("category"):
+                data = fetch_category_data(category, tracker=tracker)
+        except Exception as e:
+            # The category keeps its last committed data (commit_refresh merges)
+            logging.error(f"Error refreshing category {category}: {e}", exc_info=True)
+            failed_categories.append(category)
+            continue
+        finally:
+            tracker.checkpoint()
+        
+        # Use the correct cache key format
+        cache.set(category_cache_key(category), data)
+
+    # Symbols only other watchlists hold; ones already fetched above are reused
+    # from the tracker, so each symbol is fetched once per run
+    print("  - Fetching symbols of the other watchlists")
+    try:
+        with metrics.stage("category"):
+            cache.set(SHARED_STOCKS_KEY, fetch_unshared_stocks(tracker=tracker))
+    except Exception as e:
+        logging.error(f"Error refreshing the other watchlists: {e}", exc_info=True)
+        failed_categories.append(SHARED_STOCKS_KEY)
+    finally:
+        tracker.checkpoint()
+
+def _stream_categories(tracker, failed_categories, chunk_size, workers, max_memory_mb):
+    """
+    The same categories in chunks of `chunk_size` symbols, `workers` at a time.
+    Each finished chunk is written to the refresh's cache data and checkpointed
+    right away; a chunk that fails keeps its symbols' last committed records.
+    """
+    watchlist = stock_service.load_watchlist_data()
+    jobs = [StreamJob(category_cache_key(c), c, watchlist.get(c, []), splittable=not _is_etf_category(c))
+            for c in ACTIVE_CATEGORIES]
+    jobs += [StreamJob(SHARED_STOCKS_KEY, c, stocks, splittable=not _is_etf_category(c))
+             for c, stocks in stock_service.unshared_watchlist_stocks(watchlist).items()]
+
+    def fetch(category, stocks):
+        return fetch_category_data(category, tracker=tracker, stocks=stocks)
+
+    # Bars are saved once at the end rather than after every chunk
+    stock_service.bar_store.autosave = False
+    streamer = StreamingRefresh(fetch, chunk_size, workers, max_memory_mb, STREAM_MIN_CHUNK_SIZE,
+                                on_pressure=stock_service.release_bar_store)
+    collected = {}
+    last_good = cache.symbol_index()
+    try:
+        for job, stocks, records, error in streamer.run(jobs):
+            if error is not None:
+                logging.error(f"Error refreshing {len(stocks)} symbols of {job.category}: {error}")
+                if job.category not in failed_categories:
+                    failed_categories.append(job.category)
+                records = [last_good[s["symbol"]] for s in stocks if s.get("symbol") in last_good]
+            collected.setdefault(job.key, []).extend(records)
+            cache.set(job.key, collected[job.key])
+            tracker.checkpoint()
+            print(f"  - {job.category}: {job.offset}/{len(job.stocks)} symbols "
+                  f"({streamer.summary()['peakMemoryMb']} MB peak)")
+    finally:
+        stock_service.bar_store.autosave = True
+        stock_service.release_bar_store()
+
+    categories = {job.key: job.category for job in jobs}
+    for key, records in collected.items():
+        _sort_category(records, categories[key] if key != SHARED_STOCKS_KEY else None)
+    return streamer.summary()
+
+def refresh(stream=False, chunk_size=STREAM_CHUNK_SIZE, workers=STREAM_WORKERS, max_memory_mb=STREAM_MAX_MEMORY_MB):
+    """
+    Fetch every active category and commit them to the cache in one save.
+    With `stream`, categories are fetched in chunks (see streaming_refresh).
+    """
     print("Starting cache refresh process...")
+    metrics.reset()
     
     # Start the refresh operation. This tells the cache to use temporary storage
     # and prevents saving the file after every category.
     cache.start_refresh()
 
-    for category in ACTIVE_CATEGORIES:
-        print(f"  - Fetching data for: {category}")
-        data = fetch_category_data(category)
-        
-        # Use the correct cache key format
-        if _is_etf_category(category):
-            key = "etfs:saved_stock_info:v2"
-        else:
-            key = f"stocks:saved_stock_info:{category.strip()}"
-        cache.set(key, data)
+    # Symbols fetched by an interrupted earlier run are reused from its checkpoint
+    tracker = RefreshTracker.resume_or_start(
+        os.path.join(CACHE_DIR, REFRESH_CHECKPOINT_FILE), REFRESH_CHECKPOINT_MAX_AGE)
+    failed_categories = []
 
-    # Commit the refresh. This replaces the old cache data with the new data
+    streaming = None
+    if stream:
+        streaming = _stream_categories(tracker, failed_categories, chunk_size, workers, max_memory_mb)
+    else:
+        _refresh_categories(tracker, failed_categories)
+
+    # Commit the refresh. This merges the new data over the old cache data
     # and saves the entire file once with an updated timestamp.
-    cache.commit_refresh()
-    print("Cache refresh complete. File 'cache/stock_data.json' has been updated.")
+    if cache.commit_refresh():
+        tracker.clear()
+        print("Cache refresh complete. File 'cache/stock_data.json' has been updated.")
+    else:
+        print("Cache refresh produced no data; the existing cache was left unchanged.")
+
+    summary = tracker.summary()
+    if summary['failed'] or summary['stale_fallbacks'] or failed_categories:
+        print(f"  {summary['failed']} symbols failed, {summary['stale_fallbacks']} served from last good data, "
+              f"{len(failed_categories)} categories kept their previous data")
+
+    # Per-run timings and counters, so slow or rate-limited runs can be diagnosed
+    summary_fp = os.path.join(CACHE_DIR, METRICS_SUMMARY_FILE)
+    limiter.save()
+    metrics.write_summary(summary_fp, categories=ACTIVE_CATEGORIES, last_updated=cache.last_updated,
+                          rate_limiter=limiter.snapshot(), symbols=summary,
+                          failed_categories=failed_categories, streaming=streaming)
+    print(f"Refresh metrics written to {summary_fp}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh cache/stock_data.json from the market data provider")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                        help=f"Run under the stage profiler and write results to DIR (default: {PROFILE_DIR}/<timestamp>)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--fixture", metavar="PATH", help="Replay recorded market data instead of calling yfinance")
+    source.add_argument("--record", metavar="PATH", help="Record all upstream responses to PATH for later --fixture runs")
+    parser.add_argument("--stream", action="store_true",
+                        help="Fetch in chunks, writing each to the cache as it completes (large universes)")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE, help="Symbols per chunk with --stream")
+    parser.add_argument("--workers", type=int, default=STREAM_WORKERS, help="Chunks fetched in parallel with --stream")
+    parser.add_argument("--max-memory-mb", type=int, default=STREAM_MAX_MEMORY_MB,
+                        help="Resident memory above which --stream flushes bars and shrinks chunks (0: no ceiling)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    options = dict(stream=args.stream, chunk_size=args.chunk_size, workers=args.workers,
+                   max_memory_mb=args.max_memory_mb or None)
+
+    recorder = None
+    if args.fixture:
+        stock_service.set_market_data_provider(ReplayProvider(args.fixture))
+    elif args.record:
+        recorder = RecordingProvider(stock_service.yf, args.record)
+        stock_service.set_market_data_provider(recorder)
+
+    try:
+        if args.profile is not None:
+            out_dir = args.profile or os.path.join(PROFILE_DIR, datetime.now().strftime("%Y%m%d-%H%M%S"))
+            with StageProfiler(out_dir), metrics.stage("refresh"):
+                refresh(**options)
+            print(f"Profile written to {out_dir}")
+        else:
+            refresh(**options)
+    finally:
+        if recorder:
+            recorder.save()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+In-memory symbol / name search over the watchlist and the cached records.
+
+Built once per committed refresh (and when the watchlist changes), so a query
+never scans the records:
+
+    symbol trie        prefixes of the ticker ("ms" -> MS, MSFT, MSCI)
+    name trie          prefixes of the whole company name ("taiwan semi")
+    inverted index     token -> {doc: weight} over Name, industry, category
+                       and stock_description (name words weigh the most),
+                       with a sorted vocabulary of the name / industry /
+                       category words for word-prefix lookups
+    deletion index     every vocabulary word and its one-letter deletions,
+                       for typo-tolerant lookups ("nvidai" -> nvidia)
+
+Each trie node keeps the documents below it ordered by market cap, so a
+prefix lookup is a walk down the trie plus a slice. Query words must all
+match (the last one may be a prefix); ties rank by market cap.
+"""
+import heapq
+import re
+from bisect import bisect_left
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at by for from has in inc is it its of on or the to with".split())
+
+# Score of a document for one query word, by how the word matched
+EXACT_SYMBOL = 100
+SYMBOL_PREFIX = 60
+NAME_PREFIX = 40
+TOKEN_WEIGHT = 10   # times the field weight below
+PREFIX_FACTOR = 0.8  # a word the query word is a prefix of
+FUZZY_FACTOR = 0.5  # typo matches score half of the exact word
+FIELD_WEIGHTS = {"name": 3, "industry": 2, "category": 2, "description": 1}
+# Fuzzy matching only for words at least this long
+FUZZY_MIN_LENGTH = 4
+# Documents a bare prefix contributes (best ranked first), and vocabulary
+# words a word prefix expands to
+PREFIX_LIMIT = 500
+PREFIX_WORDS = 50
+# Shortest query word expanded to the words it prefixes
+PREFIX_MIN_LENGTH = 2
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def _deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class _Trie:
+    """Prefix -> document ids; ids are kept in rank order, each once per node."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key, doc):
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+            ids = node.setdefault("", [])
+            if not ids or ids[-1] != doc:
+                ids.append(doc)
+
+    def get(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return ()
+        return node.get("", ())
+
+
+class SearchIndex:
+    """Ranked prefix / token / fuzzy search over symbol documents."""
+
+    def __init__(self, docs):
+        # Best-ranked documents first, so trie nodes and ties come out in rank order
+        self.docs = sorted(docs, key=lambda d: (-(d.get("marketCap") or 0), d["symbol"]))
+        self.symbols = _Trie()
+        self.names = _Trie()
+        self.tokens = {}
+        self.headings = {}  # the name / industry / category part of self.tokens
+        self.variants = {}
+        for i, doc in enumerate(self.docs):
+            self.symbols.insert(doc["symbol"].lower(), i)
+            name = " ".join(TOKEN.findall((doc.get("name") or "").lower()))
+            self.names.insert(name, i)
+            fields = {
+                "name": tokenize(doc.get("name")),
+                "industry": tokenize(doc.get("industry")),
+                "category": tokenize(doc.get("category")),
+                "description": tokenize(doc.get("description")),
+            }
+            for field, words in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for word in words:
+                    postings = self.tokens.setdefault(word, {})
+                    if postings.get(i, 0) < weight:
+                        postings[i] = weight
+                        if field != "description":
+                            self.headings.setdefault(word, {})[i] = weight
+        for word in list(self.tokens) + [d["symbol"].lower() for d in self.docs]:
+            if len(word) >= FUZZY_MIN_LENGTH - 1:
+                for key in _deletions(word) | {word}:
+                    self.variants.setdefault(key, set()).add(word)
+        self.vocabulary = sorted(self.headings)
+        self._symbol_pos = {d["symbol"].lower(): i for i, d in enumerate(self.docs)}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _prefix_words(self, prefix):
+        """Name / industry / category words longer than `prefix` that start with it."""
+        words = []
+        for k in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            word = self.vocabulary[k]
+            if not word.startswith(prefix) or len(words) >= PREFIX_WORDS:
+                break
+            if word != prefix:
+                words.append(word)
+        return words
+
+    def _fuzzy_words(self, word):
+        """Vocabulary words one edit (insert, delete, substitute, swap) from `word`."""
+        found = set()
+        for key in _deletions(word) | {word}:
+            found |= self.variants.get(key, set())
+        found.discard(word)
+        return found
+
+    def _word_scores(self, word, prefix, fuzzy):
+        scores = {}
+
+        def add(doc, score):
+            if scores.get(doc, 0) < score:
+                scores[doc] = score
+
+        exact = self._symbol_pos.get(word)
+        if exact is not None:
+            add(exact, EXACT_SYMBOL)
+        if prefix:
+            for doc in self.symbols.get(word)[:PREFIX_LIMIT]:
+                add(doc, SYMBOL_PREFIX)
+            if len(word) >= PREFIX_MIN_LENGTH:
+                for other in self._prefix_words(word):
+                    for doc, weight in self.headings[other].items():
+                        add(doc, weight * TOKEN_WEIGHT * PREFIX_FACTOR)
+        for doc, weight in self.tokens.get(word, {}).items():
+            add(doc, weight * TOKEN_WEIGHT)
+        if fuzzy and len(word) >= FUZZY_MIN_LENGTH and not scores:
+            for other in self._fuzzy_words(word):
+                pos = self._symbol_pos.get(other)
+                if pos is not None:
+                    add(pos, EXACT_SYMBOL * FUZZY_FACTOR)
+                for doc, weight in self.tokens.get(other, {}).items():
+                    add(doc, weight * TOKEN_WEIGHT * FUZZY_FACTOR)
+        return scores
+
+    def search(self, query, limit=20, fuzzy=True):
+        """
+        [{symbol, name, category, industry, score}] for `query`, best first.
+        Every word has to match; the last one may be a prefix, and with
+        `fuzzy` a word with no match also tries one-edit variants.
+        """
+        words = TOKEN.findall((query or "").lower())
+        if not words:
+            return []
+        scores = None
+        for n, word in enumerate(words):
+            found = self._word_scores(word, prefix=n == len(words) - 1, fuzzy=fuzzy)
+            scores = found if scores is None else {d: s + found[d] for d, s in scores.items() if d in found}
+            if not scores:
+                return []
+        # A name that starts with the whole query beats word-by-word matches
+        for doc in self.names.get(" ".join(words))[:PREFIX_LIMIT]:
+            if doc in scores:
+                scores[doc] += NAME_PREFIX
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [{
+            "symbol": self.docs[i]["symbol"],
+            "name": self.docs[i].get("name"),
+            "category": self.docs[i].get("category"),
+            "industry": self.docs[i].get("industry"),
+            "score": round(score, 2),
+        } for i, score in best]
+
+
+def build_search_index(watchlist, records):
+    """
+    One document per symbol from the watchlist ({category: [stock]}) and the
+    cached records (Symbol -> record), which add the description and market cap.
+    """
+    docs = {}
+    for stocks in watchlist.values():
+        for stock in stocks:
+            symbol = stock.get("symbol")
+            if symbol and symbol not in docs:
+                docs[symbol] = {"symbol": symbol, "name": stock.get("Name"),
+                                "category": stock.get("category"), "industry": stock.get("industry")}
+    for symbol, record in records.items():
+        doc = docs.setdefault(symbol, {"symbol": symbol})
+        doc["name"] = doc.get("name") or record.get("Name")
+        doc["category"] = doc.get("category") or record.get("category")
+        doc["industry"] = doc.get("industry") or record.get("industry")
+        doc["description"] = record.get("stock_description")
+        cap = record.get("Market Cap")
+        doc["marketCap"] = cap if isinstance(cap, (int, float)) and not isinstance(cap, bool) else None
+    return SearchIndex(docs.values())
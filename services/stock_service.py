@@ -1,21 +1,130 @@
 import yfinance as yf
 import json
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from zoneinfo import ZoneInfo
 from models.stock_cache import StockCache
+from models.history_store import HistoryStore
+from models.bar_store import BarStore, calendar_days
 import pandas as pd
-from services.volatility_service import get_vol_signal_fields
-
-# Custom exception to signal yfinance/API rate limit errors
-class RateLimitError(Exception):
-    """Raised when yfinance (or the upstream API) returns a 429 / rate limit error."""
-    pass
+from services.indicator_pipeline import BarPanel, compute_fields, plan_lookback, quote_snapshot
+from services.exposure_service import HoldingsMatrix, UNCLASSIFIED, DEFAULT_TOP_SYMBOLS
+from services.heatmap_service import build_heatmap
+from services.risk_service import RiskModel
+from services.search_service import build_search_index
+from services.alert_engine import AlertEngine
+from services import watchlists
+from services.watchlists import SHARED_STOCKS_KEY, WATCHLIST_FIELDS
+from services.rate_limiter import limiter, RateLimitError, is_rate_limit_error
+from utils.metrics import metrics
+from config import (
+    REFRESH_RETRY_ROUNDS, REFRESH_RETRY_BATCH_SIZE, REFRESH_RETRY_BACKOFF, ETF_HOLDINGS_TTL,
+    CACHE_DIR, HISTORY_DIR, HISTORY_FIELDS, HISTORY_INTRADAY_DAYS,
+    INDICATOR_TOLERANCE, BAR_STORE_DIR, BAR_STORE_ENABLED, BAR_REVISION_TOLERANCE,
+    RISK_WINDOW, RISK_MIN_OBSERVATIONS, RISK_BENCHMARKS, ALERT_RULES_FILE, ALERT_STATE_FILE,
+    WATCHLIST_FILE,
+)
 
 # Initialize cache
 cache = StockCache()
 
+# Every committed refresh is appended to the history archive
+history = HistoryStore(os.path.join(CACHE_DIR, HISTORY_DIR), HISTORY_FIELDS, intraday_days=HISTORY_INTRADAY_DAYS)
+cache.add_commit_listener(history.append_commit)
+
+# Sector / industry rollups for the heatmap, rebuilt with every committed refresh
+HEATMAP_KEY = "heatmap_aggregates"
+
+def _heatmap_stage(committing):
+    with metrics.stage("heatmap"):
+        return {HEATMAP_KEY: build_heatmap(committing.symbol_index().values())}
+
+cache.add_commit_stage(_heatmap_stage)
+
+# Bars per interval the registered indicators need, and the local copy of them
+LOOKBACK = plan_lookback(INDICATOR_TOLERANCE)
+bar_store = BarStore(os.path.join(CACHE_DIR, BAR_STORE_DIR))
+
+# Correlation / beta / volatility of every cached symbol, rebuilt with every
+# committed refresh from the daily closes downloaded during the refresh
+RISK_KEY = "risk_matrix"
+
+# Symbol -> its last RISK_WINDOW + 1 daily closes, from its latest download
+_daily_closes = {}
+_daily_closes_lock = threading.Lock()
+
+def _record_daily_closes(panel, symbols):
+    if panel.index is None or not panel.length:
+        return
+    keep = RISK_WINDOW + 1
+    frame = pd.DataFrame(panel.close[-keep:], index=panel.index[-keep:], columns=symbols)
+    with _daily_closes_lock:
+        for symbol in frame.columns[frame.notna().any()]:
+            _daily_closes[symbol] = frame[symbol]
+
+def _risk_closes(symbols):
+    """(bars x symbols) daily closes: each symbol's latest download, else the bar store."""
+    with _daily_closes_lock:
+        series = {s: _daily_closes[s] for s in symbols if s in _daily_closes}
+    missing = [s for s in symbols if s not in series]
+    if missing and BAR_STORE_ENABLED:
+        # Symbols this process has not downloaded since it started
+        with bar_store.lock:
+            table = bar_store.table("1d")
+            stored = None if table.empty else table.xs("Close", axis=1, level=1).reindex(columns=missing)
+        if stored is not None:
+            series.update({s: stored[s] for s in stored.columns})
+    if not series:
+        return pd.DataFrame()
+    return pd.DataFrame(series).sort_index()
+
+def _owned_weights():
+    return {s["symbol"]: 1.0 for s in watchlist_data.get("Owned", []) if s.get("symbol")}
+
+def _risk_stage(committing):
+    symbols = sorted(committing.symbol_index())
+    closes = _risk_closes(symbols)
+    if closes.empty:
+        return {}
+    closes = closes.loc[:, closes.notna().any()]
+    closes = closes[closes.notna().any(axis=1)]
+    present = list(closes.columns)
+    benchmark = next((s for s in RISK_BENCHMARKS if s in present), None)
+    with metrics.stage("risk"):
+        model = RiskModel.from_closes(present, closes.to_numpy(), RISK_WINDOW, benchmark=benchmark,
+                                      min_observations=RISK_MIN_OBSERVATIONS)
+        return {RISK_KEY: {**model.to_dict(), "owned": model.portfolio(_owned_weights())}}
+
+cache.add_commit_stage(_risk_stage)
+
+def _load_alert_engine():
+    """The alert engine for ALERT_RULES_FILE, primed with the cached values; None without rules."""
+    if not os.path.exists(ALERT_RULES_FILE):
+        return None
+    try:
+        engine = AlertEngine.from_file(ALERT_RULES_FILE, state_file=os.path.join(CACHE_DIR, ALERT_STATE_FILE))
+    except Exception as e:
+        logging.error(f"Error loading alert rules {ALERT_RULES_FILE}: {e}")
+        return None
+    engine.prime(cache)
+    cache.add_commit_listener(engine.on_commit)
+    return engine
+
+alerts = _load_alert_engine()
+
+def set_market_data_provider(provider):
+    """
+    Swap the module used for upstream market data. Defaults to yfinance; the
+    provider must expose the same download/Ticker/Tickers surface.
+    """
+    global yf
+    yf = provider
+
 def _first(*vals):
     for v in vals:
         if v is not None:
@@ -63,7 +172,7 @@ def _load_info_safe(t):
                 pass
         # fall back to full info for ETF fields
         try:
-            base = t.info or {}
+            base = limiter.call("info", lambda: t.info) or {}
             if isinstance(base, dict):
                 info.update(base)
         except Exception:
@@ -103,8 +212,10 @@ def fetch_etf_top_holdings(symbol: str):
         t = yf.Ticker(symbol)
 
         # Newer API: funds_data.top_holdings (DataFrame)
-        fd = getattr(t, "funds_data", None)
-        th = getattr(fd, "top_holdings", None) if fd is not None else None
+        def _top_holdings():
+            fd = getattr(t, "funds_data", None)
+            return getattr(fd, "top_holdings", None) if fd is not None else None
+        th = limiter.call("funds_data", _top_holdings)
         if th is not None and hasattr(th, "iterrows"):
             out = []
             for idx, row in th.iterrows():
@@ -144,10 +255,10 @@ def _clean_value(value):
         return None
     return value
 
-def load_watchlist_data():
+def load_watchlist_data(path=WATCHLIST_FILE):
     """Load watchlist data from JSON file and create the 'Owned' category"""
     try:
-        with open('list_watchlist.json', 'r') as file:
+        with open(path, 'r') as file:
             data = json.load(file)
             categories = data.get("Categories", {})
 
@@ -182,74 +293,335 @@ def load_watchlist_data():
         logging.error(f"Error loading watchlist data: {e}")
         return {}
 
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
 # Global watchlist data, including the dynamically created "Owned" category
 watchlist_data = load_watchlist_data()
+_watchlist_mtime = _mtime(WATCHLIST_FILE)
+
+def reload_watchlist_if_changed():
+    """Reload watchlist_data when the file changed since (e.g. a flag set by another server process)."""
+    global watchlist_data, _watchlist_mtime
+    mtime = _mtime(WATCHLIST_FILE)
+    if mtime != _watchlist_mtime:
+        watchlist_data = load_watchlist_data()
+        _watchlist_mtime = mtime
+
+# Other named watchlists, loaded on use: name -> (file mtime, categories)
+_named_watchlists = {}
+
+def get_watchlist(name=None):
+    """
+    Categories of watchlist `name` ({category: [stock]}, with Owned); the
+    default one without a name. KeyError for a watchlist that does not exist.
+    """
+    if watchlists.is_default(name):
+        return watchlist_data
+    path = watchlists.watchlist_path(name)
+    if not os.path.exists(path):
+        raise KeyError(name)
+    mtime = os.path.getmtime(path)
+    loaded = _named_watchlists.get(name)
+    if loaded is None or loaded[0] != mtime:
+        loaded = _named_watchlists[name] = (mtime, load_watchlist_data(path))
+    return loaded[1]
 
 def _is_etf_category(c: str) -> bool:
     return (c or "").strip().lower() in ("etf", "etfs")
 
+def category_cache_key(category):
+    """Cache key of a default-watchlist category's record list."""
+    if _is_etf_category(category):
+        return "etfs:saved_stock_info:v2"
+    return f"stocks:saved_stock_info:{category.strip()}"
+
+ETF_HOLDINGS_INDEX_KEY = "etf_holdings_index"
+EXPOSURE_MATRIX_KEY = "etf_exposure_matrix"
+
 def _etf_holdings_cache_key(sym):
     return f"etf_holdings::{sym.upper()}"
 
-def _add_holdings_to_etfs(items):
-    for item in items:
-        sym = item.get("Symbol") or item.get("symbol")
-        if not sym:
-            item["holdings"] = []
-            continue
+def fetch_etf_holdings_batch(symbols, max_age=ETF_HOLDINGS_TTL):
+    """
+    Holdings for many ETFs: cached entries younger than max_age are reused, the
+    rest are fetched concurrently under the shared limiter and stored in one
+    cache write. Returns {symbol: [ {symbol,name,weight} ]}.
+    """
+    now = time.time()
+    result, expired = {}, []
+    for sym in symbols:
+        entry = cache.get(_etf_holdings_cache_key(sym))
+        # Entries written before the TTL existed are bare lists; treat them as expired
+        if isinstance(entry, dict) and now - entry.get('fetchedAt', 0) < max_age:
+            result[sym] = entry.get('holdings') or []
+        else:
+            expired.append(sym)
+
+    if expired:
+        with ThreadPoolExecutor(max_workers=int(limiter.max_concurrency)) as pool:
+            fetched = dict(zip(expired, pool.map(fetch_etf_top_holdings, expired)))
+        updates = {}
+        for sym, holdings in fetched.items():
+            if holdings:
+                updates[_etf_holdings_cache_key(sym)] = {'holdings': holdings, 'fetchedAt': now}
+                result[sym] = holdings
+            else:
+                # Fetch failed or came back empty: keep serving the old holdings, retry next time
+                previous = cache.get(_etf_holdings_cache_key(sym))
+                result[sym] = (previous.get('holdings') if isinstance(previous, dict) else previous) or []
+        if updates:
+            cache.set_many(updates)
+    return result
+
+def build_holdings_index(etf_items):
+    """
+    Reverse holdings index: constituent symbol -> [ {etf, weight} ], heaviest first.
+    """
+    index = {}
+    for item in etf_items:
+        etf = item.get("Symbol") or item.get("symbol")
+        for h in item.get("holdings") or []:
+            constituent = (h.get("symbol") or "").upper()
+            if not etf or not constituent:
+                continue
+            index.setdefault(constituent, []).append({"etf": etf, "weight": h.get("weight")})
+    for entries in index.values():
+        entries.sort(key=lambda e: e["weight"] if e["weight"] is not None else -1, reverse=True)
+    return index
+
+def get_etf_exposure(symbol):
+    """Which watchlist ETFs hold `symbol`, and at what weight (an index lookup)."""
+    index = cache.get(ETF_HOLDINGS_INDEX_KEY) or {}
+    return index.get((symbol or "").upper(), [])
+
+def get_heatmap():
+    """The rollups stored by the last commit; built on the fly for an older cache."""
+    heatmap = cache.get(HEATMAP_KEY)
+    if heatmap is None:
+        heatmap = build_heatmap(cache.symbol_index().values())
+    return heatmap
+
+def get_history(symbols, fields=None, start=None, end=None):
+    """Archived field values per symbol between two dates, from the history store."""
+    with metrics.stage("history_read"):
+        return history.read([s.upper() for s in symbols], fields, start, end)
+
+_risk_model = None
+
+def get_risk_model():
+    """The cached risk model, decoded once per commit."""
+    global _risk_model
+    stored = cache.get(RISK_KEY)
+    if not stored:
+        return None
+    if _risk_model is None or _risk_model.built_at != stored.get("builtAt"):
+        _risk_model = RiskModel.from_dict(stored)
+    return _risk_model
+
+def get_risk(symbols=None, weights=None):
+    """
+    Correlations, volatility and beta of `symbols` (default: Owned) and the
+    volatility of a portfolio: explicit {symbol: weight}, else equal weights
+    over `symbols`, else the Owned portfolio stored at commit.
+    """
+    model = get_risk_model()
+    if model is None:
+        return None
+    owned = _owned_weights()
+    if weights:
+        positions = {s.upper(): float(w) for s, w in weights.items()}
+    elif symbols:
+        positions = {s.upper(): 1.0 for s in symbols}
+    else:
+        positions = owned
+    portfolio = cache.get(RISK_KEY).get("owned") if positions == owned else model.portfolio(positions)
+    return {
+        "builtAt": model.built_at,
+        "window": model.window,
+        "benchmark": model.benchmark,
+        **model.subset(list(positions)),
+        "portfolio": portfolio,
+    }
 
-        key = _etf_holdings_cache_key(sym)
-        holdings = cache.get(key)
-        if holdings is None:
-            holdings = fetch_etf_top_holdings(sym)
-            cache.set(key, holdings)  # 24h TTL
-        item["holdings"] = holdings
+_search_index = None
+_search_key = None
+
+def get_search_index():
+    """The search index, rebuilt when the cache version or the watchlist changed."""
+    global _search_index, _search_key
+    snapshot = cache.snapshot
+    key = (snapshot.version, snapshot.last_updated, id(watchlist_data))
+    if _search_index is None or _search_key != key:
+        with metrics.stage("search_index"):
+            _search_index = build_search_index(watchlist_data, snapshot.symbol_index())
+        _search_key = key
+    return _search_index
+
+def search_symbols(query, limit=20, fuzzy=True):
+    """Ranked symbol / name / description matches for `query`."""
+    return get_search_index().search(query, limit=limit, fuzzy=fuzzy)
+
+def get_recent_alerts(limit=50):
+    """Recently fired alerts, newest first (see AlertEngine.recent_alerts)."""
+    return alerts.recent_alerts(limit) if alerts else []
+
+def _watchlist_classifier():
+    """symbol -> (sector, industry) from the watchlist; Unclassified otherwise."""
+    labels = {}
+    for stocks in watchlist_data.values():
+        for stock in stocks:
+            labels.setdefault(stock.get("symbol"), (stock.get("category") or UNCLASSIFIED,
+                                                    stock.get("industry") or UNCLASSIFIED))
+    return lambda symbol: labels.get(symbol, (UNCLASSIFIED, UNCLASSIFIED))
+
+_exposure_matrix = None
+
+def get_exposure_matrix():
+    """The cached ETF x constituent matrix, decoded once per holdings refresh."""
+    global _exposure_matrix
+    stored = cache.get(EXPOSURE_MATRIX_KEY)
+    if not stored:
+        return None
+    if _exposure_matrix is None or _exposure_matrix.built_at != stored.get("builtAt"):
+        _exposure_matrix = HoldingsMatrix.from_dict(stored)
+    return _exposure_matrix
+
+def get_lookthrough_exposure(symbols=None, weights=None, top=DEFAULT_TOP_SYMBOLS):
+    """
+    Look-through exposure for a set of positions: explicit {symbol: weight},
+    else equal weights over `symbols`, else equal weights over Owned.
+    """
+    if weights:
+        positions = {s.upper(): float(w) for s, w in weights.items()}
+    else:
+        symbols = symbols or [s["symbol"] for s in watchlist_data.get("Owned", [])]
+        positions = {s.upper(): 1.0 for s in symbols}
+    matrix = get_exposure_matrix() or HoldingsMatrix([], [], [], [], [])
+    return matrix.exposure(positions, _watchlist_classifier(), top=top)
+
+def _cached_etf_records():
+    """ETF records with holdings in the cache (this refresh's, where it has them), by symbol."""
+    records = {}
+    for key in (category_cache_key("ETFs"), SHARED_STOCKS_KEY):
+        value = cache.temp_data.get(key) if cache.is_refreshing and key in cache.temp_data else cache.data.get(key)
+        for record in value or []:
+            if isinstance(record, dict) and record.get("Symbol") and "holdings" in record:
+                records.setdefault(record["Symbol"], record)
+    return records
+
+def _add_holdings_to_etfs(items, partial=False):
+    """
+    Attach top holdings to each ETF item, then rebuild the reverse holdings
+    index and the look-through exposure matrix. `partial` items are only
+    some of the ETFs: the other cached ETFs stay in the index and matrix.
+    """
+    symbols = [item.get("Symbol") or item.get("symbol") for item in items]
+    holdings = fetch_etf_holdings_batch([sym for sym in symbols if sym])
+    for item, sym in zip(items, symbols):
+        item["holdings"] = holdings.get(sym, []) if sym else []
+    indexed = items
+    if partial:
+        indexed = list({**_cached_etf_records(), **{sym: item for sym, item in zip(symbols, items) if sym}}.values())
+    matrix = HoldingsMatrix.from_etf_items(indexed, _watchlist_classifier(), built_at=time.time())
+    cache.set_many({
+        ETF_HOLDINGS_INDEX_KEY: build_holdings_index(indexed),
+        EXPOSURE_MATRIX_KEY: matrix.to_dict(),
+    })
     return items
 
-def fetch_category_data(category, refresh=False):
-    """Fetch data for a specific category from the watchlist using batch requests."""
-    category_data = load_watchlist_data().get(category, [])
+# Record fields that come from Ticker.info rather than the price history
+_INFO_FIELDS = (
+    'Name', 'Market Cap', 'Trailing PE', 'Forward PE', 'dividendYield', 'totalRevenue',
+    'netIncomeToCommon', 'profitMargins', 'EV/EBITDA', 'stock_description', 'fiftyTwoWeekHigh',
+    'fiftyTwoWeekLow', 'earningsDate', 'beta', 'earningsTiming', 'exchangeName', 'fund_stats',
+)
+
+def _with_watchlist_context(record, stock_info, category):
+    """Overlay the watchlist-owned fields (flag, category, ...) onto a record."""
+    return {
+        **record,
+        'flag': stock_info.get("flag", False),
+        'category': stock_info.get('category', category),
+        'industry': stock_info.get('industry', None),
+        'stockUrl': stock_info.get("stockUrl", None),
+    }
+
+def _stale_fallback(record, now):
+    """Mark a last-good record as stale, with its age in seconds."""
+    fetched_at = record.get('fetchedAt')
+    return {
+        **record,
+        'isStale': True,
+        'staleAgeSeconds': round(now - fetched_at) if fetched_at else None,
+    }
+
+def fetch_category_data(category, refresh=False, tracker=None, stocks=None):
+    """
+    Fetch data for a specific category from the watchlist using batch requests.
+    `stocks` fetches that list of watchlist entries instead (e.g. from another
+    watchlist), labelled with `category`.
+
+    Symbols whose market data cannot be fetched fall back to their last good
+    cached record, marked stale. With a RefreshTracker, symbols that already
+    succeeded in this run are reused instead of refetched, and failed ones go
+    through the retry queue first.
+    """
+    category_data = stocks if stocks is not None else load_watchlist_data().get(category, [])
     if not category_data:
         return []
 
     symbols = [stock_info["symbol"] for stock_info in category_data]
     if not symbols:
         return []
-    
-    # Batch fetch detailed info (prices, RSI)
-    detailed_data = fetch_detailed_info(symbols)
+
+    reused = {s: tracker.get(s) for s in symbols if tracker and tracker.succeeded(s)}
+    pending = [s for s in symbols if s not in reused]
+
+    # Batch fetch detailed info (prices, RSI); interactive refreshes skip the retry rounds
+    detailed_data, _ = fetch_detailed_info_with_retry(
+        pending, tracker, rounds=REFRESH_RETRY_ROUNDS if tracker is not None else 0)
 
     # Batch fetch company info
-    try:
-        tickers = yf.Tickers(' '.join(symbols))
-    except Exception as e:
-        # Detect rate limit from yfinance/requests and raise a specific error so caller can respond
-        msg = str(e)
-        if '429' in msg or 'Too Many Requests' in msg or 'rate limit' in msg.lower():
-            raise RateLimitError(msg)
-        logging.error(f"Error creating yf.Tickers for symbols {symbols}: {e}")
-        tickers = None
+    tickers = None
+    if pending:
+        try:
+            tickers = yf.Tickers(' '.join(pending))
+        except Exception as e:
+            logging.error(f"Error creating yf.Tickers for symbols {pending}: {e}")
+
+    # .info is one HTTP call per symbol; fan out and let the shared limiter pace them
+    infos = _fetch_infos(tickers, pending)
+
+    # Last committed record per symbol, used when this run could not fetch it
+    last_good = cache.symbol_index()
+    now = time.time()
 
     result_data = []
 
     for stock_info in category_data:
         symbol = stock_info["symbol"]
 
-        # Get market data first, which should be reliable
-        market_data = detailed_data.get(symbol, {})
+        if symbol in reused:
+            result_data.append(_with_watchlist_context(reused[symbol], stock_info, category))
+            continue
 
-        try:
-            # Then, try to get the company info, which can sometimes fail
-            ticker_obj = tickers.tickers.get(symbol)
-            info = ticker_obj.info if ticker_obj else {}
-        except Exception as e:
-            # If this error is a rate-limit, propagate a RateLimitError so the handler returns 429
-            msg = str(e)
-            if '429' in msg or 'Too Many Requests' in msg or 'rate limit' in msg.lower():
-                raise RateLimitError(msg)
-            logging.warning(f"Could not fetch .info for {symbol}: {e}. Using fallback.")
-            info = {} # Use an empty dict if info fails, but we still have market_data
-            ticker_obj = None
+        # Get market data first, which should be reliable
+        market_data = detailed_data.get(symbol)
+        ticker_obj, info = infos.get(symbol, (None, {}))
+        previous = last_good.get(symbol)
+
+        if market_data is None and previous:
+            age = now - previous['fetchedAt'] if previous.get('fetchedAt') else None
+            logging.warning(f"Serving last good record for {symbol}" + (f" ({age / 3600:.1f}h old)" if age else ""))
+            if tracker:
+                tracker.record_stale(symbol, age)
+            result_data.append(_with_watchlist_context(_stale_fallback(previous, now), stock_info, category))
+            continue
+        market_data = market_data or {}
 
         # Get earnings timestamp
         earnings_timestamp = info.get('earningsTimestamp')
@@ -292,6 +664,7 @@ def fetch_category_data(category, refresh=False):
             'earningsTiming': earningsTiming,
             'stockUrl': stock_info.get("stockUrl", None),
             'exchangeName': info.get('exchange'),
+            'fetchedAt': now,
             # Unpack the detailed data dictionary
             **market_data 
         }
@@ -302,9 +675,19 @@ def fetch_category_data(category, refresh=False):
             final_stock["fund_stats"] = get_etf_fund_stats(ticker_obj)
             final_stock["stock_description"] = info.get('longBusinessSummary')
 
+        if not info and previous:
+            # Fresh prices, but company info failed: keep the last good info fields
+            for field in _INFO_FIELDS:
+                if field in previous:
+                    final_stock[field] = previous[field]
+            final_stock['staleFields'] = ['info']
+        elif market_data and tracker:
+            tracker.record_success(symbol, final_stock)
+
     # If the category is ETFs, enrich the data with holdings information.
     if _is_etf_category(category):
-        result_data = _add_holdings_to_etfs(result_data)
+        with metrics.stage("etf_holdings"):
+            result_data = _add_holdings_to_etfs(result_data, partial=stocks is not None)
 
     # Sort based on category type
     if category == "Owned":
@@ -316,151 +699,300 @@ def fetch_category_data(category, refresh=False):
 
     return result_data
 
+def _sort_category(records, category):
+    if category == "Owned":
+        _sort_by_symbol(records)
+    else:
+        _sort_by_market_cap(records)
+    return records
+
+def get_watchlist_category(name, category):
+    """
+    A category of watchlist `name` from the shared per-symbol records, with
+    the watchlist's flag / category / industry; symbols without a cached record
+    yet are left out.
+    """
+    index = cache.symbol_index()
+    records = [_with_watchlist_context(index[stock["symbol"]], stock, category)
+               for stock in get_watchlist(name).get(category, []) if stock.get("symbol") in index]
+    return _sort_category(records, category)
+
+def merge_records(records, key=SHARED_STOCKS_KEY):
+    """
+    The cache lists that change when freshly fetched records are put into the
+    shared layer, as {key: new list}: every cached list that holds the symbol
+    gets the new record (keeping that list's watchlist fields), and symbols no
+    list holds are appended to `key`. Lists are copied, never edited in place.
+    """
+    fresh = {r["Symbol"]: r for r in records if r.get("Symbol")}
+    data = cache.data
+    placed = set()
+    updates = {}
+    for k, value in data.items():
+        if k == SHARED_STOCKS_KEY or not isinstance(value, list):
+            continue
+        changed = None
+        for i, item in enumerate(value):
+            symbol = item.get("Symbol") if isinstance(item, dict) else None
+            if symbol in fresh:
+                changed = changed or list(value)
+                changed[i] = {**fresh[symbol], **{f: item.get(f) for f in WATCHLIST_FIELDS}}
+                placed.add(symbol)
+        if changed is not None:
+            updates[k] = changed
+    new = [r for s, r in fresh.items() if s not in placed]
+    if key == SHARED_STOCKS_KEY:
+        shared = [r for r in data.get(SHARED_STOCKS_KEY) or [] if r.get("Symbol") not in fresh]
+        updates[key] = shared + new
+    elif new:
+        updates[key] = updates.get(key, list(data.get(key) or [])) + new
+    return updates
+
+def store_shared_records(records):
+    """Put freshly fetched records into the shared layer (see merge_records) with one save."""
+    with cache.lock:
+        cache.set_many(merge_records(records))
+
+def refresh_watchlist_category(name, category):
+    """Fetch a category of watchlist `name` into the shared records and return its view."""
+    stocks = get_watchlist(name).get(category, [])
+    store_shared_records(fetch_category_data(category, refresh=True, stocks=stocks))
+    return get_watchlist_category(name, category)
+
+def unshared_watchlist_stocks(default=None):
+    """{category: [stock]} of the symbols only non-default watchlists hold."""
+    others = []
+    for name in watchlists.list_watchlists():
+        if not watchlists.is_default(name):
+            try:
+                others.append(get_watchlist(name))
+            except KeyError:
+                continue
+    return watchlists.unshared_stocks(default if default is not None else load_watchlist_data(), others)
+
+def fetch_unshared_stocks(tracker=None):
+    """
+    Records of the symbols only non-default watchlists hold, fetched once each
+    (per category, so ETFs get their fund data), for SHARED_STOCKS_KEY.
+    """
+    records = []
+    for category, stocks in unshared_watchlist_stocks().items():
+        records.extend(fetch_category_data(category, tracker=tracker, stocks=stocks))
+    return records
+
+def _fetch_info(ticker_obj, symbol):
+    """Return (ticker_obj, info); falls back to ({}) if .info fails even after retries."""
+    if ticker_obj is None:
+        return None, {}
+    try:
+        with metrics.stage("info_fetch"):
+            return ticker_obj, limiter.call("info", lambda: ticker_obj.info) or {}
+    except Exception as e:
+        logging.warning(f"Could not fetch .info for {symbol}: {e}. Using fallback.")
+        return None, {} # Use an empty dict if info fails, but we still have market_data
+
+def _fetch_infos(tickers, symbols):
+    """Fetch .info for every symbol concurrently; concurrency is governed by the limiter."""
+    if tickers is None:
+        return {}
+    ticker_objs = [tickers.tickers.get(symbol) for symbol in symbols]
+    with ThreadPoolExecutor(max_workers=int(limiter.max_concurrency)) as pool:
+        results = pool.map(_fetch_info, ticker_objs, symbols)
+        return dict(zip(symbols, results))
+
+def _download(symbols, **kwargs):
+    """
+    yf.download under the limiter. yfinance records per-ticker failures instead of
+    raising, so a rate-limited batch is turned into an exception here and retried.
+    """
+    def attempt():
+        frame = yf.download(symbols, **kwargs)
+        errors = getattr(getattr(yf, "shared", None), "_ERRORS", None) or {}
+        limited = [s for s in symbols if s in errors and is_rate_limit_error(errors[s])]
+        if limited:
+            raise RateLimitError(f"{len(limited)} of {len(symbols)} symbols rate limited: {errors[limited[0]]}")
+        return frame
+    return limiter.call(f"download_{kwargs.get('interval', '1d')}", attempt)
+
+def _download_bars(symbols, interval):
+    """
+    The last LOOKBACK[interval] bars of `symbols`, in yf.download(group_by='ticker')
+    layout. With the bar store only bars from each symbol's last stored bar on are
+    downloaded; symbols the download returned nothing for are left out, as they
+    would be from a plain download.
+    """
+    bars = LOOKBACK[interval]
+    if not BAR_STORE_ENABLED:
+        start = date.today() - timedelta(days=calendar_days(bars, interval))
+        return _download(symbols, start=start.isoformat(), interval=interval, progress=False, group_by='ticker')
+
+    # The store is locked around reads and merges only, so concurrent batches
+    # (streaming refresh) download in parallel
+    with bar_store.lock:
+        starts = bar_store.download_starts(interval, symbols, bars)
+    fresh = set()
+    revised = set()
+    for start, group in starts.items():
+        frame = _download(group, start=start.isoformat(), interval=interval, progress=False, group_by='ticker')
+        with bar_store.lock:
+            # History adjusted upstream (split, dividend): the stored bars are dropped
+            stale = bar_store.revised(interval, frame, BAR_REVISION_TOLERANCE)
+            bar_store.drop(interval, stale)
+            received = bar_store.merge(interval, frame)
+        if received:
+            metrics.inc("bars_downloaded_total", int(frame.xs('Close', axis=1, level=1).notna().sum().sum()),
+                        interval=interval)
+        fresh |= received
+        revised |= stale
+    if revised:
+        # ...and their whole lookback downloaded again
+        logging.info(f"{len(revised)} symbols have revised {interval} history, downloading it again: {sorted(revised)}")
+        metrics.inc("bars_revised_total", len(revised), interval=interval)
+        start = date.today() - timedelta(days=calendar_days(bars, interval))
+        frame = _download(sorted(revised), start=start.isoformat(), interval=interval, progress=False, group_by='ticker')
+        with bar_store.lock:
+            received = bar_store.merge(interval, frame)
+        if received:
+            metrics.inc("bars_downloaded_total", int(frame.xs('Close', axis=1, level=1).notna().sum().sum()),
+                        interval=interval)
+        fresh |= received
+    with bar_store.lock:
+        if bar_store.autosave:
+            bar_store.save(interval, keep_bars=2 * bars)
+        return bar_store.frame(interval, [s for s in symbols if s in fresh], bars)
+
+def release_bar_store():
+    """Save the in-memory bar tables and drop them (memory pressure, end of a streaming refresh)."""
+    with bar_store.lock:
+        for interval in bar_store.loaded():
+            bar_store.release(interval, keep_bars=2 * LOOKBACK.get(interval, 0) or None)
+
 def _get_category_stocks(category, refresh=False):
     """Helper to get stock list, reloading from file if refreshing."""
     current_watchlist = load_watchlist_data() if refresh else watchlist_data
     return current_watchlist.get(category, [])
 
-def fetch_detailed_info(symbols):
-    """Fetch detailed info including RSI and price changes for a list of symbols in a batch."""
+def fetch_detailed_info_with_retry(symbols, tracker=None, rounds=REFRESH_RETRY_ROUNDS):
+    """
+    fetch_detailed_info plus a retry queue: symbols that fail are retried in
+    small batches with exponential backoff. Returns (data, still_failed).
+    """
+    failures = {}
+    try:
+        detailed_data = fetch_detailed_info(symbols, failures)
+    except RateLimitError as e:
+        detailed_data = {}
+        failures.update({s: f"rate limited: {e}" for s in symbols})
+
+    queue = [s for s in symbols if s not in detailed_data]
+    for attempt in range(rounds):
+        if not queue:
+            break
+        delay = REFRESH_RETRY_BACKOFF * (2 ** attempt)
+        logging.info(f"Retrying {len(queue)} symbols in {delay:.1f}s (round {attempt + 1}/{rounds})")
+        time.sleep(delay)
+        metrics.inc("upstream_retries_total", amount=len(queue), kind="symbol")
+
+        retry_queue, queue = queue, []
+        for i in range(0, len(retry_queue), REFRESH_RETRY_BATCH_SIZE):
+            batch = retry_queue[i:i + REFRESH_RETRY_BATCH_SIZE]
+            try:
+                fetched = fetch_detailed_info(batch, failures)
+            except RateLimitError as e:
+                fetched = {}
+                failures.update({s: f"rate limited: {e}" for s in batch})
+            detailed_data.update(fetched)
+            queue.extend(s for s in batch if s not in fetched)
+
+    if tracker:
+        for symbol in queue:
+            tracker.record_failure(symbol, failures.get(symbol, 'unknown'))
+    return detailed_data, queue
+
+def fetch_detailed_info(symbols, failures=None):
+    """
+    Fetch detailed info including RSI and price changes for a list of symbols in a batch.
+    Symbols that yield no data are left out; if `failures` is given it is filled
+    with symbol -> reason for each of them.
+    """
     if not symbols:
         return {}
+    if failures is None:
+        failures = {}
 
     detailed_data = {}
     try:
-        # Batch download 1 year of daily data for standard calculations (RSI-14, ATR)
-        hist_data_daily = yf.download(symbols, period="1y", interval="1d", progress=False, group_by='ticker')
-
-        # Batch download 3 months of hourly data for the RSI(3) calculation
-        hist_data_hourly = yf.download(symbols, period="3mo", interval="1h", progress=False, group_by='ticker')
-
-        for symbol in symbols:
+        # Batch download the daily bars (price changes, RSI-14, ATR, ...) and the
+        # hourly bars (RSI1H) the indicator registry needs
+        with metrics.stage("daily_download"):
+            hist_data_daily = _download_bars(symbols, "1d")
+        with metrics.stage("hourly_download"):
+            hist_data_hourly = _download_bars(symbols, "1h")
+
+        # One (bars x symbols) daily panel serves the quote snapshot and the daily indicators
+        daily = BarPanel.from_download(hist_data_daily, symbols, ("Open", "High", "Low", "Close"))
+        quote = quote_snapshot(daily)
+        _record_daily_closes(daily, symbols)
+
+        # Every registered indicator for the whole batch, one pass per interval
+        with metrics.stage("indicators"):
+            indicator_fields = compute_fields({'1d': daily, '1h': hist_data_hourly}, symbols)
+
+        columns = {k: v.tolist() for k, v in quote.items()}
+        for i, symbol in enumerate(symbols):
             try:
-                # Access the DataFrames for the specific symbol
-                # yfinance returns a dict-like object when group_by='ticker'
-                symbol_hist_daily = hist_data_daily[symbol] if symbol in hist_data_daily else None
-                symbol_hist_hourly = hist_data_hourly[symbol] if symbol in hist_data_hourly else None
-                
-                # Check for valid data
-                if symbol_hist_daily is None or symbol_hist_daily.empty or symbol_hist_daily['Close'].isnull().all():
+                if columns['valid'][i] == 0:
                     logging.warning(f"No valid historical data for {symbol}, skipping detailed info.")
+                    failures[symbol] = "no historical data"
                     continue
-
-                # Find the last valid (non-NaN) Close price
-                valid_indices = symbol_hist_daily.index[symbol_hist_daily['Close'].notna()]
-                if len(valid_indices) < 2:
+                if columns['valid'][i] < 2:
                     logging.warning(f"Insufficient valid data for {symbol} (need at least 2 valid prices)")
-                    continue
-                
-                # Get the latest valid row
-                latest_idx = valid_indices[-1]
-                latest_data = symbol_hist_daily.loc[latest_idx]
-                
-                # Get the previous close (the row immediately before the latest, whether it has data or not)
-                # This ensures we compare consecutive trading days even if there are gaps
-                latest_position = symbol_hist_daily.index.get_loc(latest_idx)
-                if latest_position > 0:
-                    previous_idx = symbol_hist_daily.index[latest_position - 1]
-                    previous_close = symbol_hist_daily.loc[previous_idx, 'Close']
-                    # If the immediate previous row is NaN, skip back until we find a valid close
-                    rows_skipped = 0
-                    while pd.isna(previous_close) and latest_position > 1:
-                        rows_skipped += 1
-                        latest_position -= 1
-                        previous_idx = symbol_hist_daily.index[latest_position - 1]
-                        previous_close = symbol_hist_daily.loc[previous_idx, 'Close']
-                else:
-                    logging.warning(f"No previous data point for {symbol}")
+                    failures[symbol] = "insufficient valid prices"
                     continue
 
-                # Calculate price changes with validation
-                current_close = latest_data['Close']
-                
-                if pd.notna(current_close) and pd.notna(previous_close):
-                    price_change = float(current_close - previous_close)
-                    
-                    # If we skipped any rows (NaN values), it means there are missing trading days
-                    if rows_skipped > 0:
-                        percent_change = "yfinance Missing Data"
-                        logging.warning(f"{symbol} missing data - skipped {rows_skipped} rows between {previous_idx.strftime('%Y-%m-%d')} and {latest_idx.strftime('%Y-%m-%d')}")
-                    else:
-                        percent_change = float((price_change / previous_close * 100)) if previous_close != 0 else None
+                # The previous close is the last valid one before the latest; bars
+                # without a Close in between mean upstream skipped trading days
+                previous_close = columns['previous'][i]
+                gaps = columns['gaps'][i]
+                if gaps > 0:
+                    percent_change = "yfinance Missing Data"
+                    logging.warning(f"{symbol} missing data - skipped {gaps} rows between "
+                                    f"{daily.index[columns['prevPos'][i]].strftime('%Y-%m-%d')} and "
+                                    f"{daily.index[columns['lastPos'][i]].strftime('%Y-%m-%d')}")
                 else:
-                    price_change = None
-                    percent_change = None
-                
-                # Calculate volatility signals using the new service
-                signal_fields = get_vol_signal_fields(symbol_hist_daily, symbol_hist_hourly)
-                
-                # Check for missing data points (NaN values in Close column)
-                missing_data = symbol_hist_daily['Close'].isna().sum() > 0
+                    percent_change = columns['percent'][i] if previous_close != 0 else None
 
                 detailed_data[symbol] = {
-                    'Open': _clean_value(latest_data.get('Open')),
-                    'Close': _clean_value(current_close),
-                    'High': _clean_value(latest_data.get('High')),
-                    'Low': _clean_value(latest_data.get('Low')),
-                    'Price Change': _clean_value(price_change),
+                    'Open': _clean_value(columns['open'][i]),
+                    'Close': _clean_value(columns['last'][i]),
+                    'High': _clean_value(columns['high'][i]),
+                    'Low': _clean_value(columns['low'][i]),
+                    'Previous Close': _clean_value(previous_close),
+                    'Price Change': _clean_value(columns['change'][i]),
                     'Percent Change': _clean_value(percent_change),
-                    'ATR': signal_fields.get('atr'),
-                    'ATR_Percent': signal_fields.get('atr_percent'),
-                    'RSI1H': signal_fields.get('RSI1H'),
-                    'RSI': calculate_rsi(symbol_hist_daily),
-                    'RSI_has_missing_data': bool(missing_data),
-                    'yRSI': calculate_rsi(symbol_hist_daily.iloc[:-1]) # RSI of the day before
+                    # Trading days missing between the previous and the latest close;
+                    # Percent Change is "yfinance Missing Data" when this is non-zero
+                    'missingRows': gaps,
+                    'RSI_has_missing_data': columns['missing'][i],
+                    # RSI, yRSI, ATR, ATR_Percent, RSI1H, ... (services.indicator_pipeline)
+                    **indicator_fields[symbol],
                 }
             except Exception as e:
                 logging.error(f"Error processing symbol {symbol}: {e}", exc_info=True)
+                failures[symbol] = f"error: {e}"
                 continue
 
+    except RateLimitError:
+        # The limiter already backed off and retried; give up on this batch
+        raise
     except Exception as e:
-        # If yfinance or the upstream HTTP client responds with a rate-limit 429, bubble up a RateLimitError
-        msg = str(e)
-        if '429' in msg or 'Too Many Requests' in msg or 'rate limit' in msg.lower():
-            raise RateLimitError(msg)
         logging.error(f"Error in batch fetch_detailed_info for symbols {symbols}: {e}")
+        for symbol in symbols:
+            if symbol not in detailed_data:
+                failures.setdefault(symbol, f"batch error: {e}")
 
     return detailed_data
 
-def calculate_rsi(data, window=14):
-    """
-    Calculate the Relative Strength Index (RSI) to match TradingView's calculation.
-    TradingView's RSI uses a specific variant of EMA (Wilder's Smoothing) which
-    is seeded with a Simple Moving Average (SMA).
-    """
-    try:
-        # We need at least `window` periods of changes, which means `window + 1` data points.
-        if data.empty or len(data) < window + 1:
-            return 'N/A'
-
-        delta = data['Close'].diff(1)
-        
-        # Separate gains and losses, drop the first NaN value from diff()
-        gain = delta.where(delta > 0, 0.0).iloc[1:]
-        loss = -delta.where(delta < 0, 0.0).iloc[1:]
-
-        # Calculate initial average gain and loss using SMA for the first `window` periods.
-        avg_gain = gain.iloc[:window].mean()
-        avg_loss = loss.iloc[:window].mean()
-
-        # Apply Wilder's smoothing for the rest of the periods.
-        for i in range(window, len(gain)):
-            avg_gain = (avg_gain * (window - 1) + gain.iloc[i]) / window
-            avg_loss = (avg_loss * (window - 1) + loss.iloc[i]) / window
-        
-        if avg_loss == 0:
-            rsi = 100.0 if avg_gain > 0 else float('nan')
-        else:
-            rs = avg_gain / avg_loss
-            rsi = 100.0 - (100.0 / (1.0 + rs))
-
-        if math.isnan(rsi) or math.isinf(rsi):
-            return 'N/A'
-        return rsi
-    except Exception as e:
-        logging.error(f"Error in RSI calculation: {e}")
-        return 'N/A'
-
 def _sort_by_symbol(stock_list):
     """Sorts a list of stocks alphabetically by symbol."""
     stock_list.sort(key=lambda x: x.get('Symbol', '').strip().lower())
@@ -469,70 +1001,48 @@ def _sort_by_market_cap(stock_list):
     """Sorts a list of stocks by market cap in descending order."""
     stock_list.sort(key=lambda x: (float(x.get('Market Cap', 0)) if x.get('Market Cap') != 'N/A' else 0), reverse=True)
 
-def update_stock_flag(symbol, new_flag):
-    """Update the flag in list_watchlist.json and intelligently update the in-memory cache."""
+def update_stock_flag(symbol, new_flag, watchlist=None):
+    """
+    Update the flag in the watchlist file and intelligently update the in-memory cache.
+    Other watchlists only change their file: their views are assembled per request.
+    """
     try:
-        with open('list_watchlist.json', 'r') as f:
-            data = json.load(f)
-
-        original_category = None
-        stock_found = False
-        # Find the stock, get its original category, and update its flag
-        for category_name, industries in data.get('Categories', {}).items():
-            for industry_name, stocks in industries.items():
-                for stock in stocks:
-                    if stock.get('symbol') == symbol:
-                        original_category = category_name
-                        stock['flag'] = new_flag
-                        stock_found = True
-                        break
-                if stock_found: break
-            if stock_found: break
-        
-        if not stock_found:
-            logging.warning(f"Could not find symbol {symbol} to update flag in list_watchlist.json.")
+        path = watchlists.watchlist_path(watchlist)
+        original_category = watchlists.set_flag(path, symbol, new_flag)
+        if original_category is None:
+            logging.warning(f"Could not find symbol {symbol} to update flag in {path}.")
             return False
-
-        with open('list_watchlist.json', 'w') as f:
-            json.dump(data, f, indent=4)
+        if not watchlists.is_default(watchlist):
+            return True
 
         # --- Now, update the live cache without re-fetching from yfinance ---
-        source_cache_key = f"category_{original_category}"
-        owned_cache_key = "category_Owned"
-        stock_to_move = None
-
-        # Determine source and destination lists in the cache
-        source_list_key = owned_cache_key if not new_flag else source_cache_key
-        dest_list_key = owned_cache_key if new_flag else source_cache_key
-
-        source_list = cache.get(source_list_key)
-        if source_list:
-            for i, stock_data in enumerate(source_list):
-                if stock_data['Symbol'] == symbol:
-                    stock_to_move = source_list.pop(i)
-                    break
-        
-        if stock_to_move:
-            stock_to_move['flag'] = new_flag
-            dest_list = cache.get(dest_list_key)
-            if dest_list is None:
-                dest_list = []
-                cache.data[dest_list_key] = dest_list # Add new list to cache data directly
-            
-            dest_list.append(stock_to_move)
-
-            # Sort the destination list to place the new item correctly
-            if dest_list_key == owned_cache_key:
-                _sort_by_symbol(dest_list)
-            else:
-                _sort_by_market_cap(dest_list)
-
-            cache.save() # Save the modified cache to disk
+        # Cached lists and records belong to published snapshots, so the move
+        # builds new ones and publishes them as a single write
+        source_category = "Owned" if not new_flag else original_category
+        dest_category = "Owned" if new_flag else original_category
+        source_list_key = category_cache_key(source_category)
+        dest_list_key = category_cache_key(dest_category)
+
+        def move(snapshot):
+            source_list = snapshot.get(source_list_key) or []
+            stock_to_move = next((s for s in source_list if s.get('Symbol') == symbol), None)
+            if stock_to_move is None:
+                return {}
+            moved = {**stock_to_move, 'flag': new_flag}
+            if source_list_key == dest_list_key:
+                # ETF categories share one list: the record only changes its flag
+                return {dest_list_key: [moved if s is stock_to_move else s for s in source_list]}
+            dest_list = [s for s in snapshot.get(dest_list_key) or [] if s.get('Symbol') != symbol]
+            return {
+                source_list_key: [s for s in source_list if s is not stock_to_move],
+                dest_list_key: _sort_category(dest_list + [moved], dest_category),
+            }
+
+        if cache.update(move):
             logging.info(f"Moved {symbol} in cache and updated flag.")
 
         # Finally, reload the watchlist structure for consistency
-        global watchlist_data
-        watchlist_data = load_watchlist_data()
+        reload_watchlist_if_changed()
 
         return True
     except Exception as e:
@@ -542,43 +1052,38 @@ def update_stock_flag(symbol, new_flag):
 def fetch_earnings_data(month, year):
     """Fetch earnings calendar data from cached stock data"""
     try:
-        # Load cached stock data
-        with open('cache/stock_data.json', 'r') as f:
-            cached_data = json.load(f)
-
         earnings_data = {}
-        data = cached_data.get('data', {})
-        
-        for category_data in data.values():
-            for stock in category_data:
-                earnings_date = stock.get('earningsDate')
+
+        # Every cached symbol record, once (the cache also holds dict-valued entries)
+        for stock in cache.snapshot.symbol_index().values():
+            earnings_date = stock.get('earningsDate')
+            
+            if not earnings_date:
+                continue
                 
-                if not earnings_date:
-                    continue
-                    
-                try:
-                    date_obj = datetime.strptime(earnings_date, '%m-%d-%Y')
+            try:
+                date_obj = datetime.strptime(earnings_date, '%m-%d-%Y')
+                
+                if date_obj.month == month and date_obj.year == year:
+                    date_str = date_obj.strftime('%m-%d-%Y')
                     
-                    if date_obj.month == month and date_obj.year == year:
-                        date_str = date_obj.strftime('%m-%d-%Y')
+                    if date_str not in earnings_data:
+                        earnings_data[date_str] = []
                         
-                        if date_str not in earnings_data:
-                            earnings_data[date_str] = []
-                            
-                        earnings_data[date_str].append({
-                            'symbol': stock['Symbol'],
-                            'name': stock['Name'],
-                            'earningsTiming': stock.get('earningsTiming', 'TBA'),
-                            'stockUrl': stock.get('stockUrl', ''),
-                            'close': stock.get('Close'),
-                            'priceChange': stock.get('Price Change'),
-                            'percentChange': stock.get('Percent Change'),
-                            'rsi': stock.get('RSI')
-                        })
-                        
-                except (ValueError, TypeError) as e:
-                    logging.error(f"Error parsing date {earnings_date} for {stock.get('Symbol')}: {e}")
-                    continue
+                    earnings_data[date_str].append({
+                        'symbol': stock['Symbol'],
+                        'name': stock.get('Name'),
+                        'earningsTiming': stock.get('earningsTiming', 'TBA'),
+                        'stockUrl': stock.get('stockUrl', ''),
+                        'close': stock.get('Close'),
+                        'priceChange': stock.get('Price Change'),
+                        'percentChange': stock.get('Percent Change'),
+                        'rsi': stock.get('RSI')
+                    })
+                    
+            except (ValueError, TypeError) as e:
+                logging.error(f"Error parsing date {earnings_date} for {stock.get('Symbol')}: {e}")
+                continue
 
         return earnings_data
         
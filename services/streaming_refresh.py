@@ -0,0 +1,125 @@
+"""
+Chunked, streaming refresh for large universes (thousands of symbols).
+
+The plain refresh fetches one whole category per call, so its peak memory
+(bar panels, .info payloads, records) grows with the largest category. Here
+each category is cut into chunks of `chunk_size` symbols, handed out lazily to
+a small worker pool with at most `workers` chunks in flight, and each finished
+chunk is yielded straight back so the caller can write it to the cache and
+checkpoint it before the next one is fetched.
+
+Resident memory is checked after every chunk. Above `max_memory_mb` the
+`on_pressure` hook runs (the bar tables are flushed to disk and dropped),
+and if that is not enough the chunk size halves and only one chunk is kept
+in flight until memory drops back under the ceiling.
+"""
+import gc
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from utils.metrics import metrics
+
+
+def rss_mb():
+    """Resident memory of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on Linux, bytes on macOS
+        return peak / 2 ** 20 if peak > 2 ** 32 else peak / 2 ** 10
+
+
+class StreamJob:
+    """The stocks of one category (for one cache key) still to be fetched."""
+
+    def __init__(self, key, category, stocks, splittable=True):
+        self.key = key
+        self.category = category
+        self.stocks = list(stocks)
+        # ETF records are enriched from the whole category (holdings index), so they go in one piece
+        self.splittable = splittable
+        self.offset = 0
+
+    def take(self, size):
+        start = self.offset
+        self.offset = len(self.stocks) if not self.splittable else min(start + size, len(self.stocks))
+        return self.stocks[start:self.offset]
+
+    def done(self):
+        return self.offset >= len(self.stocks)
+
+
+class StreamingRefresh:
+    """
+    Runs `fetch(category, stocks)` over chunks of each job and yields
+    (job, stocks, records, error) per chunk as they finish.
+    """
+
+    def __init__(self, fetch, chunk_size, workers, max_memory_mb=None, min_chunk_size=10, on_pressure=None):
+        self.fetch = fetch
+        self.chunk_size = max(1, int(chunk_size))
+        self.workers = max(1, int(workers))
+        self.max_memory_mb = max_memory_mb
+        self.min_chunk_size = max(1, min(int(min_chunk_size), self.chunk_size))
+        self.on_pressure = on_pressure
+        self.in_flight = self.workers
+        self.chunks = 0
+        self.symbols = 0
+        self.pressure_events = 0
+        self.peak_memory_mb = rss_mb()
+
+    def _check_memory(self):
+        used = rss_mb()
+        self.peak_memory_mb = max(self.peak_memory_mb, used)
+        if not self.max_memory_mb or used <= self.max_memory_mb:
+            # Back under the ceiling: let the pool fill up again
+            self.in_flight = self.workers
+            return
+        self.pressure_events += 1
+        metrics.inc("stream_memory_pressure_total")
+        gc.collect()
+        if self.on_pressure:
+            self.on_pressure()
+        used = rss_mb()
+        if used > self.max_memory_mb:
+            self.chunk_size = max(self.min_chunk_size, self.chunk_size // 2)
+            self.in_flight = 1
+            logging.warning(f"Refresh at {used:.0f} MB (ceiling {self.max_memory_mb} MB): "
+                            f"chunks cut to {self.chunk_size} symbols, one at a time")
+
+    def run(self, jobs):
+        pending = [job for job in jobs if job.stocks]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                while pending and len(running) < self.in_flight:
+                    job = pending[0]
+                    stocks = job.take(self.chunk_size)
+                    if job.done():
+                        pending.pop(0)
+                    running[pool.submit(self.fetch, job.category, stocks)] = (job, stocks)
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, stocks = running.pop(future)
+                    error = future.exception()
+                    self.chunks += 1
+                    self.symbols += len(stocks)
+                    metrics.inc("stream_chunks_total")
+                    yield job, stocks, (None if error else future.result()), error
+                del finished
+                self._check_memory()
+
+    def summary(self):
+        return {
+            "chunks": self.chunks,
+            "symbols": self.symbols,
+            "chunkSize": self.chunk_size,
+            "workers": self.workers,
+            "peakMemoryMb": round(self.peak_memory_mb, 1),
+            "memoryPressureEvents": self.pressure_events,
+        }
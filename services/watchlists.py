@@ -0,0 +1,82 @@
+"""
+Named watchlists over one shared set of per-symbol records.
+
+The default watchlist is list_watchlist.json; others are WATCHLISTS_DIR/<name>.json
+in the same format, each with its own categories, industries and Owned flags.
+Market data is not per watchlist: every symbol has one cached record (the
+default watchlist's category lists, plus SHARED_STOCKS_KEY for symbols only
+other watchlists hold), fetched once per refresh however many watchlists list
+it. A watchlist category is assembled from those records with the
+watchlist's own fields (flag, category, industry, stockUrl) laid over them.
+"""
+import json
+import os
+import re
+
+from config import WATCHLIST_FILE, WATCHLISTS_DIR, DEFAULT_WATCHLIST
+
+# Records of symbols that only non-default watchlists hold
+SHARED_STOCKS_KEY = "stocks:saved_stock_info:_shared"
+# Record fields that belong to a watchlist rather than to the symbol
+WATCHLIST_FIELDS = ("flag", "category", "industry", "stockUrl")
+
+_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_default(name):
+    return not name or name == DEFAULT_WATCHLIST
+
+
+def watchlist_path(name):
+    """File of watchlist `name`; ValueError for a name that is not a plain identifier."""
+    if is_default(name):
+        return WATCHLIST_FILE
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid watchlist name: {name!r}")
+    return os.path.join(WATCHLISTS_DIR, f"{name}.json")
+
+
+def list_watchlists():
+    """The default watchlist's name followed by the others, sorted."""
+    names = []
+    if os.path.isdir(WATCHLISTS_DIR):
+        names = sorted(f[:-5] for f in os.listdir(WATCHLISTS_DIR)
+                       if f.endswith(".json") and _NAME.match(f[:-5]) and f[:-5] != DEFAULT_WATCHLIST)
+    return [DEFAULT_WATCHLIST] + names
+
+
+def set_flag(path, symbol, flag):
+    """Set a symbol's Owned flag in a watchlist file; returns its category, or None if absent."""
+    with open(path) as f:
+        data = json.load(f)
+    for category_name, industries in data.get("Categories", {}).items():
+        for stocks in industries.values():
+            for stock in stocks:
+                if stock.get("symbol") == symbol:
+                    stock["flag"] = flag
+                    with open(path, "w") as f:
+                        json.dump(data, f, indent=4)
+                    return category_name
+    return None
+
+
+def symbols_of(watchlist):
+    """Every symbol of a loaded watchlist ({category: [stock]})."""
+    return {stock["symbol"] for stocks in watchlist.values() for stock in stocks if stock.get("symbol")}
+
+
+def unshared_stocks(default, others):
+    """
+    Stocks of the other watchlists that the default one does not hold, one per
+    symbol, grouped by their category: {category: [stock]}.
+    """
+    held = symbols_of(default)
+    grouped = {}
+    for watchlist in others:
+        for stocks in watchlist.values():
+            for stock in stocks:
+                symbol = stock.get("symbol")
+                if symbol and symbol not in held:
+                    held.add(symbol)
+                    grouped.setdefault(stock.get("category") or "Other", []).append(stock)
+    return grouped
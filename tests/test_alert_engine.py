@@ -0,0 +1,159 @@
+from datetime import date
+
+from models.change_log import ChangeLog
+from services.alert_engine import AlertEngine, Rule, _ThresholdIndex
+
+
+class FakeCache:
+    """The parts of StockCache the engine reads: symbol index, version, change log."""
+
+    def __init__(self):
+        self.changes = ChangeLog(50)
+        self.index = {}
+        self.version = 0
+
+    def publish(self, **records):
+        index = {s: {'Symbol': s, **fields} for s, fields in records.items()}
+        self.changes.record(self.index, index, {}, {})
+        self.index = index
+        self.version = self.changes.version
+
+    def symbol_index(self):
+        return self.index
+
+    def changes_since(self, version):
+        return self.changes.since(version)
+
+
+def engine(*specs, cooldown=0, state_file=None):
+    return AlertEngine([Rule(s) for s in specs], sinks=[], cooldown=cooldown, state_file=state_file)
+
+
+def fired(alerts):
+    return [(a['rule'], a['symbol']) for a in alerts]
+
+
+OVERBOUGHT = {'id': 'rsi-overbought', 'field': 'RSI', 'op': '>', 'value': 70}
+OVERSOLD = {'id': 'rsi-oversold', 'field': 'RSI', 'op': '<', 'value': 30}
+
+
+def test_threshold_index_crossings():
+    index = _ThresholdIndex()
+    rules = {v: Rule({'id': f'gt{v}', 'field': 'x', 'op': '>', 'value': v}) for v in (10, 20, 30)}
+    for rule in rules.values():
+        index.add(rule)
+    assert index.crossed(5, 25) == [rules[10], rules[20]]
+    assert index.crossed(25, 5) == []
+    assert index.crossed(20, 20.5) == [rules[20]]
+    assert index.crossed(None, 15) == [rules[10]]
+
+
+def test_up_cross_fires_once():
+    cache = FakeCache()
+    cache.publish(AAA={'RSI': 60}, BBB={'RSI': 75})
+    alerts = engine(OVERBOUGHT)
+    alerts.prime(cache)
+
+    cache.publish(AAA={'RSI': 72}, BBB={'RSI': 76})
+    assert fired(alerts.check(cache, now=1000)) == [('rsi-overbought', 'AAA')]
+    # Still above the level: no new edge
+    cache.publish(AAA={'RSI': 80}, BBB={'RSI': 76})
+    assert alerts.check(cache, now=1001) == []
+
+
+def test_down_cross_and_re_arm():
+    cache = FakeCache()
+    cache.publish(AAA={'RSI': 40})
+    alerts = engine(OVERSOLD)
+    alerts.prime(cache)
+
+    cache.publish(AAA={'RSI': 25})
+    assert fired(alerts.check(cache, now=1000)) == [('rsi-oversold', 'AAA')]
+    # Back above the level re-arms the rule without alerting...
+    cache.publish(AAA={'RSI': 45})
+    assert alerts.check(cache, now=1001) == []
+    # ...so the next dip alerts again
+    cache.publish(AAA={'RSI': 20})
+    assert fired(alerts.check(cache, now=1002)) == [('rsi-oversold', 'AAA')]
+
+
+def test_missing_value_keeps_the_last_number():
+    cache = FakeCache()
+    cache.publish(AAA={'RSI': 25})
+    alerts = engine(OVERSOLD)
+    alerts.prime(cache)
+    cache.publish(AAA={'RSI': 'N/A'})
+    assert alerts.check(cache, now=1000) == []
+    # 25 -> N/A -> 22 never went back above 30
+    cache.publish(AAA={'RSI': 22})
+    assert alerts.check(cache, now=1001) == []
+
+
+def test_cooldown_suppresses_a_repeat_across_checks():
+    cache = FakeCache()
+    cache.publish(AAA={'RSI': 40})
+    alerts = engine(OVERSOLD, cooldown=3600)
+    alerts.prime(cache)
+
+    cache.publish(AAA={'RSI': 25})
+    assert fired(alerts.check(cache, now=1000)) == [('rsi-oversold', 'AAA')]
+    cache.publish(AAA={'RSI': 45})
+    alerts.check(cache, now=1500)
+    cache.publish(AAA={'RSI': 20})
+    assert alerts.check(cache, now=2000) == []
+    cache.publish(AAA={'RSI': 45})
+    alerts.check(cache, now=5000)
+    cache.publish(AAA={'RSI': 20})
+    assert fired(alerts.check(cache, now=5001)) == [('rsi-oversold', 'AAA')]
+
+
+def test_cooldown_is_persisted(tmp_path):
+    state = str(tmp_path / 'alert_state.json')
+    cache = FakeCache()
+    cache.publish(AAA={'RSI': 40})
+    first = engine(OVERSOLD, cooldown=3600, state_file=state)
+    first.prime(cache)
+    cache.publish(AAA={'RSI': 25})
+    assert fired(first.check(cache, now=1000)) == [('rsi-oversold', 'AAA')]
+
+    # A restarted engine primes above the level and sees the same dip again
+    cache.publish(AAA={'RSI': 45})
+    restarted = engine(OVERSOLD, cooldown=3600, state_file=state)
+    restarted.prime(cache)
+    cache.publish(AAA={'RSI': 25})
+    assert restarted.last_fired == {('rsi-oversold', 'AAA'): 1000}
+    assert restarted.check(cache, now=2000) == []
+
+
+def test_cross_and_earnings_rules_are_edge_triggered():
+    cache = FakeCache()
+    cache.publish(AAA={'yRSI': 35, 'RSI': 38, 'earningsDate': '10-30-2026'})
+    alerts = engine({'id': 'bounce', 'type': 'cross', 'field': 'RSI', 'from': 'yRSI', 'value': 30},
+                    {'id': 'earnings', 'type': 'earnings', 'days': 3})
+    alerts.prime(cache)
+
+    cache.publish(AAA={'yRSI': 28, 'RSI': 33, 'earningsDate': '10-30-2026'})
+    assert fired(alerts.check(cache, today=date(2026, 10, 20), now=1000)) == [('bounce', 'AAA')]
+    cache.publish(AAA={'yRSI': 28, 'RSI': 34, 'earningsDate': '10-30-2026'})
+    assert fired(alerts.check(cache, today=date(2026, 10, 28), now=1001)) == [('earnings', 'AAA')]
+    cache.publish(AAA={'yRSI': 28, 'RSI': 35, 'earningsDate': '10-30-2026'})
+    assert alerts.check(cache, today=date(2026, 10, 29), now=1002) == []
+
+
+def test_alerts_are_read_back_from_the_file_sink(tmp_path):
+    from services.alert_engine import FileSink
+    path = str(tmp_path / 'alerts.jsonl')
+    cache = FakeCache()
+    cache.publish(AAA={'RSI': 40}, BBB={'RSI': 40})
+    writer = AlertEngine([Rule(OVERSOLD)], sinks=[FileSink(path)], cooldown=0)
+    writer.prime(cache)
+    cache.publish(AAA={'RSI': 25}, BBB={'RSI': 40})
+    writer.check(cache, now=1000)
+    cache.publish(AAA={'RSI': 25}, BBB={'RSI': 20})
+    writer.check(cache, now=1001)
+
+    # Another process's engine has fired nothing itself
+    reader = AlertEngine([Rule(OVERSOLD)], sinks=[FileSink(path)], cooldown=0)
+    assert fired(reader.recent_alerts()) == [('rsi-oversold', 'BBB'), ('rsi-oversold', 'AAA')]
+    assert fired(reader.recent_alerts(1)) == [('rsi-oversold', 'BBB')]
+    assert FileSink(str(tmp_path / 'none.jsonl')).recent(5) == []
@@ -0,0 +1,175 @@
+import json
+
+import pytest
+
+from models import stock_cache
+from models.change_log import ChangeLog
+
+
+def rec(symbol, **fields):
+    return {'Symbol': symbol, **fields}
+
+
+def record(log, old, new):
+    """Log the change between two {symbol: record} indexes (lists are not under test)."""
+    return log.record(old, new, {}, {})
+
+
+def test_merges_changes_across_versions():
+    log = ChangeLog(10)
+    v0 = {'A': rec('A', Close=1, RSI=50), 'B': rec('B', Close=2)}
+    v1 = {'A': rec('A', Close=1.5, RSI=50), 'B': rec('B', Close=2)}
+    v2 = {'A': rec('A', Close=1.5, RSI=40), 'B': rec('B', Close=2.5)}
+    record(log, {}, v0)
+    record(log, v0, v1)
+    record(log, v1, v2)
+    assert log.since(1) == {'changes': {'A': {'Close': 1.5, 'RSI': 40}, 'B': {'Close': 2.5}},
+                            'removed': [], 'lists': {}}
+    assert log.since(3) == {'changes': {}, 'removed': [], 'lists': {}}
+
+
+def test_remove_then_re_add_sends_the_whole_record():
+    log = ChangeLog(10)
+    v0 = {'A': rec('A', Close=1, RSI=50), 'B': rec('B', Close=2)}
+    v1 = {'A': rec('A', Close=1.1, RSI=50), 'B': rec('B', Close=2)}
+    v2 = {'B': rec('B', Close=2)}
+    v3 = {'A': rec('A', Close=1.2, RSI=45), 'B': rec('B', Close=2)}
+    record(log, {}, v0)
+    record(log, v0, v1)
+    record(log, v1, v2)
+    assert log.since(1) == {'changes': {}, 'removed': ['A'], 'lists': {}}
+    record(log, v2, v3)
+    # The client drops A at the removal, so the re-add carries every field
+    assert log.since(1) == {'changes': {'A': rec('A', Close=1.2, RSI=45)}, 'removed': [], 'lists': {}}
+    assert log.since(3)['changes'] == {'A': rec('A', Close=1.2, RSI=45)}
+
+
+def test_change_then_remove_only_reports_the_removal():
+    log = ChangeLog(10)
+    v0 = {'A': rec('A', Close=1)}
+    record(log, {}, v0)
+    record(log, v0, {'A': rec('A', Close=2)})
+    record(log, {'A': rec('A', Close=2)}, {})
+    assert log.since(1) == {'changes': {}, 'removed': ['A'], 'lists': {}}
+
+
+def test_fetched_at_alone_is_not_a_change():
+    log = ChangeLog(10)
+    assert record(log, {'A': rec('A', Close=1, fetchedAt=1)}, {'A': rec('A', Close=1, fetchedAt=2)}) is None
+    assert log.version == 0
+
+
+def test_covers_after_the_oldest_entries_are_evicted():
+    log = ChangeLog(3)
+    index = {}
+    for close in range(1, 6):
+        new = {'A': rec('A', Close=close)}
+        record(log, index, new)
+        index = new
+    # Versions 3..5 are kept; a client at 2 still gets everything after it
+    assert [e['version'] for e in log.entries] == [3, 4, 5]
+    assert log.base_version == 2
+    assert not log.covers(1)
+    assert log.since(1) is None
+    assert log.covers(2)
+    assert log.since(2)['changes'] == {'A': {'Close': 5}}
+    assert not log.covers(6)
+
+
+def test_list_order_changes_are_logged():
+    log = ChangeLog(10)
+    index = {'A': rec('A'), 'B': rec('B')}
+    entry = log.record(index, index, {'k': ['A', 'B']}, {'k': ['B', 'A'], 'j': ['A']})
+    assert entry['lists'] == {'k': ['B', 'A'], 'j': ['A']}
+    log.record(index, index, {'k': ['B', 'A'], 'j': ['A']}, {'k': ['B', 'A']})
+    assert log.since(0)['lists'] == {'k': ['B', 'A'], 'j': None}
+
+
+def saved_log(tmp_path, versions, max_versions=10):
+    log = ChangeLog(max_versions)
+    index = {}
+    for close in range(1, versions + 1):
+        new = {'A': rec('A', Close=close)}
+        record(log, index, new)
+        index = new
+    path = tmp_path / 'change_log.json'
+    log.save(str(path))
+    return str(path)
+
+
+def test_load_at_the_cache_version(tmp_path):
+    path = saved_log(tmp_path, 4)
+    log = ChangeLog.load(path, 10, 4)
+    assert log.version == 4
+    assert log.since(2) == {'changes': {'A': {'Close': 4}}, 'removed': [], 'lists': {}}
+
+
+def test_load_with_the_log_ahead_of_the_cache(tmp_path):
+    # The cache file is older than its log: clients may hold up to version 4,
+    # so the log restarts past it and everyone reloads a full snapshot
+    path = saved_log(tmp_path, 4)
+    log = ChangeLog.load(path, 10, 2)
+    assert log.version == 5
+    assert not log.entries
+    assert log.since(4) is None
+    assert log.covers(5)
+
+
+def test_load_with_the_log_behind_the_cache(tmp_path):
+    path = saved_log(tmp_path, 2)
+    log = ChangeLog.load(path, 10, 6)
+    assert log.version == 6
+    assert not log.entries
+    assert log.since(2) is None
+    assert log.since(6) == {'changes': {}, 'removed': [], 'lists': {}}
+
+
+def test_load_keeps_base_version_consistent_with_a_smaller_log(tmp_path):
+    path = saved_log(tmp_path, 6, max_versions=10)
+    log = ChangeLog.load(path, 3, 6)
+    assert [e['version'] for e in log.entries] == [4, 5, 6]
+    assert log.base_version == 3
+    assert log.since(2) is None
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(stock_cache, 'CACHE_DIR', str(tmp_path))
+    return stock_cache.StockCache()
+
+
+def test_publish_versions_only_data_changes(cache, tmp_path):
+    cache.set('list', [rec('A', Close=1, fetchedAt=1)])
+    assert cache.version == 1
+    cache.set('list', [rec('A', Close=1, fetchedAt=2)])
+    assert cache.version == 1
+    cache.set('list', [rec('A', Close=2, fetchedAt=3)])
+    assert cache.version == 2
+    assert cache.changes_since(1) == {'changes': {'A': {'Close': 2}}, 'removed': [], 'lists': {}, 'version': 2}
+
+    with open(tmp_path / 'stock_data.json') as f:
+        saved = json.load(f)
+    assert saved['version'] == 2
+    assert saved['data']['list'][0]['Close'] == 2
+
+
+def test_published_snapshots_are_not_modified(cache):
+    cache.set('list', [rec('A', Close=1)])
+    before = cache.snapshot
+    cache.set_many({'list': [rec('A', Close=2)], 'other': [rec('B', Close=3)]})
+    assert before.get('list') == [rec('A', Close=1)]
+    assert 'other' not in before.data
+    assert before.version == 1 and cache.version == 2
+    with pytest.raises(TypeError):
+        cache.data['x'] = 1
+
+
+def test_reload_picks_up_another_process_generation(cache):
+    cache.set('list', [rec('A', Close=1)])
+    other = stock_cache.StockCache()
+    other.set('list', [rec('A', Close=2)])
+    assert cache.reload_if_changed()
+    assert cache.version == other.version == 2
+    assert cache.get('list') == [rec('A', Close=2)]
+    assert cache.changes_since(1)['changes'] == {'A': {'Close': 2}}
+    assert not cache.reload_if_changed()
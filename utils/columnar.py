@@ -0,0 +1,133 @@
+"""
+Columnar encodings of stock records for bulk consumers.
+
+Records (one dict per symbol) are turned into typed columns: numeric fields
+become float64 (None / 'N/A' -> NaN), booleans stay boolean, everything else
+is a string column. Nested values (holdings, fund_stats) are left out. Two
+encodings are offered:
+  - arrow: Arrow IPC file format, readable zero-copy (pyarrow.ipc.open_file /
+    memory_map). Needs the optional pyarrow package.
+  - npz:   compressed NumPy .npz archive (numpy.load), one array per column;
+    no extra dependency.
+"""
+import io
+import math
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401  (registers pa.ipc)
+except ImportError:
+    pa = None
+
+# format name -> response content type
+CONTENT_TYPES = {
+    "arrow": "application/vnd.apache.arrow.file",
+    "npz": "application/x-npz",
+}
+# Accept header media types -> format name
+_ACCEPT_TYPES = {
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/x-npz": "npz",
+    "application/json": "json",
+}
+# Strings treated as a missing number in otherwise numeric fields
+_MISSING = ("N/A", "", "NaN", "nan")
+
+
+def available_formats():
+    """Columnar formats usable in this environment."""
+    return [f for f in CONTENT_TYPES if f != "arrow" or pa is not None]
+
+
+def format_from_accept(accept):
+    """Pick a format from an Accept header; None when nothing columnar is asked for."""
+    for part in (accept or "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in _ACCEPT_TYPES:
+            return _ACCEPT_TYPES[media]
+    return None
+
+
+def _column_kind(values):
+    kind = None
+    for v in values:
+        if v is None or (isinstance(v, str) and v in _MISSING):
+            continue
+        if isinstance(v, bool):
+            this = "bool"
+        elif isinstance(v, (int, float)):
+            this = "number"
+        elif isinstance(v, str):
+            return "string"
+        else:
+            return None  # nested value; not representable as a flat column
+        if kind is None:
+            kind = this
+        elif kind != this:
+            kind = "number"
+    return kind or "string"
+
+
+def records_to_columns(records):
+    """
+    Typed columns for a list of record dicts, in first-seen field order.
+    Returns {name: numpy array}; string columns are numpy unicode arrays.
+    """
+    fields = {}
+    for r in records:
+        for k in r:
+            fields.setdefault(k, None)
+
+    columns = {}
+    for name in fields:
+        values = [r.get(name) for r in records]
+        kind = _column_kind(values)
+        if kind == "number" or (kind == "bool" and any(v is None for v in values)):
+            def num(v):
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    return float(v)
+                if isinstance(v, bool):
+                    return 1.0 if v else 0.0
+                return math.nan
+            columns[name] = np.fromiter((num(v) for v in values), dtype=np.float64, count=len(values))
+        elif kind == "bool":
+            columns[name] = np.array(values, dtype=bool)
+        elif kind == "string":
+            columns[name] = np.array(["" if v is None else str(v) for v in values], dtype=str)
+    return columns
+
+
+def encode_npz(columns):
+    buf = io.BytesIO()
+    # Unicode columns are fixed-width UTF-32; compression removes the padding
+    np.savez_compressed(buf, **columns)
+    return buf.getvalue()
+
+
+def encode_arrow(columns):
+    if pa is None:
+        raise ImportError("pyarrow is required for the arrow format")
+    arrays, names = [], []
+    for name, col in columns.items():
+        if col.dtype.kind == "f":
+            arrays.append(pa.array(col, mask=np.isnan(col)))
+        else:
+            arrays.append(pa.array(col))
+        names.append(name)
+    table = pa.Table.from_arrays(arrays, names=names)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(records, fmt):
+    """Encode records as `fmt` ('arrow' or 'npz'); returns (bytes, content type)."""
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    columns = records_to_columns(records)
+    data = encode_arrow(columns) if fmt == "arrow" else encode_npz(columns)
+    return data, CONTENT_TYPES[fmt]
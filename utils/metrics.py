@@ -0,0 +1,207 @@
+"""
+In-process instrumentation: stage timers, counters and latency histograms.
+
+A single module-level `metrics` registry is shared by the services, the cache
+and the HTTP handler. It renders Prometheus text for the /metrics endpoint and
+a JSON summary for run_cache_update.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+PREFIX = "cachebandit_"
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+HTTP_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> (type, help); every metric the registry emits must be declared here
+METRIC_DEFS = {
+    "stage_duration_seconds": ("histogram", "Time spent in each refresh stage."),
+    "upstream_calls_total": ("counter", "Calls made to the upstream market data provider."),
+    "upstream_retries_total": ("counter", "Upstream calls retried after a failure."),
+    "upstream_rate_limited_total": ("counter", "Upstream calls rejected with a 429 / rate limit."),
+    "cache_requests_total": ("counter", "StockCache lookups by result (hit/miss)."),
+    "bars_downloaded_total": ("counter", "Symbol bars received from upstream, by interval."),
+    "bars_revised_total": ("counter", "Symbols whose stored bars were re-downloaded after an upstream adjustment."),
+    "cache_versions_total": ("counter", "Cache saves that changed at least one symbol record."),
+    "delta_responses_total": ("counter", "Change requests answered with a delta or a full snapshot."),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route."),
+    "http_requests_total": ("counter", "HTTP requests by route and status code."),
+    "stream_chunks_total": ("counter", "Symbol chunks fetched by a streaming refresh."),
+    "stream_memory_pressure_total": ("counter", "Streaming refresh chunks that ended above the memory ceiling."),
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self):
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            yield bound, running
+
+
+class MetricsRegistry:
+    """Thread-safe store for counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stage_listeners = []
+        self.reset()
+
+    def reset(self):
+        """Drop every recorded value (used at the start of each refresh run)."""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self.started_at = time.time()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=STAGE_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def add_stage_listener(self, listener):
+        """
+        Register an object with on_stage_enter(name) / on_stage_exit(name)
+        methods; it is called around every stage (used by the profiler).
+        """
+        self._stage_listeners.append(listener)
+
+    def remove_stage_listener(self, listener):
+        if listener in self._stage_listeners:
+            self._stage_listeners.remove(listener)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as one invocation of refresh stage `name`."""
+        listeners = list(self._stage_listeners)
+        for listener in listeners:
+            listener.on_stage_enter(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - start, stage=name)
+            for listener in reversed(listeners):
+                listener.on_stage_exit(name)
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (h.sum, h.count, list(h.cumulative())) for k, h in self._histograms.items()}
+
+        lines = []
+        for name, (mtype, help_text) in METRIC_DEFS.items():
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {mtype}")
+            if mtype == "counter":
+                for (n, key), value in sorted(counters.items()):
+                    if n == name:
+                        lines.append(f"{full}{_format_labels(key)} {_format_value(value)}")
+            else:
+                for (n, key), (total, count, buckets) in sorted(histograms.items()):
+                    if n != name:
+                        continue
+                    for bound, running in buckets:
+                        le = (("le", _format_value(float(bound))),)
+                        lines.append(f"{full}_bucket{_format_labels(key, le)} {running}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {_format_value(total)}")
+                    lines.append(f"{full}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Return a JSON-serialisable snapshot: per-stage timings and all counters."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+            started_at = self.started_at
+
+        stages, routes = {}, {}
+        for (name, key), hist in histograms.items():
+            labels = dict(key)
+            entry = {
+                "count": hist.count,
+                "total_seconds": round(hist.sum, 6),
+                "mean_seconds": round(hist.sum / hist.count, 6) if hist.count else None,
+                "max_seconds": round(hist.max, 6),
+            }
+            if name == "stage_duration_seconds":
+                stages[labels["stage"]] = entry
+            elif name == "http_request_duration_seconds":
+                routes[f"{labels.get('method', 'GET')} {labels['route']}"] = entry
+
+        counter_out = {}
+        for (name, key), value in sorted(counters.items()):
+            label_str = ",".join(f"{k}={v}" for k, v in key)
+            counter_out.setdefault(name, {})[label_str or "total"] = value
+
+        return {
+            "started_at": datetime.fromtimestamp(started_at).isoformat(timespec="seconds"),
+            "elapsed_seconds": round(time.time() - started_at, 3),
+            "stages": stages,
+            "http_routes": routes,
+            "counters": counter_out,
+        }
+
+    def write_summary(self, path, **extra):
+        """Write summary() (plus any extra fields) to `path` as JSON."""
+        payload = {**self.summary(), **extra}
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2)
+        return payload
+
+
+metrics = MetricsRegistry()
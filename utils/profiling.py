@@ -0,0 +1,256 @@
+"""
+Per-stage profiler for refresh runs.
+
+StageProfiler hooks into utils.metrics stages and, for each stage name, keeps:
+  - a cProfile profile (main thread only; cProfile is per-thread),
+  - tracemalloc snapshot diffs for the first few invocations,
+  - wall/CPU time and sample counts.
+A background sampler records folded stacks for every thread, tagged with the
+stage each thread was in, which is written in the flamegraph.pl / speedscope
+"collapsed" format.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from utils.metrics import metrics
+
+# Frames from these files are dropped from allocation stats and samples
+_SELF_FILES = (tracemalloc.__file__, __file__, threading.__file__)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StageStats:
+    def __init__(self):
+        self.invocations = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.samples = 0
+        self.alloc_net_bytes = 0
+        self.alloc_sampled = 0
+        self.alloc_by_line = Counter()
+
+
+class StageProfiler:
+    """Collects CPU profiles, allocation diffs and folded stacks per stage."""
+
+    def __init__(self, out_dir, sample_interval=0.005, alloc_snapshots_per_stage=3, alloc_top=25):
+        self.out_dir = out_dir
+        self.sample_interval = sample_interval
+        self.alloc_snapshots_per_stage = alloc_snapshots_per_stage
+        self.alloc_top = alloc_top
+
+        self._owner = None
+        self._lock = threading.Lock()
+        self._stacks = defaultdict(list)     # thread id -> [(stage, wall0, cpu0, snapshot)]
+        self._profiles = {}                  # stage -> cProfile.Profile (owner thread)
+        self._active_profile = None
+        self._stats = defaultdict(_StageStats)
+        self._folded = Counter()
+        self._sampler = None
+        self._stop = threading.Event()
+        self._started = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._owner = threading.get_ident()
+        self._started = time.perf_counter()
+        tracemalloc.start(1)
+        metrics.add_stage_listener(self)
+        self._sampler = threading.Thread(target=self._sample_loop, name="stage-profiler", daemon=True)
+        self._sampler.start()
+        logging.info(f"Profiling enabled, writing to {self.out_dir}")
+        return self
+
+    def stop(self):
+        """Stop collecting and write every output file; returns the summary dict."""
+        metrics.remove_stage_listener(self)
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        if self._active_profile:
+            self._active_profile.disable()
+            self._active_profile = None
+        tracemalloc.stop()
+        return self._write()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # -- stage listener ----------------------------------------------------
+
+    def on_stage_enter(self, name):
+        tid = threading.get_ident()
+        stack = self._stacks[tid]
+        snapshot = None
+        with self._lock:
+            stats = self._stats[name]
+            stats.invocations += 1
+            if stats.alloc_sampled < self.alloc_snapshots_per_stage:
+                stats.alloc_sampled += 1
+                snapshot = True
+
+        # Keep snapshot work out of every stage's CPU profile
+        if tid == self._owner and self._active_profile is not None:
+            self._active_profile.disable()
+
+        if snapshot:
+            snapshot = tracemalloc.take_snapshot()
+
+        if tid == self._owner:
+            profile = self._profiles.get(name)
+            if profile is None:
+                profile = self._profiles[name] = cProfile.Profile()
+            profile.enable()
+            self._active_profile = profile
+
+        stack.append((name, time.perf_counter(), time.thread_time(), snapshot))
+
+    def on_stage_exit(self, name):
+        tid = threading.get_ident()
+        stack = self._stacks[tid]
+        if not stack or stack[-1][0] != name:
+            return
+        _, wall0, cpu0, snapshot = stack.pop()
+
+        if tid == self._owner and self._active_profile is not None:
+            self._active_profile.disable()
+
+        alloc_lines = None
+        net = 0
+        if snapshot is not None:
+            alloc_lines = Counter()
+            for stat in tracemalloc.take_snapshot().compare_to(snapshot, "lineno"):
+                frame = stat.traceback[0]
+                if frame.filename in _SELF_FILES or not stat.size_diff:
+                    continue
+                alloc_lines[f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+                net += stat.size_diff
+
+        if tid == self._owner:
+            outer = self._profiles.get(stack[-1][0]) if stack else None
+            if outer:
+                outer.enable()
+            self._active_profile = outer
+
+        with self._lock:
+            stats = self._stats[name]
+            stats.wall_seconds += time.perf_counter() - wall0
+            stats.cpu_seconds += time.thread_time() - cpu0
+            if alloc_lines is not None:
+                stats.alloc_net_bytes += net
+                stats.alloc_by_line.update(alloc_lines)
+
+    # -- sampler -----------------------------------------------------------
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in frames.items():
+                if tid == me:
+                    continue
+                calls = []
+                while frame is not None:
+                    if frame.f_code.co_filename not in _SELF_FILES:
+                        calls.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if not calls:
+                    continue
+                stages = [entry[0] for entry in list(self._stacks.get(tid, ()))]
+                root = [names.get(tid, f"thread-{tid}")] + [f"stage:{s}" for s in stages]
+                self._folded[";".join(root + calls[::-1])] += 1
+                if stages:
+                    with self._lock:
+                        self._stats[stages[-1]].samples += 1
+
+    # -- output ------------------------------------------------------------
+
+    def _write(self):
+        stage_dir = os.path.join(self.out_dir, "stages")
+        alloc_dir = os.path.join(self.out_dir, "alloc")
+        os.makedirs(stage_dir, exist_ok=True)
+        os.makedirs(alloc_dir, exist_ok=True)
+
+        summary = {
+            "wall_seconds": round(time.perf_counter() - self._started, 3),
+            "sample_interval": self.sample_interval,
+            "stages": {},
+        }
+
+        stat_files = []
+        for name, profile in self._profiles.items():
+            safe = name.replace("/", "_")
+            prof_fp = os.path.join(stage_dir, f"{safe}.prof")
+            profile.dump_stats(prof_fp)
+            stat_files.append(prof_fp)
+            with open(os.path.join(stage_dir, f"{safe}.txt"), "w") as f:
+                pstats.Stats(prof_fp, stream=f).sort_stats("cumulative").print_stats(40)
+
+        for name, stats in self._stats.items():
+            safe = name.replace("/", "_")
+            top_functions = []
+            prof_fp = os.path.join(stage_dir, f"{safe}.prof")
+            if os.path.exists(prof_fp):
+                raw = pstats.Stats(prof_fp).stats
+                for (filename, line, func), (_, ncalls, tottime, cumtime, _) in sorted(
+                        raw.items(), key=lambda kv: kv[1][2], reverse=True)[:10]:
+                    top_functions.append({
+                        "function": f"{func} ({os.path.basename(filename)}:{line})",
+                        "calls": ncalls,
+                        "tottime": round(tottime, 6),
+                        "cumtime": round(cumtime, 6),
+                    })
+            if stats.alloc_by_line:
+                with open(os.path.join(alloc_dir, f"{safe}.txt"), "w") as f:
+                    f.write(f"# net allocation by line over {stats.alloc_sampled} sampled invocation(s) of '{name}'\n")
+                    for where, size in stats.alloc_by_line.most_common(self.alloc_top):
+                        f.write(f"{size / 1024:12.1f} KiB  {where}\n")
+            summary["stages"][name] = {
+                "invocations": stats.invocations,
+                "wall_seconds": round(stats.wall_seconds, 6),
+                "cpu_seconds": round(stats.cpu_seconds, 6),
+                "samples": stats.samples,
+                "alloc_sampled_invocations": stats.alloc_sampled,
+                "alloc_net_bytes_sampled": stats.alloc_net_bytes,
+                "top_functions": top_functions,
+            }
+
+        # Merged call graph across all stages
+        if stat_files:
+            merged = pstats.Stats(*stat_files)
+            merged.dump_stats(os.path.join(self.out_dir, "merged.prof"))
+            buf = io.StringIO()
+            merged.stream = buf
+            merged.sort_stats("cumulative").print_stats(60)
+            merged.print_callees(30)
+            with open(os.path.join(self.out_dir, "merged_calltree.txt"), "w") as f:
+                f.write(buf.getvalue())
+
+        with open(os.path.join(self.out_dir, "flamegraph.collapsed"), "w") as f:
+            for stack, count in self._folded.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(os.path.join(self.out_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary